@@ -1,28 +1,359 @@
-"""Asterisk integration stub.
+"""Asyncio Asterisk Manager Interface (AMI) client.
 
-This module is a placeholder showing where to implement integration with
-Asterisk AMI or ARI. For a real integration you can use:
-- python-ami (for AMI)
-- ari (for ARI)
-- pyst2 or starpy libraries
+Keeps one long-lived TCP connection to Asterisk. Any number of coroutines
+can have actions in flight at once: each action is tagged with a unique
+ActionID and the single reader task routes replies (and EventList
+follow-up events) back to the waiting caller. Unsolicited events go to
+registered listeners. If the connection drops, pending actions fail with
+ConnectionError and the client reconnects with jittered exponential
+backoff, logging in again automatically.
 
-Keep credentials and connection details in environment variables.
+Connection details come from the environment:
+  AMI_HOST (default 127.0.0.1), AMI_PORT (default 5038),
+  AMI_USER, AMI_SECRET
 """
 
+import asyncio
+import itertools
+import logging
+import os
+import random
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10.0
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+
+
+class AMIError(Exception):
+    """Asterisk answered an action with Response: Error."""
+
+    def __init__(self, message: dict):
+        super().__init__(message.get("Message", "AMI action failed"))
+        self.message = message
+
+
+def encode_message(fields: dict) -> bytes:
+    lines = []
+    for key, value in fields.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            # Repeated headers, e.g. several Variable: lines
+            lines.extend(f"{key}: {v}" for v in value)
+        else:
+            lines.append(f"{key}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+
+async def read_message(reader: asyncio.StreamReader):
+    """Read one blank-line-terminated AMI message; None on EOF.
+
+    Repeated keys (e.g. Output: lines from Command) are joined with newlines.
+    """
+    msg = {}
+    while True:
+        raw = await reader.readline()
+        if not raw:
+            return None
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if not line:
+            if msg:
+                return msg
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        key, value = key.strip(), value.strip()
+        msg[key] = f"{msg[key]}\n{value}" if key in msg else value
+
+
+class _Pending:
+    __slots__ = ("future", "events", "is_list", "until")
+
+    def __init__(self, future, until: str = None):
+        self.future = future
+        self.events = []
+        self.is_list = False
+        self.until = until  # event that completes the action, e.g. OriginateResponse
+
+
 class AsteriskClient:
-    def __init__(self):
-        # TODO: read connection info from env and create AMI/ARI client
-        self._connected = False
-
-    def connect(self):
-        # Implement real connection logic here
-        self._connected = True
-        return self._connected
-
-    def ping(self):
-        # Simple check method used by the example endpoint
-        return self._connected
-
-    def originate_call(self, extension, context='from-internal'):
-        # Example stub to originate a call via AMI or ARI
-        raise NotImplementedError("Implement originate_call with AMI/ARI client")
+    def __init__(
+        self, host: str = None, port: int = None, username: str = None, secret: str = None
+    ):
+        self.host = host or os.environ.get("AMI_HOST", "127.0.0.1")
+        self.port = int(port or os.environ.get("AMI_PORT", "5038"))
+        self.username = username or os.environ.get("AMI_USER")
+        self.secret = secret or os.environ.get("AMI_SECRET")
+
+        self._ids = itertools.count(1)
+        self._id_prefix = f"looped-{os.getpid()}"
+        self._pending = {}  # ActionID -> _Pending
+        self._listeners = []  # (callback, event names or None)
+        self._writer = None
+        self._connected = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.reconnects = 0
+
+    # -- lifecycle -------------------------------------------------------
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.username and self.secret)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def connect(self, wait: float = None) -> bool:
+        """Start the connection task; optionally wait up to `wait` seconds for login.
+
+        Without credentials there is nothing to log in with, so no task is
+        started (it would reconnect forever) and this returns False.
+        """
+        if not self.configured:
+            return False
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if wait:
+            try:
+                await asyncio.wait_for(self._connected.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        return self.connected
+
+    async def close(self):
+        self._closing = True
+        if self._task is not None:
+            if self.connected:
+                try:
+                    await self.send_action("Logoff", timeout=1)
+                except Exception:
+                    pass
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._drop_connection(ConnectionError("AMI client closed"))
+
+    async def _run(self):
+        attempt = 0
+        while not self._closing:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as exc:
+                delay = self._backoff(attempt)
+                attempt += 1
+                logger.warning("AMI connect to %s:%s failed (%s); retrying in %.1fs",
+                               self.host, self.port, exc, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            self._writer = writer
+            read_task = None
+            try:
+                # Banner ("Asterisk Call Manager/x.y") must be read before the reader task starts
+                await asyncio.wait_for(reader.readline(), DEFAULT_TIMEOUT)
+                read_task = asyncio.get_running_loop().create_task(self._read_loop(reader))
+                await self._login()
+                attempt = 0
+                self._connected.set()
+                logger.info("AMI connected to %s:%s", self.host, self.port)
+                await read_task
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("AMI session ended: %r", exc)
+            finally:
+                if read_task is not None:
+                    read_task.cancel()
+                self._drop_connection(ConnectionError("AMI connection lost"))
+                writer.close()
+
+            if not self._closing:
+                self.reconnects += 1
+                delay = self._backoff(attempt)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Exponential backoff with +/-50% jitter so units don't reconnect in lockstep."""
+        base = min(BACKOFF_MAX, BACKOFF_INITIAL * (2 ** attempt))
+        return base * random.uniform(0.5, 1.5)
+
+    async def _login(self):
+        if not self.configured:
+            raise AMIError({"Message": "AMI_USER / AMI_SECRET not set"})
+        await self._send({"Action": "Login", "Username": self.username, "Secret": self.secret,
+                          "Events": "on"}, timeout=DEFAULT_TIMEOUT)
+
+    def _drop_connection(self, exc: Exception):
+        self._connected.clear()
+        self._writer = None
+        pending, self._pending = self._pending, {}
+        for p in pending.values():
+            if not p.future.done():
+                p.future.set_exception(exc)
+
+    # -- reading ---------------------------------------------------------
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        while True:
+            msg = await read_message(reader)
+            if msg is None:
+                return
+            self._dispatch(msg)
+
+    def _dispatch(self, msg: dict):
+        pending = self._pending.get(msg.get("ActionID"))
+        if pending is None:
+            if "Event" in msg:
+                self._emit(msg)
+            return
+
+        # OriginateResponse events carry a Response header too
+        if "Response" in msg and "Event" not in msg:
+            if msg["Response"] == "Error":
+                self._pending.pop(msg["ActionID"], None)
+                if not pending.future.done():
+                    pending.future.set_exception(AMIError(msg))
+                return
+            if msg.get("EventList", "").lower() == "start":
+                pending.is_list = True
+                pending.events.append(msg)  # response first, events follow
+                return
+            if pending.until:
+                return  # accepted; the result arrives as an event
+            self._pending.pop(msg["ActionID"], None)
+            if not pending.future.done():
+                pending.future.set_result(msg)
+            return
+
+        if pending.is_list:
+            if msg.get("EventList", "").lower() == "complete":
+                self._pending.pop(msg["ActionID"], None)
+                response, events = pending.events[0], pending.events[1:]
+                if not pending.future.done():
+                    pending.future.set_result((response, events))
+            else:
+                pending.events.append(msg)
+        else:
+            # Events tied to an action but not part of a list (e.g. OriginateResponse)
+            if pending.until and msg.get("Event") == pending.until:
+                self._pending.pop(msg["ActionID"], None)
+                if not pending.future.done():
+                    pending.future.set_result(msg)
+            self._emit(msg)
+
+    def _emit(self, msg: dict):
+        name = msg.get("Event")
+        for callback, names in list(self._listeners):
+            if names is None or name in names:
+                try:
+                    callback(msg)
+                except Exception:
+                    logger.exception("AMI event listener failed for %s", name)
+
+    def add_event_listener(self, callback, events=None):
+        """Call `callback(message)` for events (all, or only the given names)."""
+        entry = (callback, frozenset(events) if events else None)
+        self._listeners.append(entry)
+        return entry
+
+    def remove_event_listener(self, entry):
+        if entry in self._listeners:
+            self._listeners.remove(entry)
+
+    # -- actions ---------------------------------------------------------
+
+    async def _send(self, fields: dict, timeout: float, until: str = None):
+        action_id = f"{self._id_prefix}-{next(self._ids)}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending[action_id] = _Pending(future, until)
+        try:
+            writer = self._writer
+            if writer is None:
+                raise ConnectionError("AMI not connected")
+            writer.write(encode_message({**fields, "ActionID": action_id}))
+            await writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(action_id, None)
+
+    async def _ready(self, timeout: float):
+        if not self.configured:
+            raise AMIError({"Response": "Error", "Message": "AMI_USER / AMI_SECRET not set"})
+        if self._task is None:
+            await self.connect()
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def send_action(self, action: str, timeout: float = DEFAULT_TIMEOUT, **fields) -> dict:
+        """Send an action and return its response message.
+
+        Raises AMIError on Response: Error, ConnectionError if the link
+        drops, asyncio.TimeoutError if no reply arrives in time.
+        """
+        await self._ready(timeout)
+        result = await self._send({"Action": action, **fields}, timeout)
+        return result[0] if isinstance(result, tuple) else result
+
+    async def send_action_until(
+        self, action: str, event: str, timeout: float = DEFAULT_TIMEOUT, **fields
+    ) -> dict:
+        """Send an action whose outcome is reported by `event` (carrying the same
+        ActionID) and return that event. Listeners still see it too."""
+        await self._ready(timeout)
+        return await self._send({"Action": action, **fields}, timeout, until=event)
+
+    async def send_action_list(self, action: str, timeout: float = DEFAULT_TIMEOUT, **fields):
+        """Send an EventList action (e.g. CoreShowChannels); returns (response, events)."""
+        await self._ready(timeout)
+        result = await self._send({"Action": action, **fields}, timeout)
+        return result if isinstance(result, tuple) else (result, [])
+
+    async def ping(self, timeout: float = 2.0) -> bool:
+        if not self.configured:
+            return False
+        try:
+            response = await self.send_action("Ping", timeout=timeout)
+        except (AMIError, ConnectionError, asyncio.TimeoutError):
+            return False
+        return response.get("Response") == "Success"
+
+    async def command(self, command: str, timeout: float = DEFAULT_TIMEOUT) -> str:
+        """Run a CLI command (e.g. "dialplan reload") and return its output."""
+        response = await self.send_action("Command", timeout=timeout, Command=command)
+        return response.get("Output", "")
+
+    async def originate_call(self, extension, context='from-internal', channel=None,
+                             priority=1, caller_id=None, timeout: float = DEFAULT_TIMEOUT,
+                             wait: bool = False, **fields):
+        """Originate a call to `extension` in `context`.
+
+        `channel` defaults to PJSIP/<extension>. The action is sent with
+        Async: true, so the response arrives as soon as Asterisk has queued
+        the call; the outcome follows as an OriginateResponse event. With
+        `wait=True` that event is returned instead (allow `timeout` to
+        cover the ring time).
+        """
+        fields = dict(
+            Channel=channel or f"PJSIP/{extension}",
+            Exten=extension,
+            Context=context,
+            Priority=priority,
+            CallerID=caller_id,
+            Async="true",
+            **fields,
+        )
+        if wait:
+            return await self.send_action_until(
+                "Originate", "OriginateResponse", timeout=timeout, **fields
+            )
+        return await self.send_action("Originate", timeout=timeout, **fields)
@@ -0,0 +1,393 @@
+"""Live channel and call state built from the AMI event stream.
+
+Asterisk reports every channel change as an event. The tracker folds them
+into in-memory tables so the API can answer "what is happening now"
+without asking Asterisk:
+
+- channels by Uniqueid, with an index by endpoint extension
+- calls by Linkedid (every channel of one call shares it)
+- bridges by BridgeUniqueid
+
+When the last channel of a call hangs up, the call is written to call
+history. After every (re)login Asterisk sends FullyBooted; the tracker
+then reconciles its tables against CoreShowChannels, since events may
+have been missed while disconnected.
+"""
+
+import asyncio
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACKED_EVENTS = (
+    "FullyBooted", "Newchannel", "Newstate", "NewCallerid", "DialBegin", "DialEnd",
+    "BridgeEnter", "BridgeLeave", "DTMFBegin", "DTMFEnd", "Hangup",
+)
+INTERNAL_CONTEXTS = ("from-internal",)
+MAX_DIGITS = 64
+STATE_UP = "6"
+
+# "PJSIP/1001-0000002a" -> "1001"; Local/ and other helper channels have no endpoint
+_ENDPOINT_RE = re.compile(r"^(?:PJSIP|SIP|IAX2)/(.+)-[0-9a-fA-F]+$")
+
+
+def channel_extension(channel: str):
+    match = _ENDPOINT_RE.match(channel or "")
+    return match.group(1) if match else None
+
+
+class ChannelTracker:
+    def __init__(self, call_history=None, publish=None, device_for_extension=None,
+                 internal_contexts=INTERNAL_CONTEXTS):
+        self._channels = {}      # uniqueid -> channel
+        self._calls = {}         # linkedid -> call
+        self._bridges = {}       # bridge id -> {uniqueid: None}
+        self._by_extension = {}  # extension -> {uniqueid: None}
+        self._call_history = call_history
+        self._publish = publish  # optional callback(event_type, data)
+        self._device_for_extension = device_for_extension  # optional extension -> device id
+        self._internal_contexts = frozenset(internal_contexts)
+        self._client = None
+        self._listener = None
+        self._resync_task = None
+        self._created_since_resync = None
+        self._handlers = {
+            "FullyBooted": self._on_fully_booted,
+            "Newchannel": self._on_new_channel,
+            "Newstate": self._on_new_state,
+            "NewCallerid": self._on_new_callerid,
+            "DialBegin": self._on_dial_begin,
+            "DialEnd": self._on_dial_end,
+            "BridgeEnter": self._on_bridge_enter,
+            "BridgeLeave": self._on_bridge_leave,
+            "DTMFBegin": self._on_dtmf_begin,
+            "DTMFEnd": self._on_dtmf_end,
+            "Hangup": self._on_hangup,
+        }
+
+    def attach(self, client):
+        """Start consuming events from an AsteriskClient."""
+        self._client = client
+        self._listener = client.add_event_listener(self.handle, TRACKED_EVENTS)
+
+    def detach(self):
+        if self._client is not None:
+            self._client.remove_event_listener(self._listener)
+            self._client = None
+        if self._resync_task is not None:
+            self._resync_task.cancel()
+            self._resync_task = None
+
+    def handle(self, msg: dict):
+        handler = self._handlers.get(msg.get("Event"))
+        if handler is not None:
+            handler(msg)
+
+    def _emit(self, event_type: str, data):
+        if self._publish is not None:
+            self._publish(event_type, data)
+
+    # -- reads -----------------------------------------------------------
+
+    def active_calls(self, extension: str = None):
+        """Snapshot of calls in progress, optionally only those on `extension`."""
+        if extension is None:
+            calls = self._calls.values()
+        else:
+            linked = {self._channels[u]["linkedid"] for u in self._by_extension.get(extension, ())}
+            calls = (self._calls[l] for l in linked if l in self._calls)
+        return [self._call_view(call) for call in calls]
+
+    def get_call(self, linkedid: str):
+        call = self._calls.get(linkedid)
+        return self._call_view(call) if call else None
+
+    def channel_count(self) -> int:
+        return len(self._channels)
+
+    def bridges(self):
+        return {bridge: list(members) for bridge, members in self._bridges.items()}
+
+    def _call_view(self, call: dict):
+        view = {k: v for k, v in call.items() if k != "channels"}
+        view["channels"] = [
+            dict(self._channels[u]) for u in call["channels"] if u in self._channels
+        ]
+        return view
+
+    # -- channel lifecycle -----------------------------------------------
+
+    def _add_channel(self, msg: dict, created: float = None):
+        uniqueid = msg["Uniqueid"]
+        linkedid = msg.get("Linkedid") or uniqueid
+        channel = {
+            "uniqueid": uniqueid,
+            "linkedid": linkedid,
+            "channel": msg.get("Channel"),
+            "extension": channel_extension(msg.get("Channel")),
+            "state": msg.get("ChannelStateDesc") or msg.get("ChannelState"),
+            "caller_num": msg.get("CallerIDNum"),
+            "caller_name": msg.get("CallerIDName"),
+            "exten": msg.get("Exten"),
+            "context": msg.get("Context"),
+            "bridge": None,
+            "dtmf": "",
+            "created": created or time.time(),
+        }
+        self._channels[uniqueid] = channel
+        if channel["extension"]:
+            self._by_extension.setdefault(channel["extension"], {})[uniqueid] = None
+        if self._created_since_resync is not None:
+            self._created_since_resync.add(uniqueid)
+
+        call = self._calls.get(linkedid)
+        if call is None:
+            call = self._calls[linkedid] = self._new_call(channel)
+            self._emit("call.started", self._call_view(call))
+        else:
+            call["channels"][uniqueid] = None
+        if msg.get("ChannelState") == STATE_UP and uniqueid != linkedid:
+            self._mark_answered(call)
+        return channel
+
+    def _new_call(self, channel: dict):
+        outgoing = channel["context"] in self._internal_contexts
+        return {
+            "linkedid": channel["linkedid"],
+            "channel": channel["channel"],  # originating channel; call history dedupes on it
+            "type": "outgoing" if outgoing else "incoming",
+            "caller_num": channel["caller_num"],
+            "caller_name": channel["caller_name"],
+            "number": channel["exten"] if outgoing else channel["caller_num"],
+            # The device end is the caller for outgoing calls, the callee otherwise
+            "extension": channel["extension"] if outgoing else None,
+            "dial_status": None,
+            "digits": "",
+            "started": channel["created"],
+            "answered": None,
+            "channels": {channel["uniqueid"]: None},
+        }
+
+    def _remove_channel(self, uniqueid: str):
+        channel = self._channels.pop(uniqueid, None)
+        if channel is None:
+            return None
+        ext = channel["extension"]
+        if ext and ext in self._by_extension:
+            self._by_extension[ext].pop(uniqueid, None)
+            if not self._by_extension[ext]:
+                del self._by_extension[ext]
+        self._leave_bridge(channel)
+        return channel
+
+    def _leave_bridge(self, channel: dict):
+        bridge = channel["bridge"]
+        if bridge is None:
+            return
+        channel["bridge"] = None
+        members = self._bridges.get(bridge)
+        if members is not None:
+            members.pop(channel["uniqueid"], None)
+            if not members:
+                del self._bridges[bridge]
+
+    def _mark_answered(self, call: dict):
+        if call["answered"] is None:
+            call["answered"] = time.time()
+            self._emit(
+                "call.answered", {"linkedid": call["linkedid"], "answered": call["answered"]}
+            )
+
+    def _channel_for(self, msg: dict, prefix: str = ""):
+        uniqueid = msg.get(prefix + "Uniqueid")
+        if not uniqueid:
+            return None
+        channel = self._channels.get(uniqueid)
+        if channel is None:
+            # Joined mid-call (e.g. after a restart): adopt it from the event
+            fields = {k[len(prefix):]: v for k, v in msg.items() if k.startswith(prefix)}
+            channel = self._add_channel(fields)
+        return channel
+
+    # -- event handlers --------------------------------------------------
+
+    def _on_new_channel(self, msg: dict):
+        if msg.get("Uniqueid") and msg["Uniqueid"] not in self._channels:
+            self._add_channel(msg)
+
+    def _on_new_state(self, msg: dict):
+        channel = self._channel_for(msg)
+        if channel is None:
+            return
+        channel["state"] = msg.get("ChannelStateDesc") or msg.get("ChannelState")
+        if msg.get("ChannelState") == STATE_UP and channel["uniqueid"] != channel["linkedid"]:
+            self._mark_answered(self._calls[channel["linkedid"]])
+
+    def _on_new_callerid(self, msg: dict):
+        channel = self._channel_for(msg)
+        if channel is None:
+            return
+        channel["caller_num"] = msg.get("CallerIDNum")
+        channel["caller_name"] = msg.get("CallerIDName")
+        call = self._calls[channel["linkedid"]]
+        if channel["uniqueid"] == call["linkedid"]:
+            call["caller_num"], call["caller_name"] = channel["caller_num"], channel["caller_name"]
+            if call["type"] == "incoming":
+                call["number"] = channel["caller_num"]
+
+    def _on_dial_begin(self, msg: dict):
+        dest = self._channel_for(msg, "Dest")
+        if dest is None:
+            return
+        call = self._calls[dest["linkedid"]]
+        if call["type"] == "outgoing":
+            if msg.get("DialString") and call["number"] in (None, "", "s"):
+                call["number"] = msg["DialString"].rpartition("/")[2]
+        elif call["extension"] is None and dest["extension"]:
+            call["extension"] = dest["extension"]
+
+    def _on_dial_end(self, msg: dict):
+        dest = self._channel_for(msg, "Dest")
+        if dest is None:
+            return
+        call = self._calls[dest["linkedid"]]
+        status = msg.get("DialStatus")
+        # With parallel dialing, keep the ANSWER over the CANCELs of the other legs
+        if call["dial_status"] != "ANSWER":
+            call["dial_status"] = status
+        if status == "ANSWER":
+            if call["type"] == "incoming" and dest["extension"]:
+                call["extension"] = dest["extension"]
+            self._mark_answered(call)
+
+    def _on_bridge_enter(self, msg: dict):
+        channel = self._channel_for(msg)
+        bridge = msg.get("BridgeUniqueid")
+        if channel is None or not bridge:
+            return
+        self._leave_bridge(channel)
+        channel["bridge"] = bridge
+        self._bridges.setdefault(bridge, {})[channel["uniqueid"]] = None
+
+    def _on_bridge_leave(self, msg: dict):
+        channel = self._channels.get(msg.get("Uniqueid"))
+        if channel is not None and channel["bridge"] == msg.get("BridgeUniqueid"):
+            self._leave_bridge(channel)
+
+    def _on_dtmf_begin(self, msg: dict):
+        channel = self._channel_for(msg)
+        if channel is not None and msg.get("Direction") == "Received":
+            channel["dtmf_digit"] = msg.get("Digit")
+
+    def _on_dtmf_end(self, msg: dict):
+        channel = self._channel_for(msg)
+        if channel is None or msg.get("Direction") != "Received":
+            return
+        channel.pop("dtmf_digit", None)
+        digit = msg.get("Digit", "")
+        channel["dtmf"] = (channel["dtmf"] + digit)[-MAX_DIGITS:]
+        call = self._calls[channel["linkedid"]]
+        call["digits"] = (call["digits"] + digit)[-MAX_DIGITS:]
+
+    def _on_hangup(self, msg: dict):
+        channel = self._remove_channel(msg.get("Uniqueid"))
+        if channel is None:
+            return
+        call = self._calls.get(channel["linkedid"])
+        if call is None:
+            return
+        call["channels"].pop(channel["uniqueid"], None)
+        if not call["channels"]:
+            del self._calls[call["linkedid"]]
+            self._finish_call(call, time.time())
+
+    def _finish_call(self, call: dict, ended: float):
+        if call["answered"] is not None:
+            status = "answered"
+            duration = int(round(ended - call["answered"]))
+        else:
+            status = "missed" if call["type"] == "incoming" else "failed"
+            duration = 0
+        self._emit("call.ended", {"linkedid": call["linkedid"], "status": status})
+        if self._call_history is None:
+            return
+        device_id = None
+        if call["extension"] and self._device_for_extension is not None:
+            device_id = self._device_for_extension(call["extension"])
+        self._call_history.add_call({
+            "uniqueid": call["linkedid"],
+            "channel": call["channel"],
+            "contact": call["caller_name"] if call["type"] == "incoming" else None,
+            "number": call["number"] or "",
+            "type": call["type"],
+            "status": status,
+            "duration": duration,
+            "timestamp": call["started"],
+            "device_id": device_id,
+        })
+
+    # -- reconciliation --------------------------------------------------
+
+    def _on_fully_booted(self, msg: dict):
+        if self._client is None:
+            return
+        if self._resync_task is not None and not self._resync_task.done():
+            return
+        self._resync_task = asyncio.get_running_loop().create_task(self.resync())
+
+    async def resync(self):
+        """Replace the tables with what Asterisk reports as currently up.
+
+        Channels created while the listing was in flight are kept. Calls
+        that vanished while we were disconnected are dropped rather than
+        written to history, since their end time is unknown.
+        """
+        self._created_since_resync = set()
+        try:
+            _, listed = await self._client.send_action_list("CoreShowChannels")
+        except Exception as exc:
+            logger.warning("Channel resync failed: %r", exc)
+            return
+        finally:
+            fresh, self._created_since_resync = self._created_since_resync, None
+
+        now = time.time()
+        seen = set(fresh)
+        for item in listed:
+            uniqueid = item.get("Uniqueid")
+            if not uniqueid:
+                continue
+            seen.add(uniqueid)
+            channel = self._channels.get(uniqueid)
+            if channel is None:
+                channel = self._add_channel(
+                    item, created=now - _parse_duration(item.get("Duration"))
+                )
+            channel["state"] = item.get("ChannelStateDesc") or channel["state"]
+            bridge = item.get("BridgeId")
+            if bridge and channel["bridge"] != bridge:
+                self._leave_bridge(channel)
+                channel["bridge"] = bridge
+                self._bridges.setdefault(bridge, {})[uniqueid] = None
+            if bridge and item.get("ChannelState") == STATE_UP:
+                self._mark_answered(self._calls[channel["linkedid"]])
+
+        for uniqueid in [u for u in self._channels if u not in seen]:
+            channel = self._remove_channel(uniqueid)
+            call = self._calls.get(channel["linkedid"])
+            if call is not None:
+                call["channels"].pop(uniqueid, None)
+                if not call["channels"]:
+                    del self._calls[call["linkedid"]]
+                    self._emit("call.ended", {"linkedid": call["linkedid"], "status": "unknown"})
+
+
+def _parse_duration(value) -> float:
+    """CoreShowChannel Duration ("HH:MM:SS") in seconds."""
+    try:
+        h, m, s = (int(part) for part in str(value).split(":"))
+    except ValueError:
+        return 0.0
+    return float(h * 3600 + m * 60 + s)
@@ -0,0 +1,405 @@
+"""Render Asterisk configs from backend state and reload only what changed.
+
+extensions.conf, pjsip.conf and voicemail.conf are generated from devices
+(an endpoint, mailbox and dialplan entry per device with a meta
+"extension") and hot dials (a `**<slot>` shortcut per assigned contact).
+Everything else in those files is fixed and lives in the templates below.
+
+`ConfigSync.sync()` renders all three, compares them section by section
+with what is on disk, atomically replaces only the files that differ and
+then issues the matching module reload over AMI. A `core reload` would
+stall active calls; "dialplan reload", "pjsip reload" and "voicemail
+reload" do not.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+ASTERISK_CONFIG_DIR = os.environ.get("ASTERISK_CONFIG_DIR")
+DEBOUNCE_SECONDS = 1.0
+
+# Used until at least one device has a meta "extension"
+DEFAULT_EXTENSIONS = ("1000", "1001", "1002")
+
+RELOAD_COMMANDS = {
+    "extensions.conf": "dialplan reload",
+    "pjsip.conf": "pjsip reload",
+    "voicemail.conf": "voicemail reload",
+}
+
+# Event types that can change the rendered configs
+_WATCHED_PREFIXES = ("device", "contact", "hot_dials", "resync")
+
+_EXTENSIONS_HEADER = """\
+[general]
+static=yes
+writeprotect=no
+clearglobalvars=no
+
+[globals]
+ATTENDED_TRANSFER_COMPLETE_SOUND=beep
+"""
+
+_EXTENSIONS_FOOTER = """\
+; Transfers and general features
+exten => *1,1,Answer()
+ same => n,Playback(vm-goodbye)
+ same => n,Hangup()
+
+exten => *2,1,Answer()
+ same => n,Voicemail(${EXTEN:1}@default)
+ same => n,Hangup()
+
+; Fallback
+exten => _X.,1,Playback(invalid)
+ same => n,Hangup()
+
+; External calls context
+[from-external]
+exten => _X.,1,Answer()
+ same => n,Playback(hello-world)
+ same => n,Hangup()
+
+; Voicemail context
+[from-voicemail]
+exten => *98,1,Answer()
+ same => n,VoiceMailMain(@default)
+ same => n,Hangup()
+"""
+
+_PJSIP_HEADER = """\
+[global]
+max_forwards=70
+user_agent=Asterisk PBX
+default_realm=asterisk
+
+[transport-udp]
+type=transport
+protocol=udp
+bind=0.0.0.0:5060
+
+[transport-tcp]
+type=transport
+protocol=tcp
+bind=0.0.0.0:5060
+
+[transport-tls]
+type=transport
+protocol=tls
+bind=0.0.0.0:5061
+cert_file=/etc/asterisk/keys/asterisk.crt
+priv_key_file=/etc/asterisk/keys/asterisk.key
+
+; Endpoint for SIP trunk
+[upstream-provider]
+type=endpoint
+context=from-external
+disallow=all
+allow=ulaw,alaw,gsm
+auth=upstream-auth
+outbound_auth=upstream-auth
+aors=upstream-aor
+
+[upstream-auth]
+type=auth
+auth_type=userpass
+username=trunk_user
+password=trunk_password
+
+[upstream-aor]
+type=aor
+contact=sip:sip.provider.com:5060
+"""
+
+_VOICEMAIL_HEADER = """\
+[general]
+; Voicemail general settings
+format=ulaw|gsm
+serveremail=asterisk@localhost
+attach=yes
+attachfmt=gsm
+maxmessage=180
+minmessage=3
+maxlogins=3
+emaildateformat=%A, %B %d, %Y at %l:%M %p
+externnotify=/usr/bin/play-notify-sound
+;externpass=/usr/bin/play-notify-sound
+; New password prompt length
+pwdchange=0
+"""
+
+_VOICEMAIL_FOOTER = """\
+; Voicemail greeting options
+; Format: 0 - no greeting, 1 - standard greeting, 2 - custom greeting
+[voicemailuserprefs]
+format=ulaw|gsm
+attach=yes
+
+; Advanced voicemail settings
+[zonemessages]
+eastern=America/New_York|'vm-received' Q 'digits/at' A
+central=America/Chicago|'vm-received' Q 'digits/at' A
+mountain=America/Denver|'vm-received' Q 'digits/at' A
+pacific=America/Los_Angeles|'vm-received' Q 'digits/at' A
+london=Europe/London|'vm-received' Q 'digits/at' A
+tokyo=Asia/Tokyo|'vm-received' Q 'digits/at' A
+sydney=Australia/Sydney|'vm-received' Q 'digits/at' A
+"""
+
+_DIAL_DIGITS = re.compile(r"[^0-9*#]")
+_UNSAFE = re.compile(r"[\r\n,;\[\]]")
+
+
+def _clean(value) -> str:
+    """Strip characters that would break a config line."""
+    return _UNSAFE.sub(" ", str(value)).strip()
+
+
+def endpoints_from_devices(devices):
+    """One endpoint spec per device that has a meta "extension", sorted by extension."""
+    endpoints = {}
+    for device in devices:
+        meta = device.get("meta", {})
+        extension = str(meta.get("extension") or "").strip()
+        if not extension.isdigit() or extension in endpoints:
+            continue
+        endpoints[extension] = {
+            "extension": extension,
+            "name": _clean(device.get("name") or f"User {extension}"),
+            "secret": _clean(meta.get("sip_secret") or extension),
+            "email": _clean(meta.get("email") or f"user{extension}@localhost"),
+        }
+    if not endpoints:
+        endpoints = {
+            ext: {
+                "extension": ext,
+                "name": f"User {ext}",
+                "secret": ext,
+                "email": f"user{ext}@localhost",
+            }
+            for ext in DEFAULT_EXTENSIONS
+        }
+    return [endpoints[ext] for ext in sorted(endpoints, key=lambda e: (len(e), e))]
+
+
+def render_extensions(endpoints, hot_dials) -> str:
+    internal = {e["extension"] for e in endpoints}
+    out = [
+        _EXTENSIONS_HEADER,
+        "; Internal context for SIP phones",
+        "[from-internal]",
+        "include => hot-dials",
+        "",
+    ]
+    out.append("; Call between internal extensions")
+    for e in endpoints:
+        ext = e["extension"]
+        out.append(f"exten => {ext},1,Dial(PJSIP/{ext},30)")
+        out.append(f" same => n,Voicemail({ext}@default)")
+        out.append(" same => n,Hangup()")
+        out.append("")
+    out.append(_EXTENSIONS_FOOTER)
+    out.append("; Hot dials (**1-**9)")
+    out.append("[hot-dials]")
+    for slot, contact in sorted(hot_dials.items()):
+        number = _DIAL_DIGITS.sub("", str(contact.get("phone") or ""))
+        if not number:
+            continue
+        target = f"PJSIP/{number}" if number in internal else f"PJSIP/{number}@upstream-provider"
+        out.append(f"; {_clean(contact.get('name', ''))}")
+        out.append(f"exten => **{slot},1,Dial({target},30)")
+        out.append(" same => n,Hangup()")
+    return "\n".join(out).rstrip("\n") + "\n"
+
+
+def render_pjsip(endpoints) -> str:
+    out = [_PJSIP_HEADER, "; Internal SIP endpoints"]
+    for e in endpoints:
+        ext = e["extension"]
+        out += [
+            f"[{ext}]", "type=endpoint", "context=from-internal", "disallow=all",
+            "allow=ulaw,alaw,gsm,opus", f"auth=auth{ext}", f"aors={ext}", "",
+            f"[auth{ext}]", "type=auth", "auth_type=userpass", f"username={ext}",
+            f"password={e['secret']}", "",
+            f"[{ext}]", "type=aor", "max_contacts=1", f"contact=sip:{ext}@", "",
+        ]
+    return "\n".join(out).rstrip("\n") + "\n"
+
+
+def render_voicemail(endpoints) -> str:
+    out = [_VOICEMAIL_HEADER, "[default]", "; Default voicemail context",
+           "; Format: mailbox => password,name,email,attach"]
+    for e in endpoints:
+        ext = e["extension"]
+        out.append(f"{ext} => {ext},{e['name']},{e['email']},attach=yes")
+    out += ["", _VOICEMAIL_FOOTER]
+    return "\n".join(out).rstrip("\n") + "\n"
+
+
+def render_all(devices, hot_dials) -> dict:
+    endpoints = endpoints_from_devices(devices)
+    return {
+        "extensions.conf": render_extensions(endpoints, hot_dials),
+        "pjsip.conf": render_pjsip(endpoints),
+        "voicemail.conf": render_voicemail(endpoints),
+    }
+
+
+def parse_sections(text: str) -> dict:
+    """Map section keys to their significant lines (comments and blanks dropped).
+
+    pjsip.conf reuses names across object types ([1000] endpoint and aor),
+    so repeated names are keyed "name#2", "name#3"...
+    """
+    sections = {}
+    seen = {}
+    current = ""
+    sections[current] = []
+    for raw in text.splitlines():
+        line = raw.split(";", 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith("[") and "]" in line:
+            name = line[1:line.index("]")]
+            seen[name] = seen.get(name, 0) + 1
+            current = name if seen[name] == 1 else f"{name}#{seen[name]}"
+            sections[current] = []
+        else:
+            sections[current].append(line)
+    return sections
+
+
+def diff_sections(old: str, new: str):
+    """Names of sections added, removed or changed between two config texts."""
+    a, b = parse_sections(old), parse_sections(new)
+    return sorted(name or "(top)" for name in a.keys() | b.keys() if a.get(name) != b.get(name))
+
+
+def write_atomic(path: Path, text: str):
+    """Replace `path` in one rename so Asterisk never reads a half-written file."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists():
+            os.chmod(tmp, path.stat().st_mode & 0o777)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class ConfigSync:
+    def __init__(self, client, device_mgr, contacts_mgr, config_dir=ASTERISK_CONFIG_DIR,
+                 publish=None, debounce: float = DEBOUNCE_SECONDS):
+        self._client = client
+        self._devices = device_mgr
+        self._contacts = contacts_mgr
+        self.config_dir = Path(config_dir) if config_dir else None
+        self._publish = publish  # optional callback(event_type, data)
+        self._debounce = debounce
+        self._pending_reloads = set()  # files written while AMI was unavailable
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.config_dir is not None
+
+    def render(self) -> dict:
+        devices, _ = self._devices.list_devices()
+        return render_all(devices, self._contacts.list_hot_dials())
+
+    async def sync(self, dry_run: bool = False) -> dict:
+        """Write changed files and reload just their modules."""
+        async with self._lock:
+            rendered = self.render()
+            changed = {}
+            for name, text in rendered.items():
+                path = self.config_dir / name
+                current = path.read_text(encoding="utf-8") if path.exists() else ""
+                if current == text:
+                    continue
+                changed[name] = diff_sections(current, text)
+                if not dry_run:
+                    write_atomic(path, text)
+                    if changed[name]:
+                        self._pending_reloads.add(name)
+            result = {"changed": changed, "reloaded": [], "dry_run": dry_run}
+            if dry_run:
+                return result
+            if self._pending_reloads and self._client.connected:
+                for name in sorted(self._pending_reloads):
+                    command = RELOAD_COMMANDS[name]
+                    try:
+                        await self._client.command(command)
+                    except Exception as exc:
+                        logger.warning("%s failed: %r", command, exc)
+                        result.setdefault("errors", {})[name] = str(exc)
+                        continue
+                    self._pending_reloads.discard(name)
+                    result["reloaded"].append(command)
+            result["pending_reloads"] = sorted(RELOAD_COMMANDS[n] for n in self._pending_reloads)
+            if changed and self._publish is not None:
+                self._publish("asterisk.config", result)
+            return result
+
+    # -- background task -------------------------------------------------
+
+    async def _run(self, bus):
+        sub = bus.subscribe()
+        try:
+            while True:
+                # The startup sync too: a failure (AMI down at boot) must not end the task
+                try:
+                    await self.sync()
+                except Exception:
+                    logger.exception("Asterisk config sync failed")
+                event = await sub.get()
+                while event is None or event["type"].split(".", 1)[0] not in _WATCHED_PREFIXES:
+                    event = await sub.get()
+                # Let a burst of edits (bulk import, several devices) settle first
+                await asyncio.sleep(self._debounce)
+                while sub.get_nowait() is not None:
+                    pass
+        finally:
+            sub.close()
+
+    def start(self, bus):
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(bus))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.contacts.contacts_manager import ContactsManager
+    from app.device.device_manager import DeviceManager
+
+    parser = argparse.ArgumentParser(
+        description="Render the Asterisk configs for the default state"
+    )
+    parser.add_argument("--out", default=".", help="directory to write the .conf files to")
+    out_dir = Path(parser.parse_args().out)
+    devices, _ = DeviceManager().list_devices()
+    for filename, text in render_all(devices, ContactsManager().list_hot_dials()).items():
+        write_atomic(out_dir / filename, text)
+        print(f"wrote {out_dir / filename}")
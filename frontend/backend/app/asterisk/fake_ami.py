@@ -0,0 +1,158 @@
+"""Minimal fake Asterisk Manager Interface server for local development.
+
+Speaks the AMI line protocol well enough to exercise AsteriskClient
+without a PBX: Login, Logoff, Ping, Command, CoreShowChannels (as an
+EventList) and async Originate (followed by an OriginateResponse event).
+Tests and benchmarks can push arbitrary events with `emit()`.
+
+Run standalone:  python -m app.asterisk.fake_ami --port 5038
+"""
+
+import argparse
+import asyncio
+
+from app.asterisk.asterisk_client import encode_message, read_message
+
+
+class FakeAMIServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, username: str = "admin",
+                 secret: str = "secret", latency: float = 0.0, originate_delay: float = 0.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.secret = secret
+        self.latency = latency                  # delay before each response
+        self.originate_delay = originate_delay  # delay before OriginateResponse
+        self.actions = []                       # every action received, in order
+        self.commands = []                      # Command: strings received
+        self.channels = []                      # CoreShowChannel fields to report
+        self.unanswered = set()                 # extensions whose Originate fails (no answer)
+        self._server = None
+        self._writers = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.drop_clients()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def drop_clients(self):
+        """Close every client connection (to exercise reconnects)."""
+        for writer in list(self._writers):
+            writer.close()
+        self._writers.clear()
+
+    def emit(self, event: dict):
+        """Send an unsolicited event to every logged-in client."""
+        for writer in list(self._writers):
+            writer.write(encode_message(event))
+
+    async def _handle(self, reader, writer):
+        writer.write(b"Asterisk Call Manager/5.0.0\r\n")
+        logged_in = False
+        try:
+            while True:
+                msg = await read_message(reader)
+                if msg is None:
+                    break
+                self.actions.append(msg)
+                action = msg.get("Action", "").lower()
+                action_id = msg.get("ActionID")
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                if action == "login":
+                    if msg.get("Username") == self.username and msg.get("Secret") == self.secret:
+                        logged_in = True
+                        self._writers.add(writer)
+                        self._reply(writer, action_id, Message="Authentication accepted")
+                        writer.write(
+                            encode_message({"Event": "FullyBooted", "Status": "Fully Booted"})
+                        )
+                    else:
+                        self._reply(writer, action_id, "Error", Message="Authentication failed")
+                elif not logged_in:
+                    self._reply(writer, action_id, "Error", Message="Permission denied")
+                elif action == "logoff":
+                    self._reply(writer, action_id, "Goodbye", Message="Thanks for all the fish.")
+                    await writer.drain()
+                    break
+                elif action == "ping":
+                    self._reply(writer, action_id, Ping="Pong")
+                elif action == "command":
+                    self.commands.append(msg.get("Command", ""))
+                    self._reply(
+                        writer,
+                        action_id,
+                        Message="Command output follows",
+                        Output=f"Executed: {msg.get('Command', '')}",
+                    )
+                elif action == "coreshowchannels":
+                    self._reply(
+                        writer, action_id, EventList="start", Message="Channels will follow"
+                    )
+                    for channel in self.channels:
+                        writer.write(
+                            encode_message(
+                                {"Event": "CoreShowChannel", "ActionID": action_id, **channel}
+                            )
+                        )
+                    writer.write(
+                        encode_message(
+                            {
+                                "Event": "CoreShowChannelsComplete",
+                                "ActionID": action_id,
+                                "EventList": "Complete",
+                                "ListItems": len(self.channels),
+                            }
+                        )
+                    )
+                elif action == "originate":
+                    self._reply(writer, action_id, Message="Originate successfully queued")
+                    asyncio.get_running_loop().create_task(self._originate_response(writer, msg))
+                else:
+                    self._reply(writer, action_id, "Error", Message="Invalid/unknown command")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    def _reply(writer, action_id, response: str = "Success", **fields):
+        writer.write(encode_message({"Response": response, "ActionID": action_id, **fields}))
+
+    async def _originate_response(self, writer, msg: dict):
+        if self.originate_delay:
+            await asyncio.sleep(self.originate_delay)
+        if writer.is_closing():
+            return
+        failed = msg.get("Exten") in self.unanswered
+        writer.write(encode_message({
+            "Event": "OriginateResponse",
+            "ActionID": msg.get("ActionID"),
+            "Response": "Failure" if failed else "Success",
+            "Channel": msg.get("Channel"),
+            "Context": msg.get("Context"),
+            "Exten": msg.get("Exten"),
+            "Reason": 3 if failed else 4,
+            "Uniqueid": f"fake.{len(self.actions)}",
+        }))
+
+
+async def _main(port: int):
+    server = await FakeAMIServer(port=port).start()
+    print(f"Fake AMI listening on {server.host}:{server.port} (admin/secret)")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5038)
+    asyncio.run(_main(parser.parse_args().port))
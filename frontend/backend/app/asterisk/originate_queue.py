@@ -0,0 +1,258 @@
+"""Rate-limited queue for originating many calls at once (paging, broadcast).
+
+Calls are queued per extension and handed to a fixed pool of workers, so
+at most `concurrency` Originate actions are outstanding and new ones start
+no faster than `rate` per second (token bucket, `burst` deep). Each call
+is sent with Async: true and resolves a future with its OriginateResponse
+outcome. Queuing an extension that is already queued or ringing returns
+the existing future instead of calling it twice.
+
+Progress is published as originate.queued / originate.started /
+originate.completed events.
+
+Batch throughput and tail latency against the fake AMI server, from
+frontend/backend:
+  python3 -m app.asterisk.originate_queue --bench
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 20.0      # Originate actions started per second
+DEFAULT_RING_TIMEOUT = 30.0
+MAX_QUEUED = 1000
+
+# OriginateResponse Reason codes
+REASONS = {
+    "0": "failed",
+    "1": "hangup",
+    "3": "no_answer",
+    "4": "answered",
+    "5": "busy",
+    "8": "congestion",
+}
+
+
+class OriginateQueueFull(RuntimeError):
+    """Raised when more than MAX_QUEUED calls are waiting."""
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _Job:
+    __slots__ = ("extension", "params", "future", "batch", "queued_at")
+
+    def __init__(self, extension: str, params: dict, future, batch):
+        self.extension = extension
+        self.params = params
+        self.future = future
+        self.batch = batch
+        self.queued_at = time.monotonic()
+
+
+class OriginateQueue:
+    def __init__(self, client, publish=None, concurrency: int = DEFAULT_CONCURRENCY,
+                 rate: float = DEFAULT_RATE, burst: int = None,
+                 ring_timeout: float = DEFAULT_RING_TIMEOUT, max_queued: int = MAX_QUEUED):
+        self._client = client
+        self._publish = publish  # optional callback(event_type, data)
+        self._concurrency = concurrency
+        self._bucket = _TokenBucket(rate, burst or concurrency)
+        self._ring_timeout = ring_timeout
+        self._queue = asyncio.Queue(maxsize=max_queued)
+        self._active = {}  # extension -> future, while queued or in flight
+        self._workers = []
+        self._batch_ids = itertools.count(1)
+        self.in_flight = 0
+
+    def _emit(self, event_type: str, data):
+        if self._publish is not None:
+            self._publish(event_type, data)
+
+    def _start_workers(self):
+        if not self._workers:
+            loop = asyncio.get_running_loop()
+            self._workers = [loop.create_task(self._worker()) for _ in range(self._concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        for future in self._active.values():
+            if not future.done():
+                future.cancel()
+        self._active.clear()
+
+    # -- submitting ------------------------------------------------------
+
+    def submit(self, extension, batch: int = None, **params):
+        """Queue a call and return (future, queued); `queued` is False for a duplicate.
+
+        `params` are passed to AsteriskClient.originate_call (context,
+        caller_id, variables...). The future resolves to a result dict.
+        """
+        extension = str(extension)
+        existing = self._active.get(extension)
+        if existing is not None:
+            return existing, False
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_Job(extension, params, future, batch))
+        except asyncio.QueueFull:
+            raise OriginateQueueFull(f"More than {self._queue.maxsize} calls queued") from None
+        self._active[extension] = future
+        self._start_workers()
+        self._emit("originate.queued", {"extension": extension, "batch": batch})
+        return future, True
+
+    def submit_many(self, extensions, **params):
+        """Queue one call per extension; returns (batch id, {extension: future}, duplicates).
+
+        All or nothing: raises OriginateQueueFull before queuing anything if
+        the new extensions do not all fit.
+        """
+        extensions = [str(extension) for extension in extensions]
+        new = {extension for extension in extensions if extension not in self._active}
+        if self._queue.maxsize and self._queue.qsize() + len(new) > self._queue.maxsize:
+            queued, limit = self._queue.qsize(), self._queue.maxsize
+            raise OriginateQueueFull(f"{len(new)} calls do not fit: {queued} of {limit} queued")
+        batch = next(self._batch_ids)
+        futures = {}
+        duplicates = []
+        for extension in extensions:
+            future, queued = self.submit(extension, batch=batch, **params)
+            futures[extension] = future
+            if not queued:
+                duplicates.append(extension)
+        return batch, futures, duplicates
+
+    async def originate_many(self, extensions, **params):
+        """Queue the calls and wait for all of them; returns {extension: result}."""
+        _, futures, _ = self.submit_many(extensions, **params)
+        results = await asyncio.gather(*futures.values())
+        return dict(zip(futures, results))
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    # -- workers ---------------------------------------------------------
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._bucket.take()
+                result = await self._originate(job)
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                if not job.future.done():
+                    job.future.cancel()  # worker stopped mid-call
+                self._active.pop(job.extension, None)
+                self._queue.task_done()
+
+    async def _originate(self, job: _Job):
+        started = time.monotonic()
+        self.in_flight += 1
+        self._emit("originate.started", {"extension": job.extension, "batch": job.batch})
+        result = {"extension": job.extension, "batch": job.batch, "success": False}
+        try:
+            # Asterisk gives up ringing at Timeout (ms); wait a little longer for its answer
+            params = {"Timeout": int(self._ring_timeout * 1000), **job.params}
+            event = await self._client.originate_call(
+                job.extension, timeout=self._ring_timeout + 5, wait=True, **params)
+            result["success"] = event.get("Response") == "Success"
+            result["reason"] = REASONS.get(str(event.get("Reason")), event.get("Reason"))
+            result["uniqueid"] = event.get("Uniqueid")
+        except asyncio.TimeoutError:
+            result["reason"] = "timeout"
+        except Exception as exc:
+            result["reason"] = "error"
+            result["error"] = str(exc)
+        finally:
+            self.in_flight -= 1
+        done = time.monotonic()
+        result["wait_seconds"] = round(started - job.queued_at, 3)
+        result["seconds"] = round(done - started, 3)
+        self._emit("originate.completed", result)
+        return result
+
+
+async def _bench_run(client, server, calls: int, concurrency: int, rate: float, ring: float):
+    import statistics
+
+    server.originate_delay = ring
+    sent_before = sum(1 for a in server.actions if a.get("Action") == "Originate")
+    queue = OriginateQueue(client, concurrency=concurrency, rate=rate, ring_timeout=5)
+    extensions = [str(2000 + n) for n in range(calls)]
+    extensions += extensions[:5]  # duplicates within the batch are dropped
+    start = time.monotonic()
+    results = await queue.originate_many(extensions)
+    elapsed = time.monotonic() - start
+    await queue.stop()
+    latencies = sorted(r["wait_seconds"] + r["seconds"] for r in results.values())
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    sent = sum(1 for a in server.actions if a.get("Action") == "Originate") - sent_before
+    limit = f"{concurrency} workers, {rate:g}/s" if rate < 1e6 else "unlimited"
+    print(
+        f"{calls} calls, {limit}, {ring:g} s ring: {elapsed:.2f} s, {calls / elapsed:.1f} calls/s,"
+        f" p50 {statistics.median(latencies):.2f} s, p99 {p99:.2f} s,"
+        f" {sent} Originates, {sum(not r['success'] for r in results.values())} unanswered"
+    )
+
+
+async def _bench():
+    from app.asterisk.asterisk_client import AsteriskClient
+    from app.asterisk.fake_ami import FakeAMIServer
+
+    server = await FakeAMIServer(latency=0.002).start()
+    server.unanswered = {"2003"}
+    client = AsteriskClient(server.host, server.port, server.username, server.secret)
+    await client.connect(wait=2)
+    try:
+        await _bench_run(client, server, 50, 8, 20.0, 0.2)
+        await _bench_run(client, server, 100, 20, 50.0, 0.5)
+        await _bench_run(client, server, 100, 100, 1e9, 0.0)
+    finally:
+        await client.close()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Origination throughput against the fake AMI server")
+    ap.add_argument("--bench", action="store_true")
+    opts = ap.parse_args()
+    if opts.bench:
+        asyncio.run(_bench())
+    else:
+        ap.print_help()
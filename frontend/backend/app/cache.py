@@ -0,0 +1,92 @@
+"""Validated in-memory cache for JSON API responses.
+
+Entries hold both the parsed data and the pre-serialized response body,
+keyed by a cache key plus a validator (typically the mtime/size of the
+backing files). When the validator changes the entry is rebuilt; otherwise
+the stored bytes are served as-is. Each body carries a strong ETag so
+repeat polls with `If-None-Match` get an empty 304.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def file_signature(*paths):
+    """Return a hashable (path, mtime_ns, size) tuple for each path.
+
+    Missing files contribute `(path, None, None)` so creating them later
+    invalidates the entry.
+    """
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append((str(path), st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append((str(path), None, None))
+    return tuple(sig)
+
+
+class CacheEntry:
+    __slots__ = ("validator", "data", "body", "etag")
+
+    def __init__(self, validator, data):
+        self.validator = validator
+        self.data = data
+        self.body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 128):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, key, validator, build):
+        """Return the entry for `key`, calling `build()` if missing or stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.validator == validator:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = CacheEntry(validator, build())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cached_json_response(request: Request, entry: CacheEntry) -> Response:
+    """Serve a cache entry, answering a matching `If-None-Match` with 304."""
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1 @@
+"""Call history module"""
@@ -0,0 +1,283 @@
+"""Call history store backed by SQLite.
+
+Calls live in an indexed table so `/api/calls` only reads the page it
+returns. Pages are ordered newest first and addressed with an opaque
+cursor built from the last row's (timestamp, id).
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from app.cache import file_signature
+
+# Public fields of a call; the dedupe keys (uniqueid, channel) stay internal
+CALL_FIELDS = ["contact", "number", "type", "status", "duration", "timestamp", "device_id"]
+
+# The live tracker and the CDR log both record each call; a call from one
+# is dropped when the other already stored a call on the same originating
+# channel that started within this window
+SAME_CALL_WINDOW = timedelta(seconds=2)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    contact TEXT,
+    number TEXT NOT NULL DEFAULT '',
+    type TEXT,
+    status TEXT,
+    duration INTEGER NOT NULL DEFAULT 0,
+    timestamp TEXT NOT NULL,
+    device_id INTEGER,
+    uniqueid TEXT,
+    channel TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calls_timestamp ON calls (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_calls_device ON calls (device_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_calls_status ON calls (status, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_calls_number ON calls (number, timestamp, id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_calls_uniqueid ON calls (uniqueid);
+CREATE INDEX IF NOT EXISTS idx_calls_channel ON calls (channel, timestamp);
+"""
+SCHEMA_VERSION = 2
+
+# Upgrades from the previous user_version to the next one
+_MIGRATIONS = {
+    0: "ALTER TABLE calls ADD COLUMN uniqueid TEXT",
+    1: "ALTER TABLE calls ADD COLUMN channel TEXT",
+}
+
+# Skips a call whose uniqueid is stored, or whose channel has a call starting close to it
+_INSERT = (
+    "INSERT OR IGNORE INTO calls"
+    " (id, contact, number, type, status, duration, timestamp, device_id, uniqueid, channel)"
+    " SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?"
+    " WHERE NOT EXISTS (SELECT 1 FROM calls WHERE channel = ? AND timestamp BETWEEN ? AND ?)"
+)
+
+
+def normalize_timestamp(value):
+    """Return `value` as a UTC ISO-8601 string ("YYYY-MM-DDTHH:MM:SSZ").
+
+    Stored timestamps share this fixed-width form so they sort and compare
+    correctly as plain strings.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str) and len(value) == 20 and value[10] == "T" and value[19] == "Z":
+        return value  # already normalized
+    if isinstance(value, (int, float)):
+        dt = datetime.fromtimestamp(value, tz=timezone.utc)
+    elif isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def encode_cursor(timestamp: str, call_id: int) -> str:
+    raw = f"{timestamp}|{call_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Decode a cursor produced by `encode_cursor`; raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, call_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        return timestamp, int(call_id)
+    except Exception as exc:
+        raise ValueError(f"invalid cursor: {cursor!r}") from exc
+
+
+class CallHistory:
+    def __init__(self, db_path, seed_path=None, on_change=None):
+        self._db_path = str(db_path)
+        if self._db_path != ":memory:":
+            Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._version = 0
+        self._on_change = on_change  # optional callback(event_type, data)
+        self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._conn.executescript(_SCHEMA)
+        if seed_path is not None:
+            self._seed_from_fixture(Path(seed_path))
+
+    def _migrate(self):
+        """Bring an existing database up to SCHEMA_VERSION."""
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'calls'"
+        ).fetchone()
+        if exists:
+            with self._conn:
+                for step in range(version, SCHEMA_VERSION):
+                    self._conn.execute(_MIGRATIONS[step])
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _seed_from_fixture(self, path: Path):
+        """Import the JSON fixture once, when the table is still empty."""
+        if not path.exists():
+            return
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM calls LIMIT 1").fetchone():
+                return
+        with open(path, "r", encoding="utf-8") as f:
+            calls = json.load(f)
+        self.add_calls(calls)
+
+    def signature(self):
+        """Validator for cached responses: changes whenever the table may have changed.
+
+        Combines the in-process write counter with the mtime/size of the
+        database and its WAL, so writes from another process are seen too.
+        """
+        if self._db_path == ":memory:":
+            return (self._version,)
+        return (self._version,) + file_signature(self._db_path, self._db_path + "-wal")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_values(call: dict):
+        """Column values for _INSERT: the row, then the channel and window it is checked against."""
+        timestamp = normalize_timestamp(call.get("timestamp")) or normalize_timestamp(
+            datetime.now(timezone.utc)
+        )
+        started = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")
+        channel = call.get("channel")
+        return (
+            call.get("id"),
+            call.get("contact"),
+            call.get("number") or "",
+            call.get("type"),
+            call.get("status"),
+            int(call.get("duration") or 0),
+            timestamp,
+            call.get("device_id"),
+            call.get("uniqueid"),
+            channel,
+            channel,
+            (started - SAME_CALL_WINDOW).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            (started + SAME_CALL_WINDOW).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        )
+
+    def add_call(self, call: dict):
+        """Append a single call and return it with its assigned id (None if a duplicate)."""
+        added = self.add_calls([call])
+        return added[0] if added else None
+
+    def add_calls(self, calls):
+        """Append several calls in one transaction and return them with ids.
+
+        Calls carrying an Asterisk `uniqueid` that is already stored are
+        skipped, and so are calls whose originating `channel` already has a
+        call starting within SAME_CALL_WINDOW. The same call arriving from
+        live events (keyed by linkedid) and from CDRs (keyed by uniqueid,
+        or channel + start without loguniqueid) is recorded once.
+        """
+        added = []
+        with self._lock, self._conn:
+            for call in calls:
+                values = self._row_values(call)
+                cur = self._conn.execute(_INSERT, values)
+                if cur.rowcount == 0:
+                    continue
+                entry = dict(zip(["id"] + CALL_FIELDS, values))  # drops the dedupe keys
+                entry["id"] = cur.lastrowid
+                added.append(entry)
+            if added:
+                self._version += 1
+        if self._on_change is not None:
+            for entry in added:
+                self._on_change("call.created", entry)
+        return added
+
+    def import_calls(self, calls) -> int:
+        """Bulk-insert calls without per-call events; returns how many were new.
+
+        Duplicates (by `uniqueid` or channel + start) are skipped as in `add_calls`.
+        """
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(_INSERT, map(self._row_values, calls))
+            inserted = self._conn.total_changes - before
+            if inserted:
+                self._version += 1
+        return inserted
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+
+    def list_calls(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str = None,
+        device_id: int = None,
+        since=None,
+        until=None,
+        call_type: str = None,
+        status: str = None,
+        number: str = None,
+    ):
+        """Return one page of calls, newest first, plus the cursor for the next page.
+
+        Every filter maps onto an indexed column, so the query reads at most
+        `limit + 1` rows regardless of history size.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses = []
+        params = []
+        if device_id is not None:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+        if call_type:
+            clauses.append("type = ?")
+            params.append(call_type)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if number:
+            clauses.append("number = ?")
+            params.append(number)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(normalize_timestamp(since))
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(normalize_timestamp(until))
+        if cursor:
+            ts, last_id = decode_cursor(cursor)
+            clauses.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([ts, ts, last_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (
+            f"SELECT id, {', '.join(CALL_FIELDS)} FROM calls {where}"
+            " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        )
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        calls = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = calls[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["id"])
+        return {"calls": calls, "next_cursor": next_cursor}
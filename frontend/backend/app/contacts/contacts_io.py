@@ -0,0 +1,163 @@
+"""Streaming CSV and vCard import/export for contacts.
+
+Parsers consume the request body chunk by chunk and yield one contact dict
+at a time; exporters yield one serialized contact at a time. Neither side
+holds the whole file in memory.
+"""
+
+import codecs
+import csv
+import io
+import re
+
+CSV_FIELDS = ["name", "phone", "email", "hot_dial"]
+
+
+async def iter_lines(chunks):
+    """Turn an async iterator of byte chunks into text lines (newline kept)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buf = ""
+    async for chunk in chunks:
+        buf += decoder.decode(chunk)
+        start = 0
+        while True:
+            nl = buf.find("\n", start)
+            if nl < 0:
+                break
+            yield buf[start:nl + 1]
+            start = nl + 1
+        buf = buf[start:]
+    buf += decoder.decode(b"", final=True)
+    if buf:
+        yield buf
+
+
+def _parse_hot_dial(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+async def parse_csv(lines):
+    """Yield contacts from CSV lines with a header row (name, phone, email, hot_dial)."""
+    header = None
+    record = ""
+    async for line in lines:
+        record += line
+        # A quoted field may span lines; wait until the quotes balance
+        if record.count('"') % 2:
+            continue
+        row = next(csv.reader([record]), [])
+        record = ""
+        if not any(cell.strip() for cell in row):
+            continue
+        if header is None:
+            header = [cell.strip().lower() for cell in row]
+            continue
+        values = dict(zip(header, row))
+        contact = {
+            "phone": values.get("phone", "").strip(),
+            "email": values.get("email", "").strip(),
+            "hot_dial": _parse_hot_dial(values.get("hot_dial")),
+        }
+        if values.get("name", "").strip():
+            contact["name"] = values["name"].strip()
+        yield contact
+
+
+_VCARD_UNESCAPES = {"n": "\n", "N": "\n"}  # any other escaped character stands for itself
+
+
+def _vcard_unescape(value: str) -> str:
+    # One left-to-right pass, so an escaped backslash never starts another escape
+    return re.sub(r"\\(.)", lambda m: _VCARD_UNESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def _vcard_escape(value: str) -> str:
+    return (
+        (value or "")
+        .replace("\\", "\\\\")
+        .replace(",", "\\,")
+        .replace(";", "\\;")
+        .replace("\n", "\\n")
+    )
+
+
+def _vcard_contact(props):
+    contact = {"phone": "", "email": "", "hot_dial": None}
+    for name, value in props:
+        if name == "FN":
+            contact["name"] = _vcard_unescape(value)
+        elif name == "N" and not contact.get("name"):
+            parts = [p for p in _vcard_unescape(value).split(";") if p]
+            if parts:
+                contact["name"] = " ".join(reversed(parts[:2]))
+        elif name == "TEL" and not contact["phone"]:
+            contact["phone"] = value.strip()
+        elif name == "EMAIL" and not contact["email"]:
+            contact["email"] = value.strip()
+        elif name == "X-LOOPED-HOTDIAL":
+            contact["hot_dial"] = _parse_hot_dial(value.strip())
+    return contact
+
+
+async def parse_vcard(lines):
+    """Yield contacts from a stream of vCard 2.1/3.0/4.0 records."""
+    props = None
+    current = None  # logical line being unfolded
+
+    def flush_line():
+        if current is None or props is None:
+            return
+        key, sep, value = current.partition(":")
+        if sep:
+            # Drop parameters (TEL;TYPE=cell) and group prefixes (item1.TEL)
+            name = key.split(";", 1)[0].rsplit(".", 1)[-1].upper()
+            props.append((name, value))
+
+    async for raw in lines:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            if current is not None:
+                current += line[1:]
+            continue
+        flush_line()
+        current = line
+        upper = line.strip().upper()
+        if upper == "BEGIN:VCARD":
+            props = []
+            current = None
+        elif upper == "END:VCARD":
+            if props is not None:
+                yield _vcard_contact(props)
+            props = None
+            current = None
+    flush_line()
+
+
+def export_csv(contacts):
+    """Yield CSV text for contacts, one row per chunk."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_FIELDS)
+    yield buf.getvalue()
+    for contact in contacts:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(["" if contact.get(f) is None else contact.get(f) for f in CSV_FIELDS])
+        yield buf.getvalue()
+
+
+def export_vcard(contacts):
+    """Yield vCard 3.0 text for contacts, one card per chunk."""
+    for contact in contacts:
+        lines = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{_vcard_escape(contact.get('name'))}"]
+        if contact.get("phone"):
+            lines.append(f"TEL;TYPE=voice:{contact['phone']}")
+        if contact.get("email"):
+            lines.append(f"EMAIL:{contact['email']}")
+        if contact.get("hot_dial"):
+            lines.append(f"X-LOOPED-HOTDIAL:{contact['hot_dial']}")
+        lines.append("END:VCARD")
+        yield "\r\n".join(lines) + "\r\n"
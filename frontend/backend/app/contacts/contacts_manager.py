@@ -1,12 +1,70 @@
-"""Contacts management with hot dial support"""
+"""Contacts management with hot dial support
+
+Lookup cost against the old list scans, from frontend/backend:
+  python3 -m app.contacts.contacts_manager --bench
+"""
+
+from app.contacts.phone_index import PhoneIndex
+
 
 class ContactsManager:
-    def __init__(self):
-        self._contacts = []
+    def __init__(self, store=None, on_change=None):
+        # id -> contact; dicts keep insertion order, so listing stays stable
+        self._contacts = {}
         self._next_id = 1
-        self._hot_dials = {}  # Maps 1-9 to contact_id
+        self._hot_dials = {}  # Maps 1-9 to contact_id; contact["hot_dial"] is the reverse
+        self._phone_index = PhoneIndex()  # caller-ID lookup by normalized number
+        self._store = store  # optional JournalStore for persistence
+        self._pending = None  # id -> record (None = deleted) while a bulk() is running
+        self._held_events = []  # events emitted during bulk(), published once it is journaled
+        self._on_change = on_change  # optional callback(event_type, data)
+        self._dirty_slots = set()  # hot dial slots changed by the current operation
+        if store is not None:
+            records, meta = store.load()
+            if not store.is_empty():
+                self._restore(records, meta)
+                return
         self._initialize_default_contacts()
 
+    def _restore(self, records: dict, meta: dict):
+        """Rebuild contacts and indexes from persisted records"""
+        for contact in records.values():
+            self._contacts[contact["id"]] = contact
+            if contact.get("hot_dial"):
+                self._hot_dials[contact["hot_dial"]] = contact["id"]
+            self._phone_index.add(contact["id"], contact.get("phone"))
+        self._next_id = meta.get("next_id", max(self._contacts, default=0) + 1)
+
+    def _save(self, contact: dict):
+        if self._pending is not None:
+            self._pending[contact["id"]] = contact
+        elif self._store is not None:
+            self._store.put(contact["id"], contact)
+
+    def _drop(self, contact_id: int):
+        if self._pending is not None:
+            self._pending[contact_id] = None
+        elif self._store is not None:
+            self._store.delete(contact_id)
+
+    def _emit(self, event_type: str, data):
+        if self._pending is not None:
+            self._held_events.append((event_type, data))
+        elif self._on_change is not None:
+            self._on_change(event_type, data)
+
+    def _emit_hot_dials(self):
+        """Publish the hot dial slots touched since the last call (deferred during bulk)"""
+        if self._pending is not None or not self._dirty_slots:
+            return
+        changed = {slot: self._hot_dials.get(slot) for slot in sorted(self._dirty_slots)}
+        self._dirty_slots.clear()
+        self._emit("hot_dials.changed", changed)
+
+    def _save_next_id(self):
+        if self._pending is None and self._store is not None:
+            self._store.set_meta(next_id=self._next_id)
+
     def _initialize_default_contacts(self):
         """Initialize with default contacts"""
         default_contacts = [
@@ -33,6 +91,30 @@ class ContactsManager:
         for contact in default_contacts:
             self.add_contact(contact)
 
+    @staticmethod
+    def _valid_hot_dial(hot_dial):
+        return isinstance(hot_dial, int) and 1 <= hot_dial <= 9
+
+    def _release_hot_dial(self, contact: dict):
+        """Clear a contact's hot dial slot, if it has one"""
+        hot_dial = contact["hot_dial"]
+        if hot_dial and self._hot_dials.get(hot_dial) == contact["id"]:
+            del self._hot_dials[hot_dial]
+            self._dirty_slots.add(hot_dial)
+        contact["hot_dial"] = None
+
+    def _assign_hot_dial(self, contact: dict, hot_dial: int):
+        """Give a contact a hot dial slot, taking it from its previous owner"""
+        self._release_hot_dial(contact)
+        old_id = self._hot_dials.get(hot_dial)
+        if old_id is not None and old_id in self._contacts and old_id != contact["id"]:
+            self._contacts[old_id]["hot_dial"] = None
+            self._save(self._contacts[old_id])
+            self._emit("contact.updated", dict(self._contacts[old_id]))
+        contact["hot_dial"] = hot_dial
+        self._hot_dials[hot_dial] = contact["id"]
+        self._dirty_slots.add(hot_dial)
+
     def add_contact(self, contact: dict):
         """Add a new contact"""
         contact_entry = {
@@ -42,88 +124,237 @@ class ContactsManager:
             "email": contact.get("email", ""),
             "hot_dial": None
         }
-        
+        self._next_id += 1
+        self._contacts[contact_entry["id"]] = contact_entry
+        self._phone_index.add(contact_entry["id"], contact_entry["phone"])
+
         # Assign hot dial if provided
         hot_dial = contact.get("hot_dial")
-        if hot_dial and 1 <= hot_dial <= 9:
-            # Remove old assignment if exists
-            old_contact = self._hot_dials.get(hot_dial)
-            if old_contact:
-                for c in self._contacts:
-                    if c["id"] == old_contact:
-                        c["hot_dial"] = None
-            
-            contact_entry["hot_dial"] = hot_dial
-            self._hot_dials[hot_dial] = self._next_id
-        
-        self._next_id += 1
-        self._contacts.append(contact_entry)
+        if self._valid_hot_dial(hot_dial):
+            self._assign_hot_dial(contact_entry, hot_dial)
+        self._save(contact_entry)
+        self._save_next_id()
+        self._emit("contact.created", dict(contact_entry))
+        self._emit_hot_dials()
         return contact_entry
 
     def list_contacts(self):
         """Get all contacts"""
-        return self._contacts
+        return list(self._contacts.values())
 
     def get_contact(self, contact_id: int):
         """Get a specific contact"""
-        for c in self._contacts:
-            if c["id"] == contact_id:
-                return c
-        return None
+        return self._contacts.get(contact_id)
 
     def update_contact(self, contact_id: int, updates: dict):
         """Update a contact"""
-        for c in self._contacts:
-            if c["id"] == contact_id:
-                c.update({k: v for k, v in updates.items() if k in ["name", "phone", "email"]})
-                
-                # Handle hot dial updates
-                if "hot_dial" in updates:
-                    hot_dial = updates["hot_dial"]
-                    # Remove old assignment
-                    if c["hot_dial"]:
-                        del self._hot_dials[c["hot_dial"]]
-                    
-                    # Assign new hot dial
-                    if hot_dial and 1 <= hot_dial <= 9:
-                        # Remove from other contact
-                        old_contact = self._hot_dials.get(hot_dial)
-                        if old_contact:
-                            for other in self._contacts:
-                                if other["id"] == old_contact:
-                                    other["hot_dial"] = None
-                        
-                        c["hot_dial"] = hot_dial
-                        self._hot_dials[hot_dial] = contact_id
-                    else:
-                        c["hot_dial"] = None
-                
-                return c
-        return None
+        c = self._contacts.get(contact_id)
+        if c is None:
+            return None
+        c.update({k: v for k, v in updates.items() if k in ["name", "phone", "email"]})
+        if "phone" in updates:
+            self._phone_index.add(contact_id, c["phone"])
+
+        # Handle hot dial updates
+        if "hot_dial" in updates:
+            hot_dial = updates["hot_dial"]
+            if self._valid_hot_dial(hot_dial):
+                self._assign_hot_dial(c, hot_dial)
+            else:
+                self._release_hot_dial(c)
+        self._save(c)
+        self._emit("contact.updated", dict(c))
+        self._emit_hot_dials()
+        return c
 
     def delete_contact(self, contact_id: int):
         """Delete a contact"""
-        for i, c in enumerate(self._contacts):
-            if c["id"] == contact_id:
-                if c["hot_dial"]:
-                    del self._hot_dials[c["hot_dial"]]
-                self._contacts.pop(i)
-                return True
-        return False
+        c = self._contacts.pop(contact_id, None)
+        if c is None:
+            return False
+        self._release_hot_dial(c)
+        self._phone_index.remove(contact_id)
+        self._drop(contact_id)
+        self._emit("contact.deleted", {"id": contact_id})
+        self._emit_hot_dials()
+        return True
+
+    @staticmethod
+    def _normalize(payload, with_id: bool) -> dict:
+        """Check one bulk create/update payload; returns a cleaned copy or raises ValueError"""
+        if not isinstance(payload, dict):
+            raise ValueError(f"Contact must be an object: {payload!r}")
+        clean = {}
+        for field in ("name", "phone", "email"):
+            value = payload.get(field)
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                raise ValueError(f"Contact {field} must be a string: {value!r}")
+            clean[field] = value
+        if "hot_dial" in payload:
+            hot_dial = payload["hot_dial"]
+            if hot_dial is not None and (isinstance(hot_dial, bool) or not isinstance(hot_dial, int)
+                                         or not 0 <= hot_dial <= 9):
+                raise ValueError(f"hot_dial must be 1-9 or null: {hot_dial!r}")
+            clean["hot_dial"] = hot_dial or None
+        if with_id:
+            clean["id"] = payload.get("id")
+        return clean
+
+    def _rebuild_phone_index(self):
+        self._phone_index = PhoneIndex()
+        for contact_id, contact in self._contacts.items():
+            self._phone_index.add(contact_id, contact.get("phone"))
+
+    def bulk(self, create=(), update=(), delete=()):
+        """Apply creates, then updates, then deletes as a single unit.
+
+        Every payload and id is checked first, so a bad request changes
+        nothing (raises ValueError); should anything still fail midway,
+        the in-memory state is rolled back. The whole batch is journaled
+        as one entry and its events are published after that.
+        """
+        if not all(isinstance(items, (list, tuple)) for items in (create, update, delete)):
+            raise ValueError("create, update and delete must be lists")
+        create = [self._normalize(contact, with_id=False) for contact in create]
+        update = [self._normalize(changes, with_id=True) for changes in update]
+        for contact_id in [changes["id"] for changes in update] + list(delete):
+            if not isinstance(contact_id, int) or contact_id not in self._contacts:
+                raise ValueError(f"Contact not found: {contact_id!r}")
+
+        saved = ({cid: dict(c) for cid, c in self._contacts.items()}, dict(self._hot_dials),
+                 self._next_id, set(self._dirty_slots))
+        self._pending = {}
+        self._held_events = []
+        try:
+            created = [self.add_contact(contact) for contact in create]
+            updated = [self.update_contact(changes["id"], changes) for changes in update]
+            deleted = [contact_id for contact_id in delete if self.delete_contact(contact_id)]
+            pending, self._pending = self._pending, None
+            if self._store is not None:
+                self._store.write_batch(
+                    puts=[(cid, c) for cid, c in pending.items() if c is not None],
+                    deletes=[cid for cid, c in pending.items() if c is None],
+                    meta={"next_id": self._next_id} if created else None,
+                )
+        except Exception:
+            self._contacts, self._hot_dials, self._next_id, self._dirty_slots = saved
+            self._rebuild_phone_index()
+            raise
+        finally:
+            self._pending = None
+            held, self._held_events = self._held_events, []
+
+        for event_type, data in held:
+            self._emit(event_type, data)
+        self._emit_hot_dials()
+        return {"created": created, "updated": updated, "deleted": deleted}
+
+    def lookup_number(self, number: str):
+        """Resolve a caller's number (any format, including SIP URIs) to a contact"""
+        contact_id = self._phone_index.lookup(number)
+        if contact_id is not None:
+            return self._contacts.get(contact_id)
+        return None
 
     def get_hot_dial(self, dial_number: int):
         """Get contact for a hot dial number"""
-        if 1 <= dial_number <= 9:
-            contact_id = self._hot_dials.get(dial_number)
-            if contact_id:
-                return self.get_contact(contact_id)
+        contact_id = self._hot_dials.get(dial_number)
+        if contact_id is not None:
+            return self._contacts.get(contact_id)
         return None
 
     def list_hot_dials(self):
         """Get all hot dial assignments"""
-        result = {}
-        for dial_num in range(1, 10):
-            contact_id = self._hot_dials.get(dial_num)
-            if contact_id:
-                result[dial_num] = self.get_contact(contact_id)
-        return result
+        return {
+            dial_num: self._contacts[contact_id]
+            for dial_num, contact_id in sorted(self._hot_dials.items())
+        }
+
+
+def _legacy_get(contacts: list, contact_id: int):
+    """The list scans ContactsManager used before, kept for benchmark comparison."""
+    for c in contacts:
+        if c["id"] == contact_id:
+            return c
+    return None
+
+
+def _legacy_set_hot_dial(contacts: list, hot_dials: dict, contact_id: int, hot_dial: int):
+    c = _legacy_get(contacts, contact_id)
+    if c["hot_dial"]:
+        del hot_dials[c["hot_dial"]]
+    old_id = hot_dials.get(hot_dial)
+    if old_id:
+        for other in contacts:
+            if other["id"] == old_id:
+                other["hot_dial"] = None
+    c["hot_dial"] = hot_dial
+    hot_dials[hot_dial] = contact_id
+
+
+def _legacy_list_hot_dials(contacts: list, hot_dials: dict):
+    return {n: _legacy_get(contacts, hot_dials[n]) for n in range(1, 10) if hot_dials.get(n)}
+
+
+def _legacy_delete(contacts: list, hot_dials: dict, contact_id: int):
+    for i, c in enumerate(contacts):
+        if c["id"] == contact_id:
+            if c["hot_dial"]:
+                del hot_dials[c["hot_dial"]]
+            contacts.pop(i)
+            return True
+    return False
+
+
+def _bench(sizes, ops: int):
+    """Per-contact cost of get + hot dial update + list_hot_dials + delete."""
+    import random
+    import time
+
+    for size in sizes:
+        ids = random.sample(range(1, size + 1), ops)
+
+        contacts = [{"id": i, "name": f"c{i}", "phone": f"{i:07d}", "email": "", "hot_dial": None}
+                    for i in range(1, size + 1)]
+        hot_dials = {}
+        start = time.perf_counter()
+        for n, contact_id in enumerate(ids):
+            _legacy_get(contacts, contact_id)
+            _legacy_set_hot_dial(contacts, hot_dials, contact_id, n % 9 + 1)
+            _legacy_list_hot_dials(contacts, hot_dials)
+            _legacy_delete(contacts, hot_dials, contact_id)
+        legacy = (time.perf_counter() - start) / ops
+
+        mgr = ContactsManager()
+        for i in range(1, size + 1):
+            mgr.add_contact({"name": f"c{i}", "phone": f"{i:07d}"})
+        start = time.perf_counter()
+        for n, contact_id in enumerate(ids):
+            mgr.get_contact(contact_id)
+            mgr.update_contact(contact_id, {"hot_dial": n % 9 + 1})
+            mgr.list_hot_dials()
+            mgr.delete_contact(contact_id)
+        indexed = (time.perf_counter() - start) / ops
+
+        print(
+            f"{size:>7} contacts: list scans {legacy * 1e6:9.1f} us"
+            f"   indexed {indexed * 1e6:7.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(
+        description="ContactsManager lookup cost against the old list scans"
+    )
+    ap.add_argument("--bench", action="store_true")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    ap.add_argument("--ops", type=int, default=200, help="contacts touched per size")
+    opts = ap.parse_args()
+    if opts.bench:
+        _bench(opts.sizes, opts.ops)
+    else:
+        ap.print_help()
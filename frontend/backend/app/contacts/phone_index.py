@@ -0,0 +1,134 @@
+"""Phone number normalization and caller-ID lookup index.
+
+Numbers are canonicalized to bare E.164-style digit strings and stored in a
+trie keyed on the reversed digits. A lookup walks the caller's number from
+its last digit, so "+1-555-0100", "15550100", "<sip:5550100@pbx>" and
+"011 1 555 0100" all resolve to the same contact via the longest shared
+suffix.
+"""
+
+import re
+
+DEFAULT_COUNTRY_CODE = "1"
+
+# Shortest suffix accepted as a match when the numbers differ in length;
+# shorter numbers (extensions, 911) must match exactly.
+MIN_SUFFIX_MATCH = 7
+
+_SIP_USER_RE = re.compile(r"(?:sips?|tel):([^@;>]+)", re.IGNORECASE)
+
+
+def normalize_number(raw, country_code: str = DEFAULT_COUNTRY_CODE) -> str:
+    """Return the canonical digit string for a phone number, SIP URI or extension.
+
+    Accepts display forms like '"Bob" <sip:+15550100@host>'. International
+    prefixes ("+", "00", "011") are stripped, and ten-digit national numbers
+    get `country_code` prepended. Returns "" if there are no digits.
+    """
+    if raw is None:
+        return ""
+    text = str(raw).strip()
+    m = _SIP_USER_RE.search(text)
+    if m:
+        text = m.group(1)
+
+    international = text.startswith("+")
+    digits = "".join(ch for ch in text if ch.isdigit())
+    if not international:
+        if digits.startswith("011"):
+            digits = digits[3:]
+        elif digits.startswith("00"):
+            digits = digits[2:]
+        elif country_code == "1" and len(digits) == 10:
+            digits = country_code + digits
+    return digits
+
+
+class _Node:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+
+
+class PhoneIndex:
+    """Reverse-digit trie mapping normalized numbers to contact ids."""
+
+    def __init__(self, country_code: str = DEFAULT_COUNTRY_CODE):
+        self._country_code = country_code
+        self._root = _Node()
+        self._numbers = {}  # contact_id -> normalized number
+
+    def add(self, contact_id: int, number):
+        """Index (or re-index) a contact's number"""
+        self.remove(contact_id)
+        digits = normalize_number(number, self._country_code)
+        if not digits:
+            return
+        node = self._root
+        for ch in reversed(digits):
+            node = node.children.setdefault(ch, _Node())
+        node.ids.add(contact_id)
+        self._numbers[contact_id] = digits
+
+    def remove(self, contact_id: int):
+        """Drop a contact from the index, pruning empty branches"""
+        digits = self._numbers.pop(contact_id, None)
+        if digits is None:
+            return
+        path = [self._root]
+        for ch in reversed(digits):
+            path.append(path[-1].children[ch])
+        path[-1].ids.discard(contact_id)
+        for depth in range(len(digits), 0, -1):
+            node = path[depth]
+            if node.ids or node.children:
+                break
+            del path[depth - 1].children[digits[-depth]]
+
+    def lookup(self, number):
+        """Return the id of the contact best matching `number`, or None.
+
+        Exact matches win. Otherwise the stored number sharing the longest
+        suffix with the query is returned, provided that suffix covers one
+        of the two numbers entirely and is at least MIN_SUFFIX_MATCH digits.
+        Ties go to the lowest (oldest) contact id.
+        """
+        digits = normalize_number(number, self._country_code)
+        if not digits:
+            return None
+
+        node = self._root
+        best = None
+        for depth, ch in enumerate(reversed(digits), start=1):
+            node = node.children.get(ch)
+            if node is None:
+                break
+            if node.ids and (depth >= MIN_SUFFIX_MATCH or depth == len(digits)):
+                best = node.ids
+        else:
+            # Query fully consumed: exact hit, or the query is a suffix of
+            # longer stored numbers (e.g. dialled without country code).
+            if node.ids:
+                return min(node.ids)
+            if len(digits) >= MIN_SUFFIX_MATCH:
+                found = self._nearest_ids(node)
+                if found:
+                    return min(found)
+        return min(best) if best else None
+
+    @staticmethod
+    def _nearest_ids(node: _Node):
+        level = [node]
+        while level:
+            found = set()
+            for n in level:
+                found |= n.ids
+            if found:
+                return found
+            level = [child for n in level for child in n.children.values()]
+        return None
+
+    def __len__(self):
+        return len(self._numbers)
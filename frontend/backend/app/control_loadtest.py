@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""control_loadtest.py
+
+Measures /keypress latency on a running pjsua_client while other clients
+hammer its HTTP server: keep-alive /status pollers, /events long-polls and
+connections that send half a request and then stall.
+
+  python3 control_loadtest.py --url http://127.0.0.1:5050 --pollers 8 --long-polls 4 --stalled 4
+
+Key presses open a fresh connection each, like keypad_dtmf.py does. The
+pressed key ("*" by default) is not handled outside a call, so the run
+does not touch call state. Latency is reported idle first, then under load.
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import statistics
+import threading
+import time
+import urllib.parse
+
+
+def press(host: str, port: int, key: str) -> float:
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        conn.request(
+            "POST", "/keypress", json.dumps({"key": key}), {"Content-Type": "application/json"}
+        )
+        conn.getresponse().read()
+    finally:
+        conn.close()
+    return time.perf_counter() - start
+
+
+def poller(host: str, port: int, stop: threading.Event, counter: list):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    while not stop.is_set():
+        try:
+            conn.request("GET", "/status")
+            conn.getresponse().read()
+            counter[0] += 1
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            time.sleep(0.05)
+    conn.close()
+
+
+def long_poller(host: str, port: int, stop: threading.Event):
+    conn = http.client.HTTPConnection(host, port, timeout=70)
+    seq = 0
+    while not stop.is_set():
+        try:
+            conn.request("GET", f"/events?since={seq}&timeout=5")
+            seq = json.loads(conn.getresponse().read())["seq"]
+        except (OSError, http.client.HTTPException, ValueError, KeyError):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=70)
+            time.sleep(0.05)
+    conn.close()
+
+
+def stalled(host: str, port: int, stop: threading.Event):
+    """Keep a connection that never finishes its request line, reopening it when dropped."""
+    while not stop.is_set():
+        try:
+            sock = socket.create_connection((host, port), timeout=30)
+            sock.sendall(b"GET /sta")
+            sock.recv(1)  # returns once the server gives up on us
+            sock.close()
+        except OSError:
+            time.sleep(0.05)
+
+
+def measure(host: str, port: int, key: str, presses: int, interval: float):
+    latencies = []
+    failures = 0
+    for _ in range(presses):
+        try:
+            latencies.append(press(host, port, key))
+        except (OSError, http.client.HTTPException):
+            failures += 1
+        time.sleep(interval)
+    return latencies, failures
+
+
+def report(label: str, latencies, failures: int):
+    if not latencies:
+        print(f"{label}: no successful presses ({failures} failed)")
+        return
+    ms = sorted(x * 1000 for x in latencies)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(f"{label}: n={len(ms)} p50={statistics.median(ms):.2f}ms p95={p95:.2f}ms "
+          f"max={ms[-1]:.2f}ms failed={failures}")
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Key press latency under concurrent control-server load"
+    )
+    ap.add_argument("--url", default="http://127.0.0.1:5050")
+    ap.add_argument("--key", default="*")
+    ap.add_argument("--presses", type=int, default=200)
+    ap.add_argument("--interval", type=float, default=0.02, help="seconds between presses")
+    ap.add_argument("--pollers", type=int, default=8, help="keep-alive /status loops")
+    ap.add_argument("--long-polls", type=int, default=4, help="/events long-poll loops")
+    ap.add_argument("--stalled", type=int, default=4, help="connections that stall mid-request")
+    opts = ap.parse_args()
+
+    url = urllib.parse.urlsplit(opts.url)
+    host, port = url.hostname, url.port or 80
+
+    report("idle", *measure(host, port, opts.key, opts.presses, opts.interval))
+
+    stop = threading.Event()
+    counter = [0]
+    threads = [threading.Thread(target=poller, args=(host, port, stop, counter), daemon=True)
+               for _ in range(opts.pollers)]
+    threads += [threading.Thread(target=long_poller, args=(host, port, stop), daemon=True)
+                for _ in range(opts.long_polls)]
+    threads += [threading.Thread(target=stalled, args=(host, port, stop), daemon=True)
+                for _ in range(opts.stalled)]
+    for t in threads:
+        t.start()
+    time.sleep(0.5)
+    start, before = time.perf_counter(), counter[0]
+    loaded = measure(host, port, opts.key, opts.presses, opts.interval)
+    polls = (counter[0] - before) / (time.perf_counter() - start)
+    stop.set()
+    report(f"under load ({opts.pollers} pollers at {polls:,.0f} req/s, "
+           f"{opts.long_polls} long-polls, {opts.stalled} stalled)", *loaded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Free-pool allocator for LDxxxx device hostname codes.
+
+The free codes wait in a FIFO queue, shuffled once at startup, so the
+handed-out codes still look random and a released code goes to the back:
+it is only reused after every other free code, which keeps a stale device
+from colliding with a new owner of its old code. Free codes map to the
+ticket of their live queue entry, so reserve is O(1) (the entry goes stale
+and is skipped later), allocate is amortized O(1) and release is O(1).
+
+released() lists the released codes still waiting, oldest first; passing
+that list back as `released` after a restart puts them behind every other
+free code again instead of reshuffling them into the pool.
+"""
+
+import collections
+import itertools
+import random
+
+CODE_SPACE = 10000  # LD0000-LD9999
+
+
+class CodeExhaustedError(RuntimeError):
+    """Raised when every hostname code is in use."""
+
+
+def format_code(code: int) -> str:
+    return f"LD{code:04d}"
+
+
+def parse_code(hostname: str) -> int:
+    """Return the numeric code of an LDxxxx hostname; raises ValueError otherwise."""
+    if len(hostname) != 6 or hostname[:2].upper() != "LD" or not hostname[2:].isdigit():
+        raise ValueError(f"not a Looped hostname: {hostname!r}")
+    return int(hostname[2:])
+
+
+class CodeAllocator:
+    def __init__(self, used=(), size: int = CODE_SPACE, rng: random.Random = None, released=()):
+        used = set(used)
+        released = [c for c in dict.fromkeys(released) if c in range(size) and c not in used]
+        free = [code for code in range(size) if code not in used and code not in set(released)]
+        (rng or random).shuffle(free)
+        self._tickets = itertools.count()
+        self._queue = collections.deque((next(self._tickets), code) for code in free + released)
+        self._free = {code: ticket for ticket, code in self._queue}  # code -> live queue entry
+        self._released = dict.fromkeys(released)  # ordered set of released codes still free
+
+    def allocate(self) -> int:
+        while self._queue:
+            ticket, code = self._queue.popleft()
+            if self._free.get(code) == ticket:  # otherwise reserved (and maybe released) since
+                del self._free[code]
+                self._released.pop(code, None)
+                return code
+        raise CodeExhaustedError("All LD0000-LD9999 hostname codes are in use")
+
+    def reserve(self, code: int) -> bool:
+        """Take a specific code out of the pool; False if it was not free."""
+        if code not in self._free:
+            return False
+        del self._free[code]
+        self._released.pop(code, None)
+        return True
+
+    def release(self, code: int):
+        """Return a code to the back of the pool (no-op if it is already free)."""
+        if code in self._free:
+            return
+        ticket = next(self._tickets)
+        self._free[code] = ticket
+        self._queue.append((ticket, code))
+        self._released[code] = None
+
+    def released(self) -> list:
+        """Released codes that are still free, in the order they will be reused."""
+        return list(self._released)
+
+    def is_free(self, code: int) -> bool:
+        return code in self._free
+
+    def __len__(self):
+        """Number of free codes."""
+        return len(self._free)
@@ -1,27 +1,93 @@
-"""Simple in-memory device manager stub.
+"""Simple device manager stub.
 
-Replace with persistent storage and real device registration logic.
+Devices are persisted through an optional JournalStore; replace with real
+device registration logic.
 """
 
-import random
+from app.device.code_allocator import CodeAllocator, format_code, parse_code
+
+# meta fields with a value -> device ids index for server-side filtering
+INDEXED_META_FIELDS = ("status", "location", "type", "extension")
+
 
 class DeviceManager:
-    def __init__(self):
-        self._devices = []
+    def __init__(self, store=None, on_change=None):
+        self._devices = {}  # id -> device, in insertion order
+        self._by_hostname = {}
+        self._meta_index = {}  # (field, value) -> {device_id: None}, an ordered set
         self._next_id = 1
-        self._used_codes = set()
+        self._codes = CodeAllocator()  # free hostname codes; freed again on delete
+        self._store = store  # optional JournalStore for persistence
+        self._on_change = on_change  # optional callback(event_type, data)
+        if store is not None:
+            records, meta = store.load()
+            if not store.is_empty():
+                self._restore(records, meta)
+                return
         self._initialize_pi_devices()
 
+    def _restore(self, records: dict, meta: dict):
+        """Rebuild devices and the code pool from persisted records"""
+        for d in records.values():
+            d["meta"] = d.get("meta") or {}
+            self._index(d)
+        # Codes freed before the restart stay at the back of the pool
+        used = (parse_code(d["hostname"]) for d in self._devices.values())
+        self._codes = CodeAllocator(used, released=meta.get("released") or ())
+        self._next_id = meta.get("next_id", max(self._devices, default=0) + 1)
+
+    def _index(self, device: dict):
+        self._devices[device["id"]] = device
+        self._by_hostname[device["hostname"]] = device
+        for field in INDEXED_META_FIELDS:
+            value = device["meta"].get(field)
+            if isinstance(value, str):
+                self._meta_index.setdefault((field, value), {})[device["id"]] = None
+
+    def _unindex(self, device: dict):
+        self._devices.pop(device["id"], None)
+        self._by_hostname.pop(device["hostname"], None)
+        for field in INDEXED_META_FIELDS:
+            key = (field, device["meta"].get(field))
+            ids = self._meta_index.get(key)
+            if ids is not None:
+                ids.pop(device["id"], None)
+                if not ids:
+                    del self._meta_index[key]
+
     def _generate_unique_code(self):
-        """Generate a unique 4-digit code (LD0000-LD9999)"""
-        while True:
-            code = random.randint(0, 9999)
-            if code not in self._used_codes:
-                self._used_codes.add(code)
-                return f"LD{code:04d}"
+        """Allocate a unique 4-digit code (LD0000-LD9999).
+
+        Raises CodeExhaustedError once all 10,000 codes are in use.
+        """
+        return format_code(self._codes.allocate())
 
-    def list_devices(self):
-        return self._devices
+    def list_devices(self, offset: int = 0, limit: int = None, **filters):
+        """Return (page, total) for devices whose meta matches every filter.
+
+        A filter matches a meta value that is equal to it or, for list
+        values such as `sensors`, contains it.
+        """
+        filters = {k: v for k, v in filters.items() if v is not None}
+        indexed = [(k, v) for k, v in filters.items() if k in INDEXED_META_FIELDS]
+        if indexed:
+            # Start from the smallest index bucket, check the rest per device
+            buckets = sorted((self._meta_index.get(kv, {}) for kv in indexed), key=len)
+            candidates = (self._devices[i] for i in buckets[0])
+        else:
+            candidates = iter(self._devices.values())
+
+        def matches(device):
+            for field, wanted in filters.items():
+                value = device["meta"].get(field)
+                if value != wanted and not (isinstance(value, list) and wanted in value):
+                    return False
+            return True
+
+        matched = [d for d in candidates if matches(d)] if filters else list(candidates)
+        offset = max(0, offset)
+        end = None if limit is None else offset + max(0, limit)
+        return matched[offset:end], len(matched)
 
     def add_device(self, device: dict):
         unique_code = self._generate_unique_code()
@@ -29,17 +95,40 @@ class DeviceManager:
             "id": self._next_id,
             "hostname": unique_code,
             "name": device.get("name", f"Looped {unique_code}"),
-            "meta": device.get("meta", {})
+            "meta": device.get("meta") or {}
         }
         self._next_id += 1
-        self._devices.append(device_entry)
+        self._index(device_entry)
+        if self._store is not None:
+            self._store.put(device_entry["id"], device_entry)
+            self._store.set_meta(next_id=self._next_id)
+        if self._on_change is not None:
+            self._on_change("device.created", dict(device_entry))
         return device_entry
 
+    def delete_device(self, device_id: int):
+        """Remove a device and return its hostname code to the pool"""
+        d = self._devices.get(device_id)
+        if d is None:
+            return False
+        self._unindex(d)
+        self._codes.release(parse_code(d["hostname"]))
+        if self._store is not None:
+            self._store.write_batch(deletes=[device_id], meta={"released": self._codes.released()})
+        if self._on_change is not None:
+            self._on_change("device.deleted", {"id": device_id, "hostname": d["hostname"]})
+        return True
+
     def get_device(self, device_id: int):
-        for d in self._devices:
-            if d["id"] == device_id:
-                return d
-        return None
+        return self._devices.get(device_id)
+
+    def get_device_by_hostname(self, hostname: str):
+        return self._by_hostname.get(hostname.upper())
+
+    def get_device_by_extension(self, extension: str):
+        """Device whose meta "extension" is this SIP extension, if any"""
+        ids = self._meta_index.get(("extension", str(extension)))
+        return self._devices[next(iter(ids))] if ids else None
 
     def _initialize_pi_devices(self):
         """Initialize with default Pi devices for data collection."""
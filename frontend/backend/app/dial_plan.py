@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""dial_plan.py
+
+On-phone dialing for pjsua_client.py: key presses made while no call is up
+are collected into a dial string and turned into one make-call command.
+
+  DialPlan       digit trie of Asterisk-style patterns (X = 0-9, Z = 1-9,
+                 N = 2-9, trailing "." = one or more further keys). Each key
+                 advances the set of live trie nodes, so matching never
+                 rescans the dial string.
+  DialAssembler  collects keys and dials as soon as the string can only be
+                 one rule (4 digits of an extension), on "#", or after the
+                 inter-digit timeout when it is complete but could grow
+                 ("1" is hot dial 1 and the start of extension 1000).
+  HotDialTable   slot -> contact for hot dials 1-9, read from the backend
+                 once, kept in a cache file so it survives restarts while
+                 the backend is down, and refetched when the backend's event
+                 stream reports a hot-dial or contact change. Resolving a
+                 hot dial is a dict lookup, not an HTTP request.
+
+Dial plan from the command line:
+  python3 dial_plan.py 1 1001 **3 *98 555
+Which backend event frames (events.format_sse) refetch the hot dials:
+  python3 dial_plan.py --check
+"""
+
+import json
+import os
+import threading
+import urllib.request
+from typing import Optional
+
+DIAL_TIMEOUT = float(os.environ.get("DIAL_TIMEOUT", "3.0"))  # seconds between keys
+# pattern=kind pairs, first match wins; mirrors the from-internal/hot-dials contexts
+DEFAULT_DIAL_PLAN = "Z=hot_dial,**Z=hot_dial,XXXX=extension,*1=feature,*2=feature,*98=feature"
+DIAL_PLAN = os.environ.get("DIAL_PLAN", DEFAULT_DIAL_PLAN)
+HOT_DIAL_CACHE = os.environ.get(
+    "HOT_DIAL_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "hot_dials.cache.json"))
+STREAM_TIMEOUT = 45.0     # the backend sends a keep-alive every 15 s
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+
+# match() results
+NO_MATCH = "no_match"   # no rule can match, whatever follows
+PARTIAL = "partial"     # a prefix of some rule, not complete yet
+MATCH = "match"         # complete, but a longer string could match too
+COMPLETE = "complete"   # complete and nothing can follow: dial now
+
+_CLASSES = {"X": "0123456789", "Z": "123456789", "N": "23456789"}
+_ANY = "0123456789*"
+
+
+class _Node:
+    __slots__ = ("children", "rule", "repeat")
+
+    def __init__(self):
+        self.children = {}  # token (literal key or class letter) -> _Node
+        self.rule = None    # (pattern, kind) ending here
+        self.repeat = False  # "." node: any further key stays here
+
+
+class DialPlan:
+    def __init__(self, rules):
+        """`rules` is an iterable of (pattern, kind); earlier rules win ties."""
+        self._root = _Node()
+        self.rules = []
+        for pattern, kind in rules:
+            self.add(pattern, kind)
+
+    @classmethod
+    def parse(cls, spec: str) -> "DialPlan":
+        """Build a plan from "pattern=kind,pattern=kind" (the DIAL_PLAN format)."""
+        rules = []
+        for item in spec.split(","):
+            pattern, sep, kind = item.strip().partition("=")
+            if not sep or not pattern or not kind:
+                raise ValueError(f"Bad dial plan entry: {item!r}")
+            rules.append((pattern.strip(), kind.strip()))
+        return cls(rules)
+
+    def add(self, pattern: str, kind: str):
+        if pattern.endswith("."):
+            body, repeat = pattern[:-1], True
+        else:
+            body, repeat = pattern, False
+        if not body or any(t not in _CLASSES and t not in _ANY for t in body):
+            raise ValueError(f"Bad dial plan pattern: {pattern!r}")
+        node = self._root
+        for token in body:
+            node = node.children.setdefault(token, _Node())
+        if repeat:
+            node = node.children.setdefault(".", _Node())
+            node.repeat = True
+        if node.rule is None:
+            node.rule = (pattern, kind)
+        self.rules.append((pattern, kind))
+
+    def start(self) -> tuple:
+        return (self._root,)
+
+    @staticmethod
+    def step(nodes: tuple, key: str) -> tuple:
+        """Advance the live nodes by one key."""
+        found = []
+        for node in nodes:
+            if node.repeat:
+                found.append(node)
+            for token, child in node.children.items():
+                if token == key or key in _CLASSES.get(token, "") or (token == "." and key in _ANY):
+                    found.append(child)
+        return tuple(found)
+
+    def classify(self, nodes: tuple):
+        """(status, rule) for the live nodes; rule is the best complete match or None."""
+        if not nodes:
+            return NO_MATCH, None
+        done = [n.rule for n in nodes if n.rule is not None]
+        if not done:
+            return PARTIAL, None
+        rule = min(done, key=self.rules.index)
+        more = any(n.children or n.repeat for n in nodes)
+        return (MATCH if more else COMPLETE), rule
+
+    def match(self, digits: str):
+        nodes = self.start()
+        for key in digits:
+            nodes = self.step(nodes, key)
+        return self.classify(nodes)
+
+
+class DialAssembler:
+    """Turns keys into dial strings against a DialPlan.
+
+    on_dial(digits, kind) and on_reject(digits) are called without the
+    assembler's lock held, from the caller of feed()/flush() or from the
+    timeout thread; on_change(digits) reports the string as it grows.
+    """
+
+    def __init__(self, plan: DialPlan, on_dial, on_reject=None, on_change=None,
+                 timeout: float = DIAL_TIMEOUT):
+        self._plan = plan
+        self._on_dial = on_dial
+        self._on_reject = on_reject
+        self._on_change = on_change
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._digits = ""
+        self._nodes = plan.start()
+        self._timer = None
+        self._generation = 0  # bumped on every key so a stale timer does nothing
+
+    @property
+    def digits(self) -> str:
+        return self._digits
+
+    def feed(self, key: str) -> bool:
+        """Add one key ("#" dials what has been collected); False if it was rejected.
+
+        Keys no pattern can contain (A-D) are ignored and keep the string.
+        """
+        if key == "#":
+            return self.flush()
+        if key not in _ANY:
+            return False
+        with self._lock:
+            nodes = self._plan.step(self._nodes, key)
+            status, rule = self._plan.classify(nodes)
+            if status == NO_MATCH:
+                done = self._take()
+                digits = done[0] + key
+            else:
+                self._digits += key
+                self._nodes = nodes
+                if status == COMPLETE:
+                    done = self._take()
+                    digits = done[0]
+                else:
+                    self._arm()
+                    done, digits = None, self._digits
+        if status == NO_MATCH:
+            self._report(None, digits)
+            return False
+        if done is None:
+            self._changed(digits)
+            return True
+        self._report(done[1], done[0])
+        return True
+
+    def flush(self) -> bool:
+        """Dial the collected string now if it is a complete match."""
+        with self._lock:
+            if not self._digits:
+                return False
+            digits, rule = self._take()
+        self._report(rule, digits)
+        return rule is not None
+
+    def cancel(self):
+        """Drop the collected string (a call came in)."""
+        with self._lock:
+            had = bool(self._digits)
+            self._take()
+        if had:
+            self._changed("")
+
+    def _arm(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._generation += 1
+        self._timer = threading.Timer(self.timeout, self._expired, args=(self._generation,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expired(self, generation: int):
+        with self._lock:
+            if generation != self._generation or not self._digits:
+                return
+            digits, rule = self._take()
+        self._report(rule, digits)
+
+    def _take(self):
+        """Reset under the lock; returns (digits, rule) for what was collected."""
+        digits = self._digits
+        _, rule = self._plan.classify(self._nodes) if digits else (None, None)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._generation += 1
+        self._digits = ""
+        self._nodes = self._plan.start()
+        return digits, rule
+
+    def _report(self, rule, digits: str):
+        self._changed("")
+        if rule is not None:
+            self._on_dial(digits, rule[1])
+        elif self._on_reject is not None:
+            self._on_reject(digits)
+
+    def _changed(self, digits: str):
+        if self._on_change is not None:
+            self._on_change(digits)
+
+
+class HotDialTable:
+    """Local copy of the backend's hot-dial assignments, kept current by its event stream."""
+
+    def __init__(self, backend_url: str, cache_path: str = HOT_DIAL_CACHE, on_change=None):
+        self.backend_url = backend_url.rstrip("/")
+        self.cache_path = cache_path
+        self._on_change = on_change  # optional callback(table) after each update
+        self._lock = threading.Lock()
+        self._table = {}  # slot (int) -> {"id", "name", "phone"}
+        self._stopping = threading.Event()
+        self._stream = None
+        self._thread = None
+
+    def get(self, slot: int) -> Optional[dict]:
+        with self._lock:
+            return self._table.get(slot)
+
+    def table(self) -> dict:
+        with self._lock:
+            return dict(self._table)
+
+    def load(self) -> bool:
+        """Seed the table from the cache file; False if there is none."""
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                self._replace(json.load(f), persist=False)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def refresh(self) -> bool:
+        """Refetch the whole table from GET /api/hot-dials."""
+        try:
+            with urllib.request.urlopen(f"{self.backend_url}/api/hot-dials", timeout=2) as resp:
+                payload = json.loads(resp.read().decode("utf-8"))
+        except Exception:
+            return False
+        if not isinstance(payload, dict) or not isinstance(payload.get("hot_dials"), dict):
+            return False
+        self._replace(payload["hot_dials"], persist=True)
+        return True
+
+    def start(self):
+        self.load()
+        self._thread = threading.Thread(target=self._watch, name="hot-dials", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def _replace(self, raw: dict, persist: bool):
+        table = {}
+        for slot, contact in raw.items():
+            if isinstance(contact, dict) and str(slot).isdigit():
+                table[int(slot)] = {k: contact.get(k) for k in ("id", "name", "phone")}
+        with self._lock:
+            if table == self._table:
+                return
+            self._table = table
+        if persist:
+            self._save(table)
+        if self._on_change is not None:
+            self._on_change(table)
+
+    def _save(self, table: dict):
+        tmp = self.cache_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(table, f)
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            pass  # the in-memory table is still current
+
+    def _follow(self, lines):
+        """Read SSE lines from the backend, refetching when an event concerns the table."""
+        event_type, data = None, []
+        for raw in lines:
+            line = raw.decode("utf-8").rstrip("\r\n")
+            if line.startswith("event:"):
+                event_type = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+            elif not line and event_type:
+                try:
+                    frame = json.loads("\n".join(data)) if data else None
+                except ValueError:
+                    frame = None
+                # format_sse sends {"data": <event data>, "ts": ...}
+                payload = frame.get("data") if isinstance(frame, dict) else None
+                if self._relevant(event_type, payload):
+                    self.refresh()
+                event_type, data = None, []
+
+    def _relevant(self, event_type: str, data) -> bool:
+        if event_type in ("hot_dials.changed", "resync"):
+            return True
+        if event_type.startswith("contact.") and isinstance(data, dict):
+            with self._lock:
+                return any(c.get("id") == data.get("id") for c in self._table.values())
+        return False
+
+    def _watch(self):
+        """Refetch, then follow /api/events until it drops; reconnect with backoff."""
+        delay = RECONNECT_MIN_DELAY
+        url = f"{self.backend_url}/api/events?types=contact,hot_dials"
+        while not self._stopping.is_set():
+            try:
+                self._stream = urllib.request.urlopen(url, timeout=STREAM_TIMEOUT)
+                self.refresh()  # after subscribing, so no change falls in between
+                delay = RECONNECT_MIN_DELAY
+                self._follow(self._stream)
+            except Exception:
+                pass
+            finally:
+                if self._stream is not None:
+                    self._stream.close()
+                    self._stream = None
+            if self._stopping.wait(delay):
+                break
+            delay = min(RECONNECT_MAX_DELAY, delay * 2)
+
+
+def _check() -> bool:
+    """Feed real backend event frames through HotDialTable; True if each refetches as it should."""
+    from events import format_sse
+
+    table = HotDialTable("http://backend.invalid", cache_path=os.devnull)
+    table._table = {1: {"id": 7, "name": "Mom", "phone": "1001"}}
+    refreshes = []
+    table.refresh = lambda: refreshes.append(True) or True
+    cases = [
+        ("contact.updated", {"id": 7, "name": "Mom", "phone": "1002"}, True),
+        ("contact.deleted", {"id": 7}, True),
+        ("contact.updated", {"id": 8, "name": "Pizza", "phone": "555"}, False),
+        ("hot_dials.changed", {"1": 7}, True),
+        ("device.updated", {"id": 7}, False),
+    ]
+    ok = True
+    for seq, (event_type, data, expected) in enumerate(cases, 1):
+        refreshes.clear()
+        frame = format_sse({"seq": seq, "type": event_type, "data": data, "ts": 0.0})
+        table._follow(frame.splitlines(keepends=True))
+        ok &= bool(refreshes) == expected
+        print(f"{event_type:<18} {data!s:<45} refetch={bool(refreshes)!s:<5} expected={expected}")
+    return ok
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["--check"]:
+        sys.exit(0 if _check() else 1)
+    plan = DialPlan.parse(DIAL_PLAN)
+    for digits in sys.argv[1:] or ["1", "1001", "**3", "*1", "555"]:
+        status, rule = plan.match(digits)
+        print(f"{digits:<8} {status:<9} {rule[1] if rule else '-'}")
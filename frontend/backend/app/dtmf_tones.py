@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""dtmf_tones.py
+
+DTMF tone synthesis for keypad_dtmf.py.
+
+A tone is rendered in one pass to mono 16-bit little-endian PCM (NumPy when
+it is installed, the `array` module otherwise) and kept in memory keyed by
+(key, duration, amplitude, sample rate), so changing DURATION or AMP just
+renders new buffers instead of regenerating files. WAV files are only an
+export (`write_wav`).
+
+Benchmark against the old per-sample writeframes path:
+  python3 dtmf_tones.py --bench
+"""
+
+import array
+import functools
+import math
+import sys
+import wave
+
+try:
+    import numpy as np
+except ImportError:  # keypad image without NumPy: pure-Python path below
+    np = None
+
+# DTMF frequency map: (low_freq, high_freq)
+DTMF_FREQS = {
+    "1": (697, 1209), "2": (697, 1336), "3": (697, 1477), "A": (697, 1633),
+    "4": (770, 1209), "5": (770, 1336), "6": (770, 1477), "B": (770, 1633),
+    "7": (852, 1209), "8": (852, 1336), "9": (852, 1477), "C": (852, 1633),
+    "*": (941, 1209), "0": (941, 1336), "#": (941, 1477), "D": (941, 1633),
+}
+
+SAMPLE_RATE = 44100
+SAMPLE_WIDTH = 2        # bytes (16-bit)
+DURATION = 0.20         # tone duration in seconds
+AMP = 0.6               # amplitude (0.0 to 1.0)
+
+
+def _render_numpy(low: float, high: float, n_samples: int, rate: int, max_amp: int) -> bytes:
+    t = np.arange(n_samples) / rate
+    sample = np.sin(2 * np.pi * low * t) + np.sin(2 * np.pi * high * t)
+    return ((sample / 2.0) * max_amp).astype("<i2").tobytes()
+
+
+def _render_array(low: float, high: float, n_samples: int, rate: int, max_amp: int) -> bytes:
+    sin = math.sin
+    w_low = 2 * math.pi * low / rate
+    w_high = 2 * math.pi * high / rate
+    scale = max_amp / 2.0
+    pcm = array.array(
+        "h", [int((sin(w_low * i) + sin(w_high * i)) * scale) for i in range(n_samples)]
+    )
+    if sys.byteorder == "big":
+        pcm.byteswap()
+    return pcm.tobytes()
+
+
+def synthesize(
+    key: str, duration: float = DURATION, amp: float = AMP, rate: int = SAMPLE_RATE
+) -> bytes:
+    """Render the tone for `key` as mono 16-bit little-endian PCM."""
+    if key not in DTMF_FREQS:
+        raise ValueError("Unknown key for DTMF: " + str(key))
+    low, high = DTMF_FREQS[key]
+    n_samples = int(rate * duration)
+    max_amp = int((2**15 - 1) * amp)
+    render = _render_numpy if np is not None else _render_array
+    return render(low, high, n_samples, rate, max_amp)
+
+
+@functools.lru_cache(maxsize=128)
+def tone_pcm(
+    key: str, duration: float = DURATION, amp: float = AMP, rate: int = SAMPLE_RATE
+) -> bytes:
+    """Cached synthesize(); every press of a key reuses the same buffer."""
+    return synthesize(key, duration, amp, rate)
+
+
+def build_tones(keys=None, duration: float = DURATION, amp: float = AMP,
+                rate: int = SAMPLE_RATE) -> dict:
+    """PCM for every key (default: all), rendered up front so the first press is not slower."""
+    keys = DTMF_FREQS if keys is None else keys
+    return {key: tone_pcm(key, duration, amp, rate) for key in keys}
+
+
+def write_wav(path: str, pcm: bytes, rate: int = SAMPLE_RATE) -> str:
+    """Export a PCM buffer as a mono 16-bit WAV file."""
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return path
+
+
+def _legacy_wav(path: str, key: str, duration: float = DURATION, rate: int = SAMPLE_RATE):
+    """The per-sample generator keypad_dtmf used before, kept for benchmark comparison."""
+    import struct
+
+    low, high = DTMF_FREQS[key]
+    n_samples = int(rate * duration)
+    max_amp = int((2**15 - 1) * AMP)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(rate)
+        for i in range(n_samples):
+            t = i / rate
+            sample = math.sin(2 * math.pi * low * t) + math.sin(2 * math.pi * high * t)
+            val = int((sample / 2.0) * max_amp)
+            wf.writeframes(struct.pack('<h', val))
+
+
+def _bench(repeat: int):
+    import os
+    import tempfile
+    import time
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = best(lambda: [_legacy_wav(os.path.join(tmp, f"{k}.wav"), k) for k in DTMF_FREQS])
+        with wave.open(os.path.join(tmp, "1.wav"), "rb") as wf:
+            reference = wf.readframes(wf.getnframes())
+        print(f"legacy per-sample WAV, 16 keys: {legacy:8.1f} ms")
+        n_samples, peak = int(SAMPLE_RATE * DURATION), int((2**15 - 1) * AMP)
+
+        def render_all(render):
+            return [render(*DTMF_FREQS[k], n_samples, SAMPLE_RATE, peak) for k in DTMF_FREQS]
+
+        if np is not None:
+            fast = best(lambda: render_all(_render_numpy))
+            print(f"numpy, 16 keys:                 {fast:8.1f} ms")
+        arr = best(lambda: render_all(_render_array))
+        print(f"array module, 16 keys:          {arr:8.1f} ms")
+        export = best(
+            lambda: [write_wav(os.path.join(tmp, f"x{k}.wav"), synthesize(k)) for k in DTMF_FREQS]
+        )
+        print(f"synthesize + WAV export:        {export:8.1f} ms")
+        tone_pcm("1")
+        cached = best(lambda: [tone_pcm("1") for _ in range(1000)]) / 1000
+        print(f"cached lookup, per press:       {cached * 1000:8.2f} us")
+
+    new = array.array("h", synthesize("1"))
+    old = array.array("h", reference)
+    diff = max(abs(a - b) for a, b in zip(new, old))
+    print(f"max sample difference vs legacy: {diff} (of {len(old)} samples)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="DTMF synthesis benchmark")
+    ap.add_argument("--bench", action="store_true")
+    ap.add_argument("--repeat", type=int, default=3)
+    opts = ap.parse_args()
+    if opts.bench:
+        _bench(opts.repeat)
+    else:
+        ap.print_help()
@@ -0,0 +1,145 @@
+"""In-process event bus and Server-Sent Events stream.
+
+Managers and integrations publish small change events ("contact.updated",
+"call.created", ...). Each SSE client gets its own bounded queue; a client
+that falls behind has its backlog dropped and receives a single "resync"
+event telling it to refetch, so one slow phone on weak WiFi never holds
+up publishers or grows memory.
+
+Events carry a sequence number. A reconnecting client sends it back as
+Last-Event-ID and is replayed whatever it missed from a short history.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_HISTORY = 512
+KEEPALIVE_SECONDS = 15
+
+
+class Subscription:
+    def __init__(self, bus, maxsize: int):
+        self._bus = bus
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, event: dict):
+        """Queue an event without ever blocking the publisher."""
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Backpressure: discard the backlog and ask the client to resync
+            self.dropped += self._queue.qsize()
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            resync = {"seq": event["seq"] - 1, "type": "resync", "data": {}, "ts": event["ts"]}
+            self._queue.put_nowait(resync)
+            self._queue.put_nowait(event)
+
+    async def get(self, timeout: float = None):
+        """Next event, or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def get_nowait(self):
+        """Next queued event, or None if none is waiting."""
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE, history: int = DEFAULT_HISTORY):
+        self._queue_size = queue_size
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def publish(self, event_type: str, data) -> dict:
+        """Publish an event; safe to call from any thread."""
+        with self._lock:
+            self._seq += 1
+            event = {"seq": self._seq, "type": event_type, "data": data, "ts": time.time()}
+            self._history.append(event)
+            loop = self._loop
+        if loop is None or loop.is_closed():
+            return event
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(event)
+        else:
+            loop.call_soon_threadsafe(self._deliver, event)
+        return event
+
+    def _deliver(self, event: dict):
+        for sub in list(self._subscribers):
+            sub.offer(event)
+
+    def subscribe(self, last_seq: int = None) -> Subscription:
+        """Register a subscriber (must run on the event loop).
+
+        With `last_seq`, events after it are replayed from history, or a
+        "resync" is queued if they have already been evicted.
+        """
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(self, self._queue_size)
+        with self._lock:
+            if last_seq is not None and last_seq < self._seq:
+                missed = [e for e in self._history if e["seq"] > last_seq]
+                if not missed or missed[0]["seq"] != last_seq + 1:
+                    missed = [{"seq": self._seq, "type": "resync", "data": {}, "ts": time.time()}]
+                for event in missed:
+                    sub.offer(event)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+def format_sse(event: dict) -> bytes:
+    payload = json.dumps({"data": event["data"], "ts": event["ts"]}, separators=(",", ":"))
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {payload}\n\n".encode("utf-8")
+
+
+async def sse_stream(request, sub: Subscription, types=None):
+    """Async generator of SSE frames for one client, with keep-alive comments."""
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            event = await sub.get(timeout=KEEPALIVE_SECONDS)
+            if await request.is_disconnected():
+                break
+            if event is None:
+                yield b": keep-alive\n\n"
+            elif (
+                types is None
+                or event["type"] == "resync"
+                or event["type"].split(".", 1)[0] in types
+            ):
+                yield format_sse(event)
+    finally:
+        sub.close()
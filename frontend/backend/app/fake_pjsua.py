@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""fake_pjsua.py
+
+Stand-in for the pjsua CLI so pjsua_client.py can be run and exercised
+without a SIP server. It accepts (and ignores) pjsua's arguments, prints
+pjsua-style log lines and understands the console commands pjsua_client
+sends: a (answer), h (hang up), dtmf <digits>, m (make call; the URI
+follows on the next line), q (quit). An outgoing call rings for
+FAKE_PJSUA_ANSWER_DELAY seconds and is then answered.
+
+Cues:
+  SIGUSR1 or "crash" on stdin  exit at once with status 1
+  SIGUSR2 or "ring" on stdin   simulate an incoming call
+
+Environment:
+  FAKE_PJSUA_REGISTER_DELAY  seconds before "registration success" (default 0.2)
+  FAKE_PJSUA_CRASH_AFTER     crash by itself after this many seconds
+  FAKE_PJSUA_ANSWER_DELAY    seconds an outgoing call rings (default 0.5)
+
+Recovery benchmark against a pjsua_client started with PJSUA_BIN=fake_pjsua.py:
+  python3 fake_pjsua.py --crash-bench http://127.0.0.1:5050 --rounds 5
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+
+CALLER = '"Front Door" <sip:1000@127.0.0.1>'
+
+
+def log(message: str):
+    print(time.strftime("%H:%M:%S.000") + "   " + message, flush=True)
+
+
+def crash(*_):
+    log("pjsua_core.c  Assertion failed, aborting (fake crash)")
+    os._exit(1)
+
+
+class FakePjsua:
+    def __init__(self):
+        self.call = None  # None / "CALLING" / "EARLY" / "CONFIRMED"
+        self._lock = threading.Lock()
+        self._make_call = False  # the next line is the URI for "m"
+
+    def ring(self, *_):
+        with self._lock:
+            if self.call is not None:
+                return
+            self.call = "EARLY"
+        log("pjsua_app.c  .......Incoming call for account 0!")
+        print(f"From: {CALLER}", flush=True)
+        log("pjsua_app.c  .......Call 0 state changed to EARLY")
+
+    def dial(self, uri: str):
+        with self._lock:
+            if self.call is not None:
+                log("pjsua_app.c  .......Already in a call")
+                return
+            self.call = "CALLING"
+        log(f"pjsua_app.c  .......Making call to {uri}")
+        log("pjsua_app.c  .......Call 0 state changed to CALLING")
+        log("pjsua_app.c  .......Call 0 state changed to EARLY")
+        threading.Timer(
+            float(os.environ.get("FAKE_PJSUA_ANSWER_DELAY", "0.5")), self._answered
+        ).start()
+
+    def _answered(self):
+        with self._lock:
+            if self.call != "CALLING":
+                return  # hung up while ringing
+            self.call = "CONFIRMED"
+        log("pjsua_app.c  .......Call 0 state changed to CONNECTING")
+        log("pjsua_app.c  .......Call 0 state changed to CONFIRMED")
+
+    def command(self, line: str) -> bool:
+        """Act on one console command; returns False to quit."""
+        cmd = line.strip()
+        if self._make_call:
+            self._make_call = False
+            self.dial(cmd)
+            return True
+        if cmd == "q":
+            return False
+        if cmd == "crash":
+            crash()
+        with self._lock:
+            call = self.call
+        if cmd == "ring":
+            self.ring()
+        elif cmd == "m":
+            self._make_call = True
+        elif cmd == "a" and call == "EARLY":
+            with self._lock:
+                self.call = "CONFIRMED"
+            log("pjsua_app.c  .......Call 0 state changed to CONNECTING")
+            log("pjsua_app.c  .......Call 0 state changed to CONFIRMED")
+        elif cmd == "h" and call is not None:
+            with self._lock:
+                self.call = None
+            log("pjsua_app.c  .......Call 0 is DISCONNECTED [reason=200 (Normal call clearing)]")
+        elif cmd.startswith("dtmf ") and call == "CONFIRMED":
+            log(f"pjsua_app.c  .......Sending DTMF {cmd[5:]}")
+        elif cmd:
+            log(f"pjsua_app.c  .......Ignoring command {cmd!r}")
+        return True
+
+    def run(self):
+        signal.signal(signal.SIGUSR1, crash)
+        signal.signal(signal.SIGUSR2, self.ring)
+        crash_after = os.environ.get("FAKE_PJSUA_CRASH_AFTER")
+        if crash_after:
+            threading.Timer(float(crash_after), crash).start()
+        log("pjsua_core.c  .pjsua version 2.14 for fake-pjsua initialized")
+        time.sleep(float(os.environ.get("FAKE_PJSUA_REGISTER_DELAY", "0.2")))
+        log("pjsua_acc.c  ....sip:fake@127.0.0.1: registration success, status=200 (OK), "
+            "will re-register in 300 seconds")
+        for line in sys.stdin:
+            if not self.command(line):
+                break
+        log("pjsua_app.c  .PJSUA destroyed...")
+
+
+def crash_bench(url: str, rounds: int):
+    """Crash the fake pjsua behind a running pjsua_client and time its recovery."""
+    import json
+    import urllib.request
+
+    def status():
+        with urllib.request.urlopen(f"{url}/status", timeout=2) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def wait_for(predicate, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            current = status()
+            if predicate(current):
+                return current
+            time.sleep(0.005)
+        raise TimeoutError("pjsua_client did not recover")
+
+    current = wait_for(lambda s: s["registered"] and s["pjsua"]["pid"])
+    for n in range(1, rounds + 1):
+        pid = current["pjsua"]["pid"]
+        crashed = time.monotonic()
+        os.kill(pid, signal.SIGUSR1)
+        current = wait_for(lambda s: s["registered"] and s["pjsua"]["pid"] not in (None, pid))
+        recovered = time.monotonic() - crashed
+        print(f"round {n}: recovered in {recovered * 1000:.0f} ms "
+              f"(restarts={current['pjsua']['restarts']}, "
+              f"time_to_registered={current['pjsua']['time_to_registered']}s)")
+
+
+if __name__ == "__main__":
+    if "--crash-bench" in sys.argv:
+        import argparse
+
+        ap = argparse.ArgumentParser(description="Time pjsua_client's recovery from pjsua crashes")
+        ap.add_argument("--crash-bench", metavar="URL", required=True)
+        ap.add_argument("--rounds", type=int, default=5)
+        opts = ap.parse_args()
+        crash_bench(opts.crash_bench.rstrip("/"), opts.rounds)
+    else:
+        FakePjsua().run()
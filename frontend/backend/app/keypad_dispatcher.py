@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""keypad_dispatcher.py
+
+Delivers key presses from keypad_dtmf.py to their consumers (pjsua_client,
+the Node server) off the scanner thread.
+
+Each target has its own worker thread and bounded queue, so a dead Node
+server never delays pjsua. dispatch() only enqueues; under backpressure:
+  - a full queue drops its oldest event,
+  - events older than the target's max_age are dropped unsent (a "#" that
+    arrives seconds late could hang up the wrong call),
+  - after a failed delivery the target is considered down for `down_for`
+    seconds and events are dropped at once instead of each waiting out a
+    timeout.
+HTTP targets post through one persistent requests.Session (keep-alive).
+
+Scanner-side cost with a stalled target, against the old inline posts:
+  python3 keypad_dispatcher.py --bench
+"""
+
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 32
+
+
+class _Target:
+    def __init__(self, name: str, send, retries: int, retry_delay: float, max_age: float,
+                 down_for: float, queue_size: int):
+        self.name = name
+        self.send = send
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.max_age = max_age
+        self.down_for = down_for
+        self.queue = collections.deque(maxlen=queue_size)
+        self.cond = threading.Condition()
+        self.down_until = 0.0
+        self.thread = None
+        self.stats = {"sent": 0, "failed": 0, "dropped": 0}
+
+
+class KeypadDispatcher:
+    def __init__(self):
+        self._targets = []
+        self._running = False
+
+    def add_target(
+        self,
+        name: str,
+        send,
+        retries: int = 0,
+        retry_delay: float = 0.1,
+        max_age: float = None,
+        down_for: float = 0.0,
+        queue_size: int = QUEUE_SIZE,
+    ):
+        """Register a consumer; `send(event)` returns truthy on success and may raise."""
+        self._targets.append(
+            _Target(name, send, retries, retry_delay, max_age, down_for, queue_size)
+        )
+
+    def start(self):
+        self._running = True
+        for target in self._targets:
+            target.thread = threading.Thread(target=self._worker, args=(target,),
+                                             name=f"keypad-{target.name}", daemon=True)
+            target.thread.start()
+
+    def stop(self):
+        self._running = False
+        for target in self._targets:
+            with target.cond:
+                target.cond.notify()
+        for target in self._targets:
+            if target.thread is not None:
+                target.thread.join(timeout=1)
+
+    def dispatch(self, key: str):
+        """Queue a key press for every target; never blocks on I/O."""
+        event = {"key": key, "timestamp": time.time()}
+        queued_at = time.monotonic()
+        for target in self._targets:
+            with target.cond:
+                if len(target.queue) == target.queue.maxlen:
+                    target.stats["dropped"] += 1  # deque drops the oldest on append
+                target.queue.append((queued_at, event))
+                target.cond.notify()
+
+    def stats(self) -> dict:
+        return {
+            target.name: dict(target.stats, queued=len(target.queue)) for target in self._targets
+        }
+
+    def _deliver(self, target: _Target, event) -> bool:
+        for attempt in range(target.retries + 1):
+            if attempt:
+                time.sleep(target.retry_delay * attempt)
+            try:
+                if target.send(event):
+                    return True
+            except Exception as exc:
+                logger.debug(f"{target.name}: delivery failed: {exc}")
+        return False
+
+    def _worker(self, target: _Target):
+        while True:
+            with target.cond:
+                while self._running and not target.queue:
+                    target.cond.wait()
+                if not self._running:
+                    return
+                queued_at, event = target.queue.popleft()
+            now = time.monotonic()
+            if now < target.down_until or (
+                target.max_age is not None and now - queued_at > target.max_age
+            ):
+                target.stats["dropped"] += 1
+                continue
+            if self._deliver(target, event):
+                target.stats["sent"] += 1
+                continue
+            target.stats["failed"] += 1
+            if target.down_for:
+                target.down_until = time.monotonic() + target.down_for
+                logger.warning(
+                    f"Keypad target {target.name} unreachable; "
+                    f"dropping events for {target.down_for:.0f}s"
+                )
+
+
+def http_sender(url: str, timeout: float = 2.0):
+    """send(event) that POSTs the event as JSON over one keep-alive requests.Session.
+
+    The session is used only by its target's worker thread.
+    """
+    import requests  # imported here so the dispatcher itself has no third-party dependency
+
+    session = requests.Session()
+
+    def send(event) -> bool:
+        resp = session.post(url, json=event, timeout=timeout)
+        return resp.ok
+
+    return send
+
+
+def _bench(presses: int, stall: float):
+    import statistics
+
+    def stalled(_event):
+        time.sleep(stall)  # a server that accepts the connection and never answers
+        raise TimeoutError("stalled")
+
+    def fast(_event):
+        return True
+
+    def summary(label, values):
+        ms = sorted(v * 1000 for v in values)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(f"{label:<32} p50={statistics.median(ms):9.3f}ms p95={p95:9.3f}ms")
+
+    # Old path: pjsua then Node, inline on the scanner thread
+    inline = []
+    for _ in range(min(presses, 5)):
+        start = time.perf_counter()
+        fast({"key": "1"})
+        try:
+            stalled({"key": "1"})
+        except TimeoutError:
+            pass
+        inline.append(time.perf_counter() - start)
+    summary("inline sends (scanner blocked)", inline)
+
+    delivered = []
+    dispatcher = KeypadDispatcher()
+    dispatcher.add_target(
+        "pjsua", lambda e: delivered.append(time.time() - e["timestamp"]) or True, max_age=2.0
+    )
+    dispatcher.add_target("server", stalled, retries=1, down_for=5.0)
+    dispatcher.start()
+    calls = []
+    for _ in range(presses):
+        start = time.perf_counter()
+        dispatcher.dispatch("1")
+        calls.append(time.perf_counter() - start)
+        time.sleep(0.01)
+    time.sleep(0.2)
+    dispatcher.stop()
+    summary("dispatch() on scanner thread", calls)
+    summary("press -> pjsua delivery", delivered)
+    print(f"stats: {dispatcher.stats()}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Keypad dispatch cost with a stalled target")
+    ap.add_argument("--bench", action="store_true")
+    ap.add_argument("--presses", type=int, default=200)
+    ap.add_argument(
+        "--stall", type=float, default=2.0, help="seconds the stalled target takes to fail"
+    )
+    opts = ap.parse_args()
+    if opts.bench:
+        _bench(opts.presses, opts.stall)
+    else:
+        ap.print_help()
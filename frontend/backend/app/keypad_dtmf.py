@@ -1,22 +1,23 @@
 #!/usr/bin/env python3
 """
 keypad_dtmf.py
-Scan 4x4 keypad, generate DTMF tones, and broadcast keypresses via HTTP to server.
+Scan 4x4 keypad (edge-triggered, see keypad_scanner.py), generate DTMF tones,
+and broadcast keypresses via HTTP to server.
 This runs as a daemon and sends key events to the Node.js server.
 """
 
-import RPi.GPIO as GPIO
 import time
-import math
-import wave
-import struct
-import subprocess
 import os
-import requests
 import json
 from threading import Thread
 import logging
 
+from dtmf_tones import AMP, DURATION, SAMPLE_RATE, build_tones, synthesize, write_wav
+from keypad_dispatcher import KeypadDispatcher, http_sender
+from keypad_scanner import KeypadScanner, RPiGPIOBackend
+from keypress_channel import KeypressChannel
+from tone_player import AplaySink, TonePlayer
+
 # Logging setup
 logging.basicConfig(
     level=logging.INFO,
@@ -36,160 +37,90 @@ KEYPAD = [
     ["*", "0", "#", "D"]
 ]
 
-# DTMF frequency map: (low_freq, high_freq)
-DTMF_FREQS = {
-    "1": (697, 1209), "2": (697, 1336), "3": (697, 1477), "A": (697, 1633),
-    "4": (770, 1209), "5": (770, 1336), "6": (770, 1477), "B": (770, 1633),
-    "7": (852, 1209), "8": (852, 1336), "9": (852, 1477), "C": (852, 1633),
-    "*": (941, 1209), "0": (941, 1336), "#": (941, 1477), "D": (941, 1633),
-}
-
-# WAV / tone parameters
-SAMPLE_RATE = 44100
-SAMPLE_WIDTH = 2        # bytes (16-bit)
-DURATION = 0.20         # tone duration in seconds
-AMP = 0.6               # amplitude (0.0 to 1.0)
-
+# Tone parameters (DTMF_FREQS, SAMPLE_RATE, DURATION, AMP) live in dtmf_tones.py
 TMP_DIR = "/tmp/dtmf_wavs"
 SERVER_URL = "http://localhost:3000/api/keypad-event"
-# Also post key events to the local pjsua client which listens on port 5050
+# Key presses also go to the local pjsua client: over its Unix socket, or
+# POST to port 5050 while the socket is unavailable
 PJSUA_KEY_URL = "http://localhost:5050/keypress"
+pjsua_channel = KeypressChannel(fallback_url=PJSUA_KEY_URL)
+# Presses are delivered by per-target worker threads; a late "#" is dropped rather than sent
+PJSUA_MAX_AGE = 2.0
+SERVER_DOWN_FOR = 10.0
+dispatcher = KeypadDispatcher()
 
 def generate_dtmf_wav(key, duration=DURATION, rate=SAMPLE_RATE):
-    """Generate a mono 16-bit WAV file for a DTMF key."""
-    if key not in DTMF_FREQS:
-        raise ValueError("Unknown key for DTMF: " + str(key))
-    
-    low, high = DTMF_FREQS[key]
-    n_samples = int(rate * duration)
-    max_amp = int((2**15 - 1) * AMP)
-
+    """Export a mono 16-bit WAV file for a DTMF key (playback uses in-memory PCM)."""
     os.makedirs(TMP_DIR, exist_ok=True)
     filepath = os.path.join(TMP_DIR, f"dtmf_{key}.wav")
+    return write_wav(filepath, synthesize(key, duration, AMP, rate), rate)
+
+def prebuild_tones():
+    """Render PCM for all keypad keys into memory."""
+    keys = [key for row in KEYPAD for key in row]
+    logger.info(f"Rendering DTMF tones for {len(keys)} keys...")
+    return build_tones(keys)
+
+def send_to_pjsua(event):
+    """Forward a press to the local pjsua client so pound key can answer/hang."""
+    if pjsua_channel.send(event["key"]) is None:
+        logger.warning(f"pjsua client unreachable for key '{event['key']}'")
+        return False
+    return True
+
+def start_dispatcher():
+    dispatcher.add_target("pjsua", send_to_pjsua, max_age=PJSUA_MAX_AGE)
+    # Node backend is optional: retry once, then stop trying for a while if it is down
+    dispatcher.add_target(
+        "server", http_sender(SERVER_URL, timeout=2), retries=1, down_for=SERVER_DOWN_FOR
+    )
+    dispatcher.start()
 
-    with wave.open(filepath, 'wb') as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(SAMPLE_WIDTH)
-        wf.setframerate(rate)
-
-        for i in range(n_samples):
-            t = i / rate
-            # two sine waves summed
-            sample = math.sin(2 * math.pi * low * t) + math.sin(2 * math.pi * high * t)
-            val = int((sample / 2.0) * max_amp)
-            wf.writeframes(struct.pack('<h', val))
-
-    return filepath
-
-def prebuild_wavs():
-    """Generate WAVs for all keypad keys."""
-    files = {}
-    for row in KEYPAD:
-        for key in row:
-            path = os.path.join(TMP_DIR, f"dtmf_{key}.wav")
-            if not os.path.isfile(path):
-                logger.info(f"Generating DTMF tone for key '{key}'...")
-                generate_dtmf_wav(key)
-            files[key] = path
-    return files
-
-def play_wav_async(path):
-    """Play a WAV file asynchronously using aplay (non-blocking)."""
-    try:
-        subprocess.Popen(
-            ["aplay", "-q", path],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-    except Exception as e:
-        logger.error(f"Error launching aplay: {e}")
 
 def send_keypad_event(key):
-    """Send keypress event to Node.js server via HTTP."""
-    try:
-        payload = {"key": key, "timestamp": time.time()}
-        # Post to Node backend (optional)
-        try:
-            requests.post(SERVER_URL, json=payload, timeout=2)
-        except Exception:
-            # non-fatal
-            pass
-
-        # Also notify local pjsua client so pound key can answer/hang
-        try:
-            requests.post(PJSUA_KEY_URL, json={"key": key}, timeout=1)
-        except Exception:
-            # non-fatal
-            pass
-    except Exception as e:
-        logger.warning(f"Could not send keypad event to server: {e}")
-
-def setup_gpio():
-    """Initialize GPIO pins for matrix keypad."""
-    GPIO.setmode(GPIO.BCM)
-    for r in ROWS:
-        GPIO.setup(r, GPIO.OUT)
-        GPIO.output(r, GPIO.HIGH)
-    for c in COLS:
-        GPIO.setup(c, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-    logger.info("GPIO setup complete")
-
-def cleanup():
-    """Clean up GPIO on exit."""
-    GPIO.cleanup()
-    logger.info("GPIO cleaned up")
-
-def scan_loop(wav_files):
-    """Main scanning loop: detect keypresses and trigger tones + server events."""
-    logger.info("DTMF keypad scanner started. Listening for keypresses...")
-    last_pressed = None
-    debounce_time = 0.05
+    """Queue keypress event for the local pjsua client and the Node.js server (never blocks)."""
+    dispatcher.dispatch(key)
+
+def run_scanner(tones, player, gpio=None):
+    """Detect keypresses (edge-triggered) and trigger tones + server events until interrupted."""
+    def on_press(key):
+        logger.info(f"Key pressed: {key}")
+
+        # Play DTMF tone
+        player.play(tones[key])
+
+        # Notify server
+        send_keypad_event(key)
 
+    def on_long_press(key):
+        logger.info(f"Key held: {key}")
+
+    scanner = KeypadScanner(gpio or RPiGPIOBackend(), ROWS, COLS, KEYPAD,
+                            on_press=on_press, on_long_press=on_long_press)
+    scanner.start()
+    logger.info("DTMF keypad scanner started. Listening for keypresses...")
     try:
-        while True:
-            for r_idx, r_pin in enumerate(ROWS):
-                # Activate this row
-                GPIO.output(r_pin, GPIO.LOW)
-                
-                for c_idx, c_pin in enumerate(COLS):
-                    if GPIO.input(c_pin) == GPIO.LOW:
-                        key = KEYPAD[r_idx][c_idx]
-                        
-                        # Debounce: wait and check again
-                        time.sleep(debounce_time)
-                        if GPIO.input(c_pin) == GPIO.LOW:
-                            # Avoid repeating same press instantly
-                            if last_pressed != key:
-                                logger.info(f"Key pressed: {key}")
-                                
-                                # Play DTMF tone
-                                play_wav_async(wav_files[key])
-                                
-                                # Notify server
-                                send_keypad_event(key)
-                                
-                                last_pressed = key
-                            
-                            # Wait for release
-                            while GPIO.input(c_pin) == GPIO.LOW:
-                                time.sleep(0.01)
-                            
-                            last_pressed = None
-                
-                # Deactivate this row
-                GPIO.output(r_pin, GPIO.HIGH)
-            
-            time.sleep(0.01)
-    
+        while scanner.alive:
+            time.sleep(1)  # the scanner thread does the work
+        # GPIO failed under the scanner; exit non-zero so the service is restarted
+        raise RuntimeError("keypad scanner thread died")
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received, exiting...")
+    finally:
+        scanner.stop()
+        logger.info("GPIO cleaned up")
 
 if __name__ == "__main__":
+    # One aplay process for the daemon's lifetime; presses only hand it PCM
+    player = TonePlayer(AplaySink(SAMPLE_RATE))
     try:
-        setup_gpio()
-        wav_files = prebuild_wavs()
-        scan_loop(wav_files)
+        start_dispatcher()
+        tones = prebuild_tones()
+        run_scanner(tones, player)
     except Exception as e:
         logger.error(f"Error: {e}")
+        raise SystemExit(1)  # let the service manager restart us
     finally:
-        cleanup()
+        player.close()
+        dispatcher.stop()
+        pjsua_channel.close()
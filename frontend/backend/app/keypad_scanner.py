@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""keypad_scanner.py
+
+Edge-triggered 4x4 matrix keypad scanner for keypad_dtmf.py.
+
+While no key is down every row is driven LOW and the scanner thread sleeps
+on a falling-edge interrupt from the (pulled-up) column pins. A press wakes
+it; it then scans the matrix every SCAN_INTERVAL, feeding each key's
+debounce state machine, until every key is released again, and goes back
+to sleep. Keys are tracked independently, so a second key pressed while
+the first is held registers (rollover), and a key held for LONG_PRESS
+fires on_long_press once. A callback that raises is logged and does not
+stop the scanner; `alive` turns False only if scanning itself fails.
+
+GPIO access goes through a small backend interface: RPiGPIOBackend on the
+device, SimulatedGPIO off it. Scan latency and CPU use against the old
+busy-polling loop, on the simulated matrix:
+  python3 keypad_scanner.py --bench
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LOW, HIGH = 0, 1
+DEBOUNCE = 0.02       # a contact must read the same for this long to count
+SCAN_INTERVAL = 0.005
+LONG_PRESS = 1.0
+
+# Per-key debounce states
+UP, PRESS_PENDING, DOWN, RELEASE_PENDING = "up", "press_pending", "down", "release_pending"
+
+
+class RPiGPIOBackend:
+    """RPi.GPIO in BCM numbering."""
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+
+        self._gpio = GPIO
+        GPIO.setmode(GPIO.BCM)
+
+    def setup_output(self, pin: int, level: int):
+        self._gpio.setup(pin, self._gpio.OUT)
+        self._gpio.output(pin, self._gpio.HIGH if level else self._gpio.LOW)
+
+    def setup_input(self, pin: int):
+        self._gpio.setup(pin, self._gpio.IN, pull_up_down=self._gpio.PUD_UP)
+
+    def output(self, pin: int, level: int):
+        self._gpio.output(pin, self._gpio.HIGH if level else self._gpio.LOW)
+
+    def input(self, pin: int) -> int:
+        return HIGH if self._gpio.input(pin) else LOW
+
+    def on_falling_edge(self, pin: int, callback):
+        # Called from RPi.GPIO's own thread
+        self._gpio.add_event_detect(pin, self._gpio.FALLING, callback=callback)
+
+    def cleanup(self):
+        self._gpio.cleanup()
+
+
+class SimulatedGPIO:
+    """A keypad matrix in software: rows are outputs, columns pulled-up inputs.
+
+    press()/release() close and open the switch at (row pin, column pin); a
+    column reads LOW while a closed switch connects it to a row driven LOW.
+    Falling edges fire callbacks synchronously, like an interrupt.
+    """
+
+    def __init__(self):
+        self._levels = {}       # output pin -> level
+        self._inputs = set()
+        self._closed = set()    # (row pin, col pin)
+        self._callbacks = {}
+        self._lock = threading.RLock()
+        self.reads = 0
+
+    def setup_output(self, pin: int, level: int):
+        with self._lock:
+            self._levels[pin] = level
+
+    def setup_input(self, pin: int):
+        with self._lock:
+            self._inputs.add(pin)
+
+    def _column_levels(self):
+        return {col: self._level(col) for col in self._inputs}
+
+    def _level(self, col: int) -> int:
+        for row, c in self._closed:
+            if c == col and self._levels.get(row, HIGH) == LOW:
+                return LOW
+        return HIGH
+
+    def _change(self, apply):
+        with self._lock:
+            before = self._column_levels()
+            apply()
+            after = self._column_levels()
+            fired = [self._callbacks[col] for col in after
+                     if before[col] == HIGH and after[col] == LOW and col in self._callbacks]
+        for callback in fired:
+            callback(None)
+
+    def output(self, pin: int, level: int):
+        self._change(lambda: self._levels.__setitem__(pin, level))
+
+    def input(self, pin: int) -> int:
+        with self._lock:
+            self.reads += 1
+            return self._level(pin)
+
+    def on_falling_edge(self, pin: int, callback):
+        with self._lock:
+            self._callbacks[pin] = callback
+
+    def press(self, row: int, col: int):
+        self._change(lambda: self._closed.add((row, col)))
+
+    def release(self, row: int, col: int):
+        self._change(lambda: self._closed.discard((row, col)))
+
+    def cleanup(self):
+        with self._lock:
+            self._callbacks.clear()
+
+
+class _KeyState:
+    __slots__ = ("state", "since", "pressed_at", "long_fired")
+
+    def __init__(self):
+        self.state = UP
+        self.since = 0.0
+        self.pressed_at = 0.0
+        self.long_fired = False
+
+
+class KeypadScanner:
+    def __init__(self, gpio, rows, cols, keymap, on_press=None, on_release=None, on_long_press=None,
+                 debounce: float = DEBOUNCE, scan_interval: float = SCAN_INTERVAL,
+                 long_press: float = LONG_PRESS):
+        self._gpio = gpio
+        self.rows = list(rows)
+        self.cols = list(cols)
+        self.keymap = keymap
+        self.on_press = on_press            # callback(key)
+        self.on_release = on_release        # callback(key, seconds held)
+        self.on_long_press = on_long_press  # callback(key)
+        self.debounce = debounce
+        self.scan_interval = scan_interval
+        self.long_press = long_press
+        self._keys = {
+            (r, c): _KeyState() for r in range(len(self.rows)) for c in range(len(self.cols))
+        }
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.scans = 0
+
+    # -- lifecycle -------------------------------------------------------
+
+    def start(self):
+        for pin in self.rows:
+            self._gpio.setup_output(pin, LOW)
+        for pin in self.cols:
+            self._gpio.setup_input(pin)
+            self._gpio.on_falling_edge(pin, self._edge)
+        self._thread = threading.Thread(target=self._run, name="keypad-scanner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self._gpio.cleanup()
+
+    @property
+    def alive(self) -> bool:
+        """False once the scanner thread has exited (stopped, or GPIO failed)."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _edge(self, _channel):
+        self._wake.set()
+
+    def pressed(self):
+        """Keys currently held (debounced)."""
+        return [
+            self.keymap[r][c]
+            for (r, c), k in self._keys.items()
+            if k.state in (DOWN, RELEASE_PENDING)
+        ]
+
+    # -- scanning --------------------------------------------------------
+
+    def _idle(self):
+        """Drive every row LOW so any press pulls a column down and interrupts us."""
+        for pin in self.rows:
+            self._gpio.output(pin, LOW)
+
+    def _any_column_low(self) -> bool:
+        return any(self._gpio.input(pin) == LOW for pin in self.cols)
+
+    def _scan(self):
+        """Read the whole matrix one row at a time; returns the set of closed (row, col)."""
+        self.scans += 1
+        closed = set()
+        for pin in self.rows:
+            self._gpio.output(pin, HIGH)
+        for r, row_pin in enumerate(self.rows):
+            self._gpio.output(row_pin, LOW)
+            for c, col_pin in enumerate(self.cols):
+                if self._gpio.input(col_pin) == LOW:
+                    closed.add((r, c))
+            self._gpio.output(row_pin, HIGH)
+        return closed
+
+    def _update(self, closed, now: float) -> bool:
+        """Advance every key's state machine; returns True while any key is not UP."""
+        busy = False
+        for pos, key in self._keys.items():
+            down = pos in closed
+            if key.state == UP:
+                if down:
+                    key.state, key.since = PRESS_PENDING, now
+            elif key.state == PRESS_PENDING:
+                if not down:
+                    key.state = UP
+                elif now - key.since >= self.debounce:
+                    key.state, key.pressed_at, key.long_fired = DOWN, now, False
+                    self._emit(self.on_press, self.keymap[pos[0]][pos[1]])
+            elif key.state == DOWN:
+                if not down:
+                    key.state, key.since = RELEASE_PENDING, now
+                elif not key.long_fired and now - key.pressed_at >= self.long_press:
+                    key.long_fired = True
+                    self._emit(self.on_long_press, self.keymap[pos[0]][pos[1]])
+            elif key.state == RELEASE_PENDING:
+                if down:
+                    key.state = DOWN
+                elif now - key.since >= self.debounce:
+                    key.state = UP
+                    self._emit(self.on_release, self.keymap[pos[0]][pos[1]], now - key.pressed_at)
+            busy = busy or key.state != UP
+        return busy
+
+    @staticmethod
+    def _emit(callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception:
+            name = getattr(callback, "__name__", callback)
+            logger.exception("Keypad callback %s%r failed", name, args)
+
+    def _run(self):
+        try:
+            self._scan_until_stopped()
+        except Exception:
+            logger.exception("Keypad scanner stopped")
+
+    def _scan_until_stopped(self):
+        while not self._stop.is_set():
+            self._wake.clear()  # edges caused by our own scanning are stale
+            self._idle()
+            # A key may already be down again; only sleep if the matrix is quiet
+            if not self._any_column_low():
+                self._wake.wait()
+            if self._stop.is_set():
+                break
+            busy = True
+            while busy and not self._stop.is_set():
+                busy = self._update(self._scan(), time.monotonic())
+                if busy:
+                    time.sleep(self.scan_interval)
+
+
+def _legacy_scan_loop(gpio, rows, cols, keymap, on_press, stop: threading.Event):
+    """The polling loop keypad_dtmf used before, kept for benchmark comparison."""
+    last_pressed = None
+    debounce_time = 0.05
+    while not stop.is_set():
+        for r_idx, r_pin in enumerate(rows):
+            gpio.output(r_pin, LOW)
+            for c_idx, c_pin in enumerate(cols):
+                if gpio.input(c_pin) == LOW:
+                    key = keymap[r_idx][c_idx]
+                    time.sleep(debounce_time)
+                    if gpio.input(c_pin) == LOW:
+                        if last_pressed != key:
+                            on_press(key)
+                            last_pressed = key
+                        while gpio.input(c_pin) == LOW and not stop.is_set():
+                            time.sleep(0.01)
+                        last_pressed = None
+            gpio.output(r_pin, HIGH)
+        time.sleep(0.01)
+
+
+def _bench(presses: int, idle_seconds: float):
+    import random
+    import statistics
+
+    rows, cols = [5, 6, 13, 12], [16, 20, 26, 25]
+    keymap = [
+        ["1", "2", "3", "A"],
+        ["4", "5", "6", "B"],
+        ["7", "8", "9", "C"],
+        ["*", "0", "#", "D"],
+    ]
+
+    def chatter(gpio, r, c):
+        """Close a switch with a few milliseconds of contact bounce."""
+        for _ in range(3):
+            gpio.press(rows[r], cols[c])
+            time.sleep(0.001)
+            gpio.release(rows[r], cols[c])
+            time.sleep(0.001)
+        gpio.press(rows[r], cols[c])
+
+    def run(label, start_scanner):
+        gpio = SimulatedGPIO()
+        detected = {}
+        stop = start_scanner(gpio, lambda key: detected.setdefault(key, time.monotonic()))
+        time.sleep(0.1)
+        cpu = time.process_time()
+        reads = gpio.reads
+        time.sleep(idle_seconds)
+        idle_cpu = (time.process_time() - cpu) / idle_seconds * 100
+        idle_reads = (gpio.reads - reads) / idle_seconds
+
+        latencies = []
+        for _ in range(presses):
+            r, c = random.randrange(4), random.randrange(4)
+            detected.clear()
+            t0 = time.monotonic()
+            chatter(gpio, r, c)
+            time.sleep(0.12)
+            gpio.release(rows[r], cols[c])
+            time.sleep(0.08)
+            if keymap[r][c] in detected:
+                latencies.append(detected[keymap[r][c]] - t0)
+
+        # Rollover: hold "1", press "5" while it is down
+        detected.clear()
+        gpio.press(rows[0], cols[0])
+        time.sleep(0.1)
+        gpio.press(rows[1], cols[1])
+        time.sleep(0.1)
+        gpio.release(rows[1], cols[1])
+        gpio.release(rows[0], cols[0])
+        time.sleep(0.1)
+        rollover = "5" in detected
+        stop()
+
+        ms = sorted(x * 1000 for x in latencies)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))] if ms else float("nan")
+        median = statistics.median(ms) if ms else float("nan")
+        print(
+            f"{label:<14} detected {len(ms)}/{presses}"
+            f"  latency p50={median:5.1f}ms p95={p95:5.1f}ms"
+            f"  idle CPU {idle_cpu:4.1f}% ({idle_reads:,.0f} pin reads/s)"
+            f"  rollover {'yes' if rollover else 'no'}"
+        )
+
+    def edge(gpio, on_press):
+        scanner = KeypadScanner(gpio, rows, cols, keymap, on_press=on_press)
+        scanner.start()
+        return scanner.stop
+
+    def legacy(gpio, on_press):
+        for pin in rows:
+            gpio.setup_output(pin, HIGH)
+        for pin in cols:
+            gpio.setup_input(pin)
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=_legacy_scan_loop, args=(gpio, rows, cols, keymap, on_press, stop), daemon=True
+        )
+        thread.start()
+        return lambda: (stop.set(), thread.join(timeout=1))
+
+    run("polling", legacy)
+    run("edge-trigger", edge)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(
+        description="Keypad scan latency and idle CPU on a simulated matrix"
+    )
+    ap.add_argument("--bench", action="store_true")
+    ap.add_argument("--presses", type=int, default=40)
+    ap.add_argument("--idle", type=float, default=2.0, help="seconds of idle CPU measurement")
+    opts = ap.parse_args()
+    if opts.bench:
+        _bench(opts.presses, opts.idle)
+    else:
+        ap.print_help()
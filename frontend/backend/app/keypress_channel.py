@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""keypress_channel.py
+
+Local key-press channel from keypad_dtmf.py to pjsua_client.py.
+
+pjsua_client listens on a Unix stream socket (KEYPRESS_SOCKET) next to its
+HTTP server. keypad_dtmf keeps one connection open and sends each press as
+a fixed 4-byte frame; pjsua_client answers with a 4-byte result once the
+command has been written to pjsua:
+
+  press:  opcode (1 byte, OP_KEY)    seq (uint16, big-endian)  key (1 byte ASCII)
+  result: opcode (1 byte, OP_RESULT) seq (uint16, big-endian)  handled (1 byte, 0/1)
+
+If the socket is missing or the press cannot be written to it, the press
+goes to POST /keypress over HTTP instead and the socket is retried after
+RECONNECT_DELAY. Once a frame has been written it is never sent again: if
+its reply does not arrive, pjsua_client may still have acted on it (a
+resent "#" would answer and then hang up), so send() returns None.
+
+Latency benchmark against a running pjsua_client:
+  python3 keypress_channel.py --bench --key 1
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import urllib.request
+from typing import Optional
+
+KEYPRESS_SOCKET = os.environ.get("KEYPRESS_SOCKET", "/run/looped-keypress.sock")
+PJSUA_KEY_URL = os.environ.get("PJSUA_KEY_URL", "http://localhost:5050/keypress")
+RECONNECT_DELAY = 1.0
+REPLY_TIMEOUT = 1.0
+
+OP_KEY = 1
+OP_RESULT = 2
+PRESS = struct.Struct("!BHc")
+RESULT = struct.Struct("!BHB")
+
+
+def encode_press(seq: int, key: str) -> bytes:
+    if len(key) != 1:
+        raise ValueError(f"not a single key: {key!r}")
+    return PRESS.pack(OP_KEY, seq & 0xFFFF, key.encode("ascii"))
+
+
+def decode_press(frame: bytes):
+    """Return (seq, key) from a press frame; raises ValueError on anything else."""
+    op, seq, key = PRESS.unpack(frame)
+    if op != OP_KEY:
+        raise ValueError(f"unexpected opcode {op}")
+    return seq, key.decode("ascii")
+
+
+def encode_result(seq: int, handled: bool) -> bytes:
+    return RESULT.pack(OP_RESULT, seq, 1 if handled else 0)
+
+
+class KeypressChannel:
+    """Client end used by keypad_dtmf: socket first, HTTP when the socket is unavailable."""
+
+    def __init__(self, path: str = KEYPRESS_SOCKET, fallback_url: Optional[str] = PJSUA_KEY_URL,
+                 timeout: float = REPLY_TIMEOUT):
+        self.path = path
+        self.fallback_url = fallback_url
+        self.timeout = timeout
+        self._sock = None
+        self._seq = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self._retry_at = time.monotonic() + RECONNECT_DELAY
+
+    def _recv_exact(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("pjsua_client closed the key-press socket")
+            data += chunk
+        return data
+
+    def _write_socket(self, key: str):
+        frame = encode_press((self._seq + 1) & 0xFFFF, key)
+        if self._sock is None:
+            self._connect()
+        self._seq = (self._seq + 1) & 0xFFFF
+        self._sock.sendall(frame)
+
+    def _read_reply(self) -> bool:
+        op, seq, handled = RESULT.unpack(self._recv_exact(RESULT.size))
+        if op != OP_RESULT or seq != self._seq:
+            raise ValueError(f"unexpected reply {op}/{seq} to press {self._seq}")
+        return bool(handled)
+
+    def _send_http(self, key: str) -> Optional[bool]:
+        req = urllib.request.Request(
+            self.fallback_url,
+            data=json.dumps({"key": key}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return bool(json.loads(resp.read().decode("utf-8")).get("ok"))
+
+    def send(self, key: str) -> Optional[bool]:
+        """Deliver one key press; whether pjsua_client acted on it, None if that is unknown."""
+        with self._lock:
+            if self._sock is not None or time.monotonic() >= self._retry_at:
+                try:
+                    self._write_socket(key)
+                except (OSError, ValueError):
+                    self._disconnect()  # not delivered: fall back to HTTP
+                else:
+                    try:
+                        return self._read_reply()
+                    except (OSError, ValueError):
+                        self._disconnect()
+                        return None  # written, outcome unknown: never resend
+            if not self.fallback_url:
+                return None
+            try:
+                return self._send_http(key)
+            except (OSError, ValueError):
+                return None
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+
+def _bench(path: str, url: str, key: str, presses: int, interval: float):
+    import statistics
+
+    def run(label, send):
+        latencies = []
+        for _ in range(presses):
+            start = time.perf_counter()
+            send(key)
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(interval)
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        p50 = statistics.median(latencies)
+        print(f"{label:<22} p50={p50:.3f}ms p95={p95:.3f}ms max={latencies[-1]:.3f}ms")
+
+    channel = KeypressChannel(path, fallback_url=None)
+    if channel.send(key) is None:
+        print(f"socket {path} not reachable")
+    else:
+        run("unix socket", channel.send)
+    channel.close()
+    run("http (urllib)", KeypressChannel("", fallback_url=url)._send_http)
+    try:
+        import requests
+    except ImportError:
+        return
+    run("http (requests.post)", lambda k: requests.post(url, json={"key": k}, timeout=1))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Key-press round-trip latency: Unix socket vs HTTP")
+    ap.add_argument("--bench", action="store_true")
+    ap.add_argument("--socket", default=KEYPRESS_SOCKET)
+    ap.add_argument("--url", default=PJSUA_KEY_URL)
+    ap.add_argument("--key", default="1")
+    ap.add_argument("--presses", type=int, default=200)
+    ap.add_argument("--interval", type=float, default=0.01)
+    opts = ap.parse_args()
+    if opts.bench:
+        _bench(opts.socket, opts.url, opts.key, opts.presses, opts.interval)
+    else:
+        ap.print_help()
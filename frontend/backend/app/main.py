@@ -1,10 +1,26 @@
-from fastapi import FastAPI
-import json
+from fastapi import FastAPI, Query, Request
+import asyncio
+import os
+import time
 from pathlib import Path
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from app.asterisk.asterisk_client import AsteriskClient
+from app.asterisk.channel_tracker import ChannelTracker
+from app.asterisk.originate_queue import OriginateQueue, OriginateQueueFull
+from app.asterisk.config_generator import ConfigSync
 from app.device.device_manager import DeviceManager
+from app.device.code_allocator import CodeExhaustedError
 from app.contacts.contacts_manager import ContactsManager
+from app.contacts import contacts_io
+from app.calls.call_history import CallHistory, DEFAULT_PAGE_SIZE
+from app.calls.cdr_ingester import CdrIngester, CDR_CSV_PATH
+from app.cache import ResponseCache, cached_json_response
+from app.storage import JournalStore
+from app.telemetry.telemetry_store import TelemetryStore, SeriesLimitError, DEFAULT_MAX_POINTS
+from app.events import EventBus, sse_stream
+from app.pjsua_bridge import PjsuaBridge
 
 app = FastAPI()
 
@@ -23,10 +39,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# simple in-memory managers (replace with real integrations)
-device_mgr = DeviceManager()
+FIXTURES_DIR = Path(__file__).resolve().parents[1] / "data"
+DATA_DIR = Path(os.environ.get("LOOPED_DATA_DIR", FIXTURES_DIR))
+
+# Change events from every manager are pushed to clients via /api/events
+events = EventBus()
+
+# Managers persist through snapshot + journal stores in DATA_DIR
+device_store = JournalStore(DATA_DIR, "devices")
+contacts_store = JournalStore(DATA_DIR, "contacts")
+device_mgr = DeviceManager(store=device_store, on_change=events.publish)
 asterisk = AsteriskClient()
-contacts_mgr = ContactsManager()
+originate_queue = OriginateQueue(asterisk, publish=events.publish)
+contacts_mgr = ContactsManager(store=contacts_store, on_change=events.publish)
+
+call_history = CallHistory(
+    os.environ.get("CALLS_DB", DATA_DIR / "calls.db"),
+    seed_path=FIXTURES_DIR / "recent_calls.json",
+    on_change=events.publish,
+)
+response_cache = ResponseCache()
+
+
+def _device_for_extension(extension):
+    device = device_mgr.get_device_by_extension(extension)
+    return device["id"] if device else None
+
+
+# Live channel/call table fed by AMI events; finished calls land in call_history
+channel_tracker = ChannelTracker(call_history, events.publish, _device_for_extension)
+channel_tracker.attach(asterisk)
+
+# Regenerates extensions/pjsip/voicemail.conf in ASTERISK_CONFIG_DIR (if set) on changes
+config_sync = ConfigSync(asterisk, device_mgr, contacts_mgr, publish=events.publish)
+
+# Tails Asterisk's Master.csv into call_history, resuming from a checkpoint
+cdr_ingester = CdrIngester(
+    call_history,
+    CDR_CSV_PATH,
+    checkpoint_path=DATA_DIR / "cdr.checkpoint.json",
+    publish=events.publish,
+    device_for_extension=_device_for_extension,
+    utc=os.environ.get("CDR_USE_GMTIME", "").lower() in ("1", "yes", "true"),
+)
+telemetry = TelemetryStore()
+pjsua_bridge = PjsuaBridge(events.publish)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    pjsua_bridge.start()
+    cdr_ingester.start()
+    config_sync.start(events)
+    if asterisk.configured:
+        await asterisk.connect()
+
+
+@app.on_event("shutdown")
+async def close_stores():
+    await pjsua_bridge.stop()
+    await cdr_ingester.stop()
+    await config_sync.stop()
+    channel_tracker.detach()
+    await originate_queue.stop()
+    await asterisk.close()
+    device_store.close()
+    contacts_store.close()
+    call_history.close()
 
 
 @app.get("/health")
@@ -34,34 +113,222 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/events")
+async def event_stream(
+    request: Request, types: Optional[str] = None, last_event_id: Optional[int] = None
+):
+    """Server-Sent Events stream of incremental changes.
+
+    Event types: device.*, contact.*, hot_dials.changed, call.created,
+    calls.imported (a CDR backfill landed; refetch history),
+    call.started/answered/ended (live calls), originate.*, asterisk.config,
+    pjsua.status, and "resync" (refetch everything; sent when a client
+    falls too far behind). `types=contact,hot_dials` limits the stream to
+    those prefixes. Reconnecting clients resume via Last-Event-ID.
+    """
+    header_id = request.headers.get("last-event-id")
+    if last_event_id is None and header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+    sub = events.subscribe(last_seq=last_event_id)
+    wanted = set(types.split(",")) if types else None
+    return StreamingResponse(
+        sse_stream(request, sub, wanted),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/api/devices")
-async def list_devices():
-    return {"devices": device_mgr.list_devices()}
+async def list_devices(
+    offset: int = 0,
+    limit: Optional[int] = None,
+    status: Optional[str] = None,
+    location: Optional[str] = None,
+    device_type: Optional[str] = Query(None, alias="type"),
+    sensor: Optional[str] = None,
+):
+    """List devices, optionally filtered on meta fields and paginated."""
+    offset = max(0, offset)
+    devices, total = device_mgr.list_devices(
+        offset=offset,
+        limit=limit,
+        status=status,
+        location=location,
+        type=device_type,
+        sensors=sensor,
+    )
+    next_offset = offset + len(devices) if offset + len(devices) < total else None
+    return {"devices": devices, "total": total, "next_offset": next_offset}
+
+
+@app.get("/api/devices/by-hostname/{hostname}")
+async def get_device_by_hostname(hostname: str):
+    device = device_mgr.get_device_by_hostname(hostname)
+    if device:
+        return device
+    return {"error": "Device not found"}
+
+
+@app.get("/api/devices/{device_id}")
+async def get_device(device_id: int):
+    device = device_mgr.get_device(device_id)
+    if device:
+        return device
+    return {"error": "Device not found"}
 
 
 @app.get("/api/calls")
-async def list_calls():
-    """Return recent call history from backend/data/recent_calls.json (fixture)."""
+async def list_calls(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    device_id: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    call_type: Optional[str] = Query(None, alias="type"),
+    status: Optional[str] = None,
+    number: Optional[str] = None,
+):
+    """Return one page of call history, newest first.
+
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page.
+    Responses are cached until the store changes and carry an ETag, so a
+    repeat poll with `If-None-Match` gets an empty 304.
+    """
     try:
-        data_path = Path(__file__).resolve().parents[1] / "data" / "recent_calls.json"
-        if data_path.exists():
-            with open(data_path, "r", encoding="utf-8") as f:
-                calls = json.load(f)
-            return {"calls": calls}
-        return {"calls": []}
-    except Exception as e:
+        entry = response_cache.get(
+            ("calls", str(request.query_params)),
+            call_history.signature(),
+            lambda: call_history.list_calls(
+                limit=limit,
+                cursor=cursor,
+                device_id=device_id,
+                since=since,
+                until=until,
+                call_type=call_type,
+                status=status,
+                number=number,
+            ),
+        )
+        return cached_json_response(request, entry)
+    except ValueError as e:
         return {"error": str(e)}
 
 
+@app.get("/api/calls/active")
+async def list_active_calls(extension: Optional[str] = None):
+    """Calls in progress right now, as tracked from AMI events."""
+    return {
+        "calls": channel_tracker.active_calls(extension),
+        "channels": channel_tracker.channel_count(),
+        "ami_connected": asterisk.connected,
+    }
+
+
 @app.post("/api/devices")
 async def add_device(device: dict):
-    return device_mgr.add_device(device)
+    try:
+        return device_mgr.add_device(device)
+    except CodeExhaustedError as e:
+        return {"error": str(e)}
+
+
+@app.delete("/api/devices/{device_id}")
+async def delete_device(device_id: int):
+    if device_mgr.delete_device(device_id):
+        telemetry.drop_device(device_id)
+        return {"success": True, "message": "Device deleted"}
+    return {"success": False, "error": "Device not found"}
+
+
+@app.post("/api/telemetry")
+async def ingest_telemetry(body: dict):
+    """Batched sensor ingest.
+
+    Body:
+      {"readings": [{"device_id": 2, "sensor": "temperature", "ts": 1700000000.0, "value": 21.5},
+                    ...]}
+    `ts` is unix seconds and defaults to the time of the request.
+    """
+    readings = body.get("readings", [])
+    now = time.time()
+    try:
+        if not isinstance(readings, list) or not all(isinstance(r, dict) for r in readings):
+            raise TypeError("readings must be a list of objects")
+        unknown = {r.get("device_id") for r in readings} - {None}
+        unknown = {d for d in unknown if device_mgr.get_device(d) is None}
+        if unknown:
+            return {"error": f"Unknown device ids: {sorted(unknown, key=str)}"}
+        accepted = telemetry.ingest({**r, "ts": r.get("ts", now)} for r in readings)
+    except (KeyError, TypeError, ValueError, SeriesLimitError) as e:
+        return {"error": str(e)}
+    return {"success": True, "accepted": accepted}
+
+
+@app.get("/api/devices/{device_id}/telemetry")
+async def list_device_sensors(device_id: int):
+    return {"sensors": telemetry.sensors(device_id)}
+
+
+@app.get("/api/devices/{device_id}/telemetry/{sensor}")
+async def query_telemetry(
+    device_id: int,
+    sensor: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+):
+    """Readings for one sensor; defaults to the last hour.
+
+    Returns raw [ts, value] points when they fit in `max_points`, otherwise
+    1m or 1h [ts, min, max, mean] rollups.
+    """
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - 3600
+    result = telemetry.query(device_id, sensor, start, end, max(1, max_points))
+    if result is None:
+        return {"error": "No telemetry for this device/sensor"}
+    return result
 
 
 @app.post("/api/asterisk/ping")
 async def asterisk_ping():
-    # example endpoint to interact with Asterisk client stub
-    return {"connected": asterisk.ping()}
+    return {"connected": await asterisk.ping()}
+
+
+@app.post("/api/asterisk/originate")
+async def originate_calls(body: dict):
+    """Ring several extensions at once (paging / broadcast).
+
+    Body: {"extensions": ["1000", "1001"], "context": "from-internal",
+           "caller_id": "Front Door <100>", "wait": false}
+    Calls are rate limited; progress arrives as originate.* events. With
+    "wait": true the response holds every call's outcome.
+    """
+    extensions = body.get("extensions") or []
+    if not extensions:
+        return {"error": "No extensions given"}
+    params = {"context": body.get("context", "from-internal"), "caller_id": body.get("caller_id")}
+    try:
+        batch, futures, duplicates = originate_queue.submit_many(extensions, **params)
+    except OriginateQueueFull as e:
+        return {"error": str(e)}
+    if body.get("wait"):
+        results = await asyncio.gather(*futures.values())
+        return {"batch": batch, "results": results}
+    return {
+        "batch": batch,
+        "queued": [e for e in futures if e not in duplicates],
+        "duplicates": duplicates,
+    }
+
+
+@app.post("/api/asterisk/config/sync")
+async def sync_asterisk_config(dry_run: bool = False):
+    """Regenerate the Asterisk configs now; reloads only the modules whose files changed."""
+    if not config_sync.enabled:
+        return {"error": "ASTERISK_CONFIG_DIR is not set"}
+    return await config_sync.sync(dry_run=dry_run)
 
 
 # Contacts API Endpoints
@@ -75,6 +342,69 @@ async def add_contact(contact: dict):
     return contacts_mgr.add_contact(contact)
 
 
+@app.post("/api/contacts/bulk")
+async def bulk_contacts(body: dict):
+    """Create, update and delete many contacts in one atomic request.
+
+    Body: {"create": [contact, ...], "update": [{"id": 1, ...}, ...], "delete": [id, ...]}
+    """
+    try:
+        return contacts_mgr.bulk(
+            create=body.get("create", []),
+            update=body.get("update", []),
+            delete=body.get("delete", []),
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+IMPORT_BATCH_SIZE = 200
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "contacts.csv", contacts_io.export_csv),
+    "vcard": ("text/vcard", "contacts.vcf", contacts_io.export_vcard),
+}
+
+
+@app.post("/api/contacts/import")
+async def import_contacts(request: Request, format: str = "csv"):
+    """Stream a CSV or vCard upload into contacts, applied in batches."""
+    parsers = {"csv": contacts_io.parse_csv, "vcard": contacts_io.parse_vcard}
+    if format not in parsers:
+        return {"error": f"Unsupported format: {format}"}
+
+    imported = 0
+    batch = []
+    async for contact in parsers[format](contacts_io.iter_lines(request.stream())):
+        batch.append(contact)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            imported += len(contacts_mgr.bulk(create=batch)["created"])
+            batch = []
+    if batch:
+        imported += len(contacts_mgr.bulk(create=batch)["created"])
+    return {"success": True, "imported": imported}
+
+
+@app.get("/api/contacts/export")
+async def export_contacts(format: str = "csv"):
+    if format not in EXPORT_FORMATS:
+        return {"error": f"Unsupported format: {format}"}
+    media_type, filename, exporter = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        exporter(contacts_mgr.list_contacts()),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/api/contacts/lookup")
+async def lookup_contact(number: str):
+    """Resolve a caller-ID number to a contact (caller-ID for incoming calls)."""
+    contact = contacts_mgr.lookup_number(number)
+    if contact:
+        return contact
+    return {"error": "No contact matches this number"}
+
+
 @app.get("/api/contacts/{contact_id}")
 async def get_contact(contact_id: int):
     contact = contacts_mgr.get_contact(contact_id)
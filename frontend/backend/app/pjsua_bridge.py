@@ -0,0 +1,96 @@
+"""Relays pjsua_client registration and call state onto the event bus.
+
+pjsua_client.py runs as its own service and serves its state on
+PJSUA_STATUS_URL. The bridge reads it once, then long-polls the client's
+/events endpoint, so a change arrives as soon as it happens and an idle
+phone costs one request per LONG_POLL_TIMEOUT. Requests go over plain
+asyncio streams so stop() cancels a pending long-poll at once. A
+"pjsua.status" event is published only when registration or call state
+changes, so one backend task stands in for every browser polling the phone.
+"""
+
+import asyncio
+import json
+import os
+import urllib.parse
+
+PJSUA_STATUS_URL = os.environ.get("PJSUA_STATUS_URL", "http://localhost:5050/status")
+POLL_INTERVAL = 1.0     # retry delay while the client is unreachable
+LONG_POLL_TIMEOUT = 25
+
+# Fields whose change is worth an event; last_updated alone is not
+_TRACKED = ("registered", "call_state", "call_info", "caller", "pjsua")
+
+
+class PjsuaBridge:
+    def __init__(self, publish, url: str = PJSUA_STATUS_URL, interval: float = POLL_INTERVAL):
+        self._publish = publish
+        self._url = url
+        self._events_url = urllib.parse.urljoin(url, "events")
+        self._interval = interval
+        self._task = None
+        self.state = None
+
+    @staticmethod
+    async def _fetch(url: str, timeout: float = 2):
+        """GET a JSON document from pjsua_client's HTTP server."""
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+        try:
+            writer.write(f"GET {target} HTTP/1.0\r\nHost: {parts.netloc}\r\n\r\n".encode("ascii"))
+            raw = await asyncio.wait_for(reader.read(), timeout)
+        finally:
+            writer.close()
+        head, _, body = raw.partition(b"\r\n\r\n")
+        status = head.split(b" ", 2)[1:2]
+        if status != [b"200"]:
+            raise ConnectionError(f"{url}: {head.splitlines()[0] if head else 'no response'}")
+        return json.loads(body.decode("utf-8"))
+
+    async def _wait_for_change(self, seq):
+        """Return the newest state after `seq`, or the current one if seq is None."""
+        if seq is None:
+            return await self._fetch(self._url)
+        query = urllib.parse.urlencode({"since": seq, "timeout": LONG_POLL_TIMEOUT})
+        found = await self._fetch(f"{self._events_url}?{query}", timeout=LONG_POLL_TIMEOUT + 5)
+        if found.get("missed"):
+            return await self._fetch(self._url)
+        if not found.get("events"):
+            return None  # long-poll timed out with nothing new
+        return found["events"][-1]
+
+    async def _run(self):
+        last = None
+        seq = None
+        while True:
+            try:
+                state = await self._wait_for_change(seq)
+            except (OSError, ValueError, asyncio.TimeoutError):
+                state = {"registered": False, "call_state": None, "reachable": False}
+                seq = None
+            if state is None:
+                continue
+            if "seq" in state:
+                seq = state["seq"]
+            key = tuple(json.dumps(state.get(f), sort_keys=True) for f in _TRACKED + ("reachable",))
+            if key != last:
+                last = key
+                self.state = state
+                self._publish("pjsua.status", state)
+            if seq is None:
+                await asyncio.sleep(self._interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
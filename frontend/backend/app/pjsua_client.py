@@ -13,253 +13,455 @@ Environment variables used:
   SIP_DOMAIN - SIP domain (used in identity)
   SIP_SERVER - SIP registrar/proxy (hostname or IP)
   LISTEN_PORT - HTTP status port (default: 5050)
+  BACKEND_URL - Looped backend used for caller-ID lookup (default: http://localhost:8000)
+  EVENT_HISTORY - state changes kept for GET /events (default: 256)
+  MAX_CONNECTIONS - open HTTP connections allowed at once (default: 64)
+  KEYPRESS_SOCKET - Unix socket for key presses from keypad_dtmf.py
+                    (default: /run/looped-keypress.sock; empty to disable)
+  DIAL_TIMEOUT - seconds to wait for the next digit while dialing (default: 3)
+  DIAL_PLAN - pattern=kind list the dial string is matched against (see dial_plan.py)
+  HOT_DIAL_CACHE - file the hot-dial table is cached in between runs
+
+GET /status returns the current state. GET /events?since=<seq> returns the
+state changes after <seq>, waiting up to `timeout` seconds (default 25) for
+the next one if there are none yet, so consumers can long-poll instead of
+re-reading /status.
+
+The HTTP server is an asyncio loop on its own thread with HTTP/1.1
+keep-alive, so slow pollers, waiting long-polls and stalled connections
+cannot delay a key press; a connection idle or stalled for
+CONNECTION_TIMEOUT is dropped. The pjsua reader threads and the server
+share `state` under `state_lock`. keypad_dtmf.py sends presses over the
+KEYPRESS_SOCKET fast path (see keypress_channel.py) and POST /keypress is
+its fallback.
+
+pjsua runs under an in-process supervisor (pjsua_supervisor.py): when it
+exits it is restarted with exponential backoff while the HTTP server,
+socket and `state` stay up, and /status reports restart counts and
+time-to-registered under "pjsua".
+
+With no call up, keys build a dial string on the phone (pjsua_dialer.py,
+dial_plan.py): it is matched digit by digit against DIAL_PLAN and dialed
+as soon as it is unambiguous, on "#", or after DIAL_TIMEOUT without a key.
+Hot dials 1-9 resolve from a local table the backend keeps current over
+its event stream. Each call is one make-call command to pjsua.
 
 This implementation uses only the pjsua CLI (no Python pjsua bindings),
 so it works on systems where pjsua binary is available.
 """
 
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from collections import deque
+from http import HTTPStatus
+import asyncio
 import json
 import os
-import subprocess
 import threading
 import time
 from datetime import datetime
-import queue
 import signal
 import sys
+import urllib.parse
+import urllib.request
 from typing import Optional
 
-# State shared between threads
+from keypress_channel import KEYPRESS_SOCKET, PRESS, decode_press, encode_result
+from pjsua_dialer import PhoneDialer
+from pjsua_log import CallerEvent, CallStateEvent, IncomingCallEvent, RegistrationEvent
+from pjsua_supervisor import LOG_PREFIX, PjsuaSupervisor, build_pjsua_args
+
+# State shared between threads; hold state_lock to read or change it
+state_lock = threading.RLock()
 state = {
     "registered": False,
     "last_event": "starting",
     "last_updated": datetime.utcnow().isoformat() + "Z",
     "call_state": None,
     "call_info": None,
+    "caller": None,
+    "call_direction": None,  # "incoming" / "outgoing"
+    "dialing": "",           # digits collected so far on the keypad
+    # Supervisor bookkeeping; replaced, never mutated, so history snapshots stay intact
+    "pjsua": {
+        "running": False,
+        "pid": None,
+        "restarts": 0,
+        "last_exit": None,
+        "time_to_registered": None,
+    },
 }
 
-event_q = queue.Queue()
-
 PJSUA_BIN = os.environ.get("PJSUA_BIN", "pjsua")
 SIP_USER = os.environ.get("SIP_USER")
 SIP_PASS = os.environ.get("SIP_PASS")
 SIP_DOMAIN = os.environ.get("SIP_DOMAIN")
 SIP_SERVER = os.environ.get("SIP_SERVER")
 LISTEN_PORT = int(os.environ.get("LISTEN_PORT", "5050"))
-
-LOG_PREFIX = "[pjsua-client]"
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:8000")
+EVENT_HISTORY = int(os.environ.get("EVENT_HISTORY", "256"))
+LONG_POLL_TIMEOUT = 25.0
+LONG_POLL_MAX = 60.0
+MAX_CONNECTIONS = int(os.environ.get("MAX_CONNECTIONS", "64"))
+CONNECTION_TIMEOUT = 10.0  # idle keep-alive / slow request cutoff, seconds
+MAX_BODY = 4096
 
 if not SIP_USER or not SIP_PASS or not SIP_DOMAIN or not SIP_SERVER:
     print(f"{LOG_PREFIX} Missing SIP configuration. Set SIP_USER,SIP_PASS,SIP_DOMAIN,SIP_SERVER.")
     sys.exit(1)
 
 
+class EventLog:
+    """Fixed-size history of state snapshots, numbered so readers can resume.
+
+    Each entry is a copy of `state` plus its `seq`. Readers ask for everything
+    after the last seq they saw; once the history has wrapped past that point
+    they get what is left with `missed` set, and should re-read /status.
+    """
+
+    def __init__(self, size: int):
+        self._events = deque(maxlen=size)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._waiters = set()  # (loop, future) of async readers
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def append(self, snapshot: dict) -> int:
+        with self._cond:
+            self._seq += 1
+            self._events.append(dict(snapshot, seq=self._seq))
+            self._cond.notify_all()
+            for loop, future in self._waiters:
+                loop.call_soon_threadsafe(_wake, future)
+            return self._seq
+
+    def since(self, seq: int, timeout: float = 0.0):
+        """Return (events after `seq`, latest seq, missed), waiting up to `timeout`."""
+        with self._cond:
+            if seq > self._seq:
+                seq = 0  # reader saw an earlier run of this process
+            if timeout > 0 and seq == self._seq:
+                self._cond.wait_for(lambda: self._seq > seq, timeout)
+            first = self._events[0]["seq"] if self._events else self._seq + 1
+            events = (
+                [e for e in self._events if e["seq"] > seq]
+                if seq >= first - 1
+                else list(self._events)
+            )
+            return events, self._seq, seq < first - 1
+
+    async def wait(self, seq: int, timeout: float = 0.0):
+        """since() for event-loop callers: waits on a future instead of blocking a thread."""
+        with self._cond:
+            if timeout <= 0 or seq != self._seq:
+                return self.since(seq)
+            waiter = (asyncio.get_running_loop(), asyncio.get_running_loop().create_future())
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._waiters.discard(waiter)
+        return self.since(seq)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+events = EventLog(EVENT_HISTORY)
+
+
 def update_state(registered: bool, event: str):
-    state["registered"] = registered
-    state["last_event"] = event
-    state["last_updated"] = datetime.utcnow().isoformat() + "Z"
-    event_q.put((registered, event, state["last_updated"]))
+    with state_lock:
+        state["registered"] = registered
+        state["last_event"] = event
+        state["last_updated"] = datetime.utcnow().isoformat() + "Z"
+        events.append(state)
 
 
 def update_call_state(call_state: str, info: Optional[str] = None):
-    state["call_state"] = call_state
-    state["call_info"] = info
-    state["last_event"] = f"call:{call_state} {info or ''}".strip()
-    state["last_updated"] = datetime.utcnow().isoformat() + "Z"
-    event_q.put((state["registered"], state["last_event"], state["last_updated"]))
+    with state_lock:
+        state["call_state"] = call_state
+        state["call_info"] = info
+        if call_state == "ended":
+            state["call_direction"] = None  # however it ended: hangup, remote, pjsua exit
+        state["last_event"] = f"call:{call_state} {info or ''}".strip()
+        state["last_updated"] = datetime.utcnow().isoformat() + "Z"
+        events.append(state)
 
 
-# Global handle to the running pjsua process so we can send stdin commands
-pjsua_proc: Optional[subprocess.Popen] = None
+def state_snapshot() -> dict:
+    with state_lock:
+        return dict(state, seq=events.seq)
 
 
-class StatusHandler(BaseHTTPRequestHandler):
-    def _send_json(self, data, code=200):
-        payload = json.dumps(data).encode("utf-8")
-        self.send_response(code)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(payload)))
-        self.end_headers()
-        self.wfile.write(payload)
+def lookup_caller(number: str) -> Optional[dict]:
+    """Resolve an incoming caller's number/URI to a contact via the backend index."""
+    url = f"{BACKEND_URL}/api/contacts/lookup?" + urllib.parse.urlencode({"number": number})
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            contact = json.loads(resp.read().decode("utf-8"))
+    except Exception as exc:
+        print(f"{LOG_PREFIX} Caller lookup failed for {number}: {exc}")
+        return None
+    if not isinstance(contact, dict) or "error" in contact:
+        return None
+    return contact
+
+
+def resolve_incoming_caller(remote: str):
+    """Attach caller-ID info to the current call (runs off the reader thread)."""
+    contact = lookup_caller(remote)
+    name = contact["name"] if contact else "unknown caller"
+    with state_lock:
+        state["caller"] = {"remote": remote, "contact": contact}
+        update_call_state(state.get("call_state") or "incoming", f"caller:{name}")
+
+
+def apply_log_event(event):
+    """Fold one parsed pjsua log event into `state`."""
+    if isinstance(event, RegistrationEvent):
+        with state_lock:
+            spawned_at = supervisor.spawned_at
+            if event.registered and state["pjsua"]["time_to_registered"] is None and spawned_at:
+                set_pjsua_status(time_to_registered=round(time.monotonic() - spawned_at, 3))
+            update_state(event.registered, event.line)
+    elif isinstance(event, IncomingCallEvent):
+        dialer.cancel()
+        with state_lock:
+            state["caller"] = None
+            state["call_direction"] = "incoming"
+            update_call_state('incoming', event.line)
+    elif isinstance(event, CallStateEvent):
+        update_call_state(event.state, event.line)
+    elif isinstance(event, CallerEvent):
+        with state_lock:
+            if state.get("call_state") not in ("incoming", "ringing") or state.get("caller"):
+                return
+            state["caller"] = {"remote": event.remote, "contact": None}
+        threading.Thread(target=resolve_incoming_caller, args=(event.remote,), daemon=True).start()
+
+
+def handle_key(key) -> bool:
+    """Act on one keypad key; returns False if it means nothing in the current call state.
+
+    Runs under state_lock so two quick presses cannot both see "ringing"
+    and answer twice.
+    """
+    with state_lock:
+        cs = state.get('call_state')
+        outgoing = state.get('call_direction') == "outgoing"
+        # With no call up, keys (and "#" to send now) go to the dial string
+        if cs in (None, "ended"):
+            return dialer.feed(key)
+        # Pound key acts as answer/hang toggle; an outgoing call that is still ringing is hung up
+        if key == "#":
+            if cs in ("incoming", "ringing") and not outgoing:
+                if supervisor.send('a'):
+                    update_call_state('active', 'answered-via-key')
+                    return True
+            elif cs in ("active", "established", "confirmed") or outgoing:
+                if supervisor.send('h'):
+                    update_call_state('ended', 'hangup-via-key')
+                    return True
+            return False
+        # If in an active call, send DTMF for digits and symbols
+        if cs in ("active", "established", "confirmed"):
+            # send dtmf via pjsua CLI: `dtmf <digit>`
+            if supervisor.send(f"dtmf {key}"):
+                update_call_state('active', f'dtmf:{key}')
+                return True
+        return False
+
 
-    def do_GET(self):
-        if self.path == "/status":
-            self._send_json(state)
+def note_dialing(digits: str, event: str):
+    with state_lock:
+        state["dialing"] = digits
+        state["last_event"] = event
+        state["last_updated"] = datetime.utcnow().isoformat() + "Z"
+        events.append(state)
+
+
+def place_call(digits: str, target: str, info: str):
+    """Send the make-call command for a completed dial string (called by the dialer)."""
+    with state_lock:
+        if state["call_state"] not in (None, "ended"):
+            return  # a call came in while the timeout ran
+        # "m" prompts for the URI, so command and URI go to pjsua in one write
+        if supervisor.send(f"m\nsip:{target}@{SIP_SERVER}"):
+            state["caller"] = None
+            state["call_direction"] = "outgoing"
+            update_call_state('calling', info)
         else:
-            self.send_response(404)
-            self.end_headers()
-
-    def do_POST(self):
-        # Restrict to localhost callers for safety
-        client = self.client_address[0]
-        if client not in ("127.0.0.1", "::1") and not client.startswith("::ffff:127.0.0.1"):
-            self.send_response(403)
-            self.end_headers()
-            return
+            note_dialing("", f"dial-failed:{digits}")
 
-        if self.path == "/keypress":
-            length = int(self.headers.get('Content-Length', 0))
-            raw = self.rfile.read(length)
-            try:
-                payload = json.loads(raw.decode('utf-8'))
-                key = payload.get('key')
-            except Exception:
-                self._send_json({"error": "invalid json"}, code=400)
-                return
 
-            handled = False
-            # Pound key acts as answer/hang toggle
-            if key == "#":
-                cs = state.get('call_state')
-                if cs in ("incoming", "ringing"):
-                    handled = send_pjsua_cmd('a')
-                    if handled:
-                        update_call_state('active', 'answered-via-key')
-                elif cs in ("active", "established", "confirmed"):
-                    handled = send_pjsua_cmd('h')
-                    if handled:
-                        update_call_state('ended', 'hangup-via-key')
-                else:
-                    handled = False
-            else:
-                # If in an active call, send DTMF for digits and symbols
-                cs = state.get('call_state')
-                if cs in ("active", "established", "confirmed"):
-                    # send dtmf via pjsua CLI: `dtmf <digit>`
-                    try:
-                        handled = send_pjsua_cmd(f"dtmf {key}")
-                        if handled:
-                            update_call_state('active', f'dtmf:{key}')
-                    except Exception:
-                        handled = False
-                else:
-                    handled = False
-
-            if handled:
-                self._send_json({"ok": True})
-            else:
-                self._send_json({"ok": False, "reason": "not-handled"}, code=200)
-            return
+def set_pjsua_status(**fields):
+    with state_lock:
+        state["pjsua"] = dict(state["pjsua"], **fields)
 
-        self.send_response(404)
-        self.end_headers()
 
-    def log_message(self, format, *args):
-        # Silence default logging to stdout
-        return
+def on_pjsua_status(event: Optional[str], **fields):
+    """Fold the supervisor's bookkeeping into `state`; pjsua exiting ends any call."""
+    with state_lock:
+        set_pjsua_status(**fields)
+        if fields.get("running") is False and state["call_state"] not in (None, "ended"):
+            update_call_state("ended", "pjsua exited")
+        if event is not None:
+            update_state(False, event)
 
 
-def run_http_server():
-    server = HTTPServer(("0.0.0.0", LISTEN_PORT), StatusHandler)
-    print(f"{LOG_PREFIX} HTTP status server listening on :{LISTEN_PORT}")
-    try:
-        server.serve_forever()
-    except KeyboardInterrupt:
-        print(f"{LOG_PREFIX} HTTP server stopped")
-    finally:
-        server.server_close()
-
-
-def build_pjsua_args():
-    # Build a safe pjsua CLI invocation that registers and stays running
-    identity = f"sip:{SIP_USER}@{SIP_DOMAIN}"
-    registrar = f"sip:{SIP_SERVER}"
-
-    args = [
-        PJSUA_BIN,
-        "--id", identity,
-        "--registrar", registrar,
-        "--realm", "*",
-        "--username", SIP_USER,
-        "--password", SIP_PASS,
-        # Less verbose log level by default; frontend can read /status
-        "--log-level", "3",
-        # Keep console output (we will read it)
-    ]
-
-    return args
-
-
-def monitor_pjsua_process(proc: subprocess.Popen):
-    """Reads lines from pjsua stdout/stderr and updates registration state."""
-    # pjsua prints to stderr sometimes, so read both fd via iter
-    def reader(stream, stream_name):
-        for raw in iter(stream.readline, b""):
-            try:
-                line = raw.decode("utf-8", errors="replace").strip()
-            except Exception:
-                line = str(raw)
-            if not line:
-                continue
-            print(f"{LOG_PREFIX} ({stream_name}) {line}")
-            # Detect registration events in common pjsua output patterns
-            lowline = line.lower()
-            if ("registration complete" in lowline) or ("registered" in lowline and "status=200" in lowline):
-                update_state(True, line)
-            elif "registration failed" in lowline or ("status=" in lowline and ("401" in lowline or "403" in lowline or "407" in lowline)):
-                update_state(False, line)
-            elif "unregistered" in lowline or "registration refresh failed" in lowline:
-                update_state(False, line)
-
-            # Call state events (best-effort matching)
-            if "incoming call" in lowline or "call from" in lowline or "ringing" in lowline:
-                update_call_state('incoming', line)
-            if "established" in lowline or "call answered" in lowline or "connected" in lowline:
-                update_call_state('active', line)
-            if "disconnected" in lowline or "call is terminated" in lowline or "hangup" in lowline or "call ended" in lowline:
-                update_call_state('ended', line)
-
-    t_out = threading.Thread(target=reader, args=(proc.stdout, "STDOUT"), daemon=True)
-    t_err = threading.Thread(target=reader, args=(proc.stderr, "STDERR"), daemon=True)
-    t_out.start()
-    t_err.start()
-    # Wait for process to exit
-    proc.wait()
-    print(f"{LOG_PREFIX} pjsua process exited with {proc.returncode}")
-    update_state(False, f"pjsua exited ({proc.returncode})")
-
-
-def send_pjsua_cmd(cmd: str) -> bool:
-    """Send a single-character command to the pjsua process stdin (non-blocking)."""
-    global pjsua_proc
-    if not pjsua_proc or pjsua_proc.stdin is None:
-        print(f"{LOG_PREFIX} No pjsua process stdin available to send '{cmd}'")
-        return False
-    try:
-        pjsua_proc.stdin.write((cmd + "\n").encode('utf-8'))
-        pjsua_proc.stdin.flush()
-        print(f"{LOG_PREFIX} Sent command to pjsua: {cmd}")
-        return True
-    except Exception as exc:
-        print(f"{LOG_PREFIX} Failed to send cmd to pjsua: {exc}")
-        return False
+dialer = PhoneDialer(BACKEND_URL, place_call, note_dialing)
+supervisor = PjsuaSupervisor(
+    build_pjsua_args(PJSUA_BIN, SIP_USER, SIP_PASS, SIP_DOMAIN, SIP_SERVER),
+    apply_log_event, on_pjsua_status)
 
 
-def start_pjsua_and_monitor():
-    args = build_pjsua_args()
-    print(f"{LOG_PREFIX} Starting pjsua: {' '.join(args)}")
+class ControlServer:
+    """HTTP/1.1 server for /status, /events and /keypress on an asyncio loop.
+
+    Connections are kept alive and cost nothing while idle, and a waiting
+    long-poll is just a future, so no number of pollers can hold up a key
+    press. Each read is bounded by CONNECTION_TIMEOUT, after which the
+    connection is dropped.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = LISTEN_PORT,
+                 max_connections: int = MAX_CONNECTIONS, key_socket: str = KEYPRESS_SOCKET):
+        self.host = host
+        self.port = port
+        self.key_socket = key_socket
+        self._max_connections = max_connections
+        self._connections = 0
+
+    async def serve(self):
+        server = await asyncio.start_server(self._connection, self.host, self.port)
+        print(f"{LOG_PREFIX} HTTP status server listening on :{self.port}")
+        if self.key_socket:
+            try:
+                os.unlink(self.key_socket)  # left behind by an earlier run
+            except FileNotFoundError:
+                pass
+            try:
+                await asyncio.start_unix_server(self._key_connection, self.key_socket)
+                print(f"{LOG_PREFIX} Key-press socket listening on {self.key_socket}")
+            except OSError as exc:
+                print(f"{LOG_PREFIX} Key-press socket unavailable ({exc}); HTTP only")
+        async with server:
+            await server.serve_forever()
+
+    async def _key_connection(self, reader, writer):
+        """Serve fixed-size key-press frames from keypad_dtmf until it disconnects."""
+        try:
+            while True:
+                seq, key = decode_press(await reader.readexactly(PRESS.size))
+                writer.write(encode_result(seq, handle_key(key)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _connection(self, reader, writer):
+        if self._connections >= self._max_connections:
+            writer.write(self._response(503, {"error": "busy"}, keep_alive=False))
+            writer.close()
+            return
+        self._connections += 1
+        peer = writer.get_extra_info("peername") or ("",)
+        try:
+            while await self._request(reader, writer, peer[0]):
+                pass
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            pass  # idle, stalled, malformed or gone: drop the connection
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    async def _request(self, reader, writer, client: str) -> bool:
+        """Serve one request; returns whether the connection stays open."""
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), CONNECTION_TIMEOUT)
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if not 0 <= length <= MAX_BODY:
+            raise ValueError("bad Content-Length")
+        body = (
+            await asyncio.wait_for(reader.readexactly(length), CONNECTION_TIMEOUT)
+            if length
+            else b""
+        )
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        code, data = await self._route(method, target, body, client)
+        writer.write(self._response(code, data, keep_alive))
+        await asyncio.wait_for(writer.drain(), CONNECTION_TIMEOUT)
+        return keep_alive
+
+    @staticmethod
+    def _response(code: int, data, keep_alive: bool) -> bytes:
+        payload = json.dumps(data).encode("utf-8") if data is not None else b""
+        head = [
+            f"HTTP/1.1 {code} {HTTPStatus(code).phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(payload)}",
+            "Connection: " + ("keep-alive" if keep_alive else "close"),
+        ]
+        return ("\r\n".join(head) + "\r\n\r\n").encode("ascii") + payload
+
+    async def _route(self, method: str, target: str, body: bytes, client: str):
+        url = urllib.parse.urlsplit(target)
+        if method == "GET" and url.path == "/status":
+            return 200, state_snapshot()
+        if method == "GET" and url.path == "/events":
+            query = urllib.parse.parse_qs(url.query)
+            try:
+                since = int(query.get("since", ["0"])[0])
+                timeout = float(query.get("timeout", [LONG_POLL_TIMEOUT])[0])
+            except ValueError:
+                return 400, {"error": "since and timeout must be numbers"}
+            if "since" not in query:
+                timeout = 0  # no cursor yet: return the history now
+            found, seq, missed = await events.wait(since, min(max(timeout, 0), LONG_POLL_MAX))
+            return 200, {"seq": seq, "missed": missed, "events": found}
+        if method == "POST":
+            # Restrict to localhost callers for safety
+            if client not in ("127.0.0.1", "::1") and not client.startswith("::ffff:127.0.0.1"):
+                return 403, None
+            if url.path == "/keypress":
+                try:
+                    payload = json.loads(body.decode('utf-8'))
+                    key = payload.get('key')
+                except Exception:
+                    return 400, {"error": "invalid json"}
+                if handle_key(key):
+                    return 200, {"ok": True}
+                return 200, {"ok": False, "reason": "not-handled"}
+        return 404, None
 
-    # Use pipes for stdout/stderr
-    try:
-        proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
-        # expose proc so HTTP handler can send stdin commands
-        global pjsua_proc
-        pjsua_proc = proc
-    except FileNotFoundError:
-        print(f"{LOG_PREFIX} pjsua binary not found: {PJSUA_BIN}")
-        update_state(False, "pjsua not found")
-        return
-    except Exception as exc:
-        print(f"{LOG_PREFIX} Failed to start pjsua: {exc}")
-        update_state(False, f"start failed: {exc}")
-        return
 
-    monitor_pjsua_process(proc)
+def run_http_server():
+    try:
+        asyncio.run(ControlServer().serve())
+    except KeyboardInterrupt:
+        print(f"{LOG_PREFIX} HTTP server stopped")
 
 
 def shutdown(signum, frame):
     print(f"{LOG_PREFIX} Received signal {signum}, shutting down")
+    supervisor.stop()
     sys.exit(0)
 
 
@@ -272,12 +474,11 @@ def main():
     http_t = threading.Thread(target=run_http_server, daemon=True)
     http_t.start()
 
-    # Start pjsua monitor (blocking)
-    start_pjsua_and_monitor()
+    # Hot-dial table: cached copy now, then kept current from the backend
+    dialer.start()
 
-    # If pjsua exits, keep HTTP server running for some time to allow inspection
-    print(f"{LOG_PREFIX} pjsua exited; keeping HTTP server for 60s")
-    time.sleep(60)
+    # Run pjsua under the supervisor (blocking); the HTTP server stays up across restarts
+    supervisor.run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""pjsua_dialer.py
+
+On-phone dialing glue for pjsua_client.py: one DialAssembler over the
+DIAL_PLAN and the HotDialTable it resolves hot dials from (see
+dial_plan.py), turning each completed dial string into a call target.
+
+A hot dial to an internal extension calls it directly; any other number
+goes through Asterisk's **<slot> route, the only one from this phone's
+context to the trunk. pjsua_client supplies place(digits, target, info),
+which sends the make-call command, and note(digits, event), which records
+the dial string as it changes.
+"""
+
+import re
+
+from dial_plan import DIAL_PLAN, DIAL_TIMEOUT, DialAssembler, DialPlan, HotDialTable
+
+
+class PhoneDialer:
+    def __init__(self, backend_url: str, place, note, spec: str = DIAL_PLAN,
+                 timeout: float = DIAL_TIMEOUT):
+        self.plan = DialPlan.parse(spec)
+        self.hot_dials = HotDialTable(backend_url)
+        self._place = place
+        self._note = note
+        self._assembler = DialAssembler(
+            self.plan, self._dial, timeout=timeout,
+            on_reject=lambda digits: note("", f"dial-rejected:{digits}"),
+            on_change=lambda digits: note(digits, f"dial:{digits}"))
+
+    def start(self):
+        """Load the cached hot-dial table, then keep it current from the backend."""
+        self.hot_dials.start()
+
+    def feed(self, key: str) -> bool:
+        return self._assembler.feed(key)
+
+    def cancel(self):
+        self._assembler.cancel()
+
+    def _dial(self, digits: str, kind: str):
+        """Place the call a completed dial string stands for (called by the assembler)."""
+        target, info = digits, f"dialing {digits}"
+        if kind == "hot_dial":
+            slot = int(digits.lstrip("*"))
+            contact = self.hot_dials.get(slot)
+            number = re.sub(r"[^0-9*#]", "", str((contact or {}).get("phone") or ""))
+            if not number:
+                self._note("", f"dial-rejected:{digits} (hot dial {slot} unassigned)")
+                return
+            _, rule = self.plan.match(number)
+            target = number if rule is not None and rule[1] == "extension" else f"**{slot}"
+            info = f"hot dial {slot}: {contact.get('name') or number}"
+        self._place(digits, target, info)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""pjsua_log.py
+
+Turns pjsua console output into typed events for pjsua_client.py.
+
+Every rule lives in one table: a literal keyword plus a pattern. Most
+lines at log level 4-5 are media and transport noise, so a line is first
+checked for the table's keywords (plain substring scans, no lowercasing);
+the few that pass get one search with all patterns compiled into a single
+alternation, and the matching rule is read from `match.lastgroup`.
+Rules are anchored on pjsua's actual
+messages ("registration success, status=200", "Call 0 state changed to
+CONFIRMED", ...), so "unregistration" never counts as a registration and
+"DISCONNECTED" never counts as connected.
+
+Call transitions are ordered per call id: pjsua_client reads stdout and
+stderr on separate threads, and a late EARLY must not undo CONFIRMED.
+
+Replay benchmark (recorded log, or a synthetic level-5 log):
+  python3 pjsua_log.py --bench pjsua.log
+  python3 pjsua_log.py --bench --synthetic 200000
+"""
+
+import re
+import threading
+import time
+from typing import NamedTuple, Optional
+
+
+class RegistrationEvent(NamedTuple):
+    registered: bool
+    status: Optional[int]
+    line: str
+
+
+class CallStateEvent(NamedTuple):
+    call_id: int
+    state: str          # incoming / calling / ringing / connecting / active / ended
+    code: Optional[int]  # SIP status for DISCONNECTED
+    line: str
+
+
+class IncomingCallEvent(NamedTuple):
+    account: int
+    line: str
+
+
+class CallerEvent(NamedTuple):
+    remote: str
+    line: str
+
+
+# pjsua call states -> client call_state, in the order a call moves through them
+CALL_STATES = {
+    "INCOMING": "incoming",
+    "CALLING": "calling",
+    "EARLY": "ringing",
+    "CONNECTING": "connecting",
+    "CONFIRMED": "active",
+    "DISCONNECTED": "ended",
+    "DISCONNCTD": "ended",  # pjsua's abbreviated form in call lists
+}
+_RANK = {"incoming": 0, "calling": 0, "ringing": 1, "connecting": 2, "active": 3, "ended": 4}
+
+# (rule name, keyword the line must contain, pattern); the first alternative
+# to match at the leftmost position wins
+RULES = [
+    ("unreg_ok", "egistration", r"unregistration success"),
+    (
+        "reg_fail",
+        "egistration",
+        r"(?:un)?[Rr]egistration (?:failed|error)(?:[^=]*?status=(?P<fail_status>\d{3}))?",
+    ),
+    ("reg_ok", "egistration", r"[Rr]egistration success, status=(?P<reg_status>\d{3})"),
+    ("reg_refresh_fail", "egistration", r"[Rr]egistration refresh failed"),
+    (
+        "call_disconnected",
+        "Call ",
+        r"Call (?P<dc_id>\d+) is DISCONNECTED \[reason=(?P<dc_code>\d+)",
+    ),
+    ("call_state", "Call ", r"Call (?P<call_id>\d+) state changed to (?P<state>[A-Z]+)"),
+    ("incoming", "Incoming call", r"Incoming call for account (?P<account>\d+)"),
+    ("from", "From:", r"^\s*From:\s*(?P<remote>\S.*?)\s*$"),
+]
+
+KEYWORDS = tuple(dict.fromkeys(keyword for _, keyword, _ in RULES))
+LINE_PATTERN = re.compile("|".join(f"(?P<{name}>{pattern})" for name, _, pattern in RULES))
+
+
+class PjsuaLogParser:
+    def __init__(self):
+        self._calls = {}  # call id -> last client call_state
+        self._lock = threading.Lock()
+
+    def feed(self, line: str):
+        """Return the event for one log line, or None."""
+        for keyword in KEYWORDS:
+            if keyword in line:
+                break
+        else:
+            return None
+        match = LINE_PATTERN.search(line)
+        if match is None:
+            return None
+        rule = match.lastgroup
+        if rule == "reg_ok":
+            status = int(match.group("reg_status"))
+            return RegistrationEvent(200 <= status < 300, status, line)
+        if rule in ("unreg_ok", "reg_refresh_fail"):
+            return RegistrationEvent(False, None, line)
+        if rule == "reg_fail":
+            status = match.group("fail_status")
+            return RegistrationEvent(False, int(status) if status else None, line)
+        if rule == "call_disconnected":
+            return self._transition(
+                int(match.group("dc_id")), "ended", int(match.group("dc_code")), line
+            )
+        if rule == "call_state":
+            state = CALL_STATES.get(match.group("state"))
+            if state is None:
+                return None
+            return self._transition(int(match.group("call_id")), state, None, line)
+        if rule == "incoming":
+            return IncomingCallEvent(int(match.group("account")), line)
+        if rule == "from":
+            return CallerEvent(match.group("remote"), line)
+        return None
+
+    def _transition(self, call_id: int, state: str, code, line: str):
+        with self._lock:
+            previous = self._calls.get(call_id)
+            # stale or repeated (e.g. "is DISCONNECTED" after "changed to DISCONNECTED")
+            if previous is not None and previous != "ended" and _RANK[state] <= _RANK[previous]:
+                return None
+            if previous == "ended" and state == "ended":
+                return None
+            self._calls[call_id] = state
+        return CallStateEvent(call_id, state, code, line)
+
+
+def _legacy_classify(line: str):
+    """The substring checks pjsua_client used before, kept for benchmark comparison."""
+    hits = 0
+    lowline = line.lower()
+    if ("registration complete" in lowline) or (
+        "registered" in lowline and "status=200" in lowline
+    ):
+        hits += 1
+    elif "registration failed" in lowline or (
+        "status=" in lowline and ("401" in lowline or "403" in lowline or "407" in lowline)
+    ):
+        hits += 1
+    elif "unregistered" in lowline or "registration refresh failed" in lowline:
+        hits += 1
+    if "incoming call" in lowline or "call from" in lowline or "ringing" in lowline:
+        hits += 1
+    if lowline.startswith("from:"):
+        hits += 1
+    if "established" in lowline or "call answered" in lowline or "connected" in lowline:
+        hits += 1
+    if (
+        "disconnected" in lowline
+        or "call is terminated" in lowline
+        or "hangup" in lowline
+        or "call ended" in lowline
+    ):
+        hits += 1
+    return hits
+
+
+def synthetic_log(lines: int):
+    """A level-5 style log: mostly media/transport noise with a few calls."""
+    noise = [
+        "12:00:01.123    pjsua_media.c  ......Audio updated, stream #0: PCMU (sendrecv)",
+        "12:00:01.124      conference.c  .......Port 3 (sip:1000@10.0.0.2) "
+        "transmitting to port 0 (Master/sound)",
+        "12:00:01.125       rtcp_xr.c !RTCP XR: rx pkt=512, lost=0 (0.0%), dup=0, discard=0, "
+        "jitter=1.2ms",
+        "12:00:01.126   sip_endpoint.c  .Processing incoming message: "
+        "Response msg 200/OPTIONS/cseq=1234",
+        "12:00:01.127   pjsua_core.c  ...TX 512 bytes Request msg OPTIONS/cseq=1235 "
+        "to UDP 10.0.0.1:5060:",
+        "Via: SIP/2.0/UDP 10.0.0.2:5060;rport;branch=z9hG4bKPj1234",
+        "12:00:01.128    strm0x1d2e8  ...RX jitter buffer: frame=20ms, size=4, prefetch=2, burst=1",
+        "12:00:01.129   ec0x1c2b40 ...AEC: delay estimate 48ms",
+    ]
+    events = [
+        "12:00:02.000   pjsua_acc.c  ....sip:1001@10.0.0.1: registration success, "
+        "status=200 (OK), will re-register in 300 seconds",
+        "12:00:03.000   pjsua_app.c  .......Incoming call for account 0!",
+        'From: "Front Door" <sip:1000@10.0.0.1>',
+        "12:00:03.001   pjsua_app.c  .......Call 0 state changed to EARLY",
+        "12:00:04.000   pjsua_app.c  .......Call 0 state changed to CONNECTING",
+        "12:00:04.001   pjsua_app.c  .......Call 0 state changed to CONFIRMED",
+        "12:00:09.000   pjsua_app.c  .......Call 0 is DISCONNECTED "
+        "[reason=200 (Normal call clearing)]",
+        "12:00:10.000   pjsua_acc.c  ....sip:1001@10.0.0.1: unregistration success",
+    ]
+    out = []
+    for i in range(lines):
+        if i % 500 == 0:
+            out.extend(events)
+        out.append(noise[i % len(noise)])
+    return out[:lines]
+
+
+def _bench(lines, repeat: int = 3):
+    def rate(fn):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for line in lines:
+                fn(line)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return len(lines) / best
+
+    parser = PjsuaLogParser()
+    counts = {}
+    for line in lines:
+        event = parser.feed(line)
+        if event is not None:
+            counts[type(event).__name__] = counts.get(type(event).__name__, 0) + 1
+    print(f"{len(lines)} lines, events: {counts}")
+    print(f"parser: {rate(PjsuaLogParser().feed):,.0f} lines/s")
+    print(f"legacy substring checks: {rate(_legacy_classify):,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Replay a pjsua log through the event parser")
+    ap.add_argument(
+        "--bench", nargs="?", const="", metavar="LOG", help="recorded pjsua log to replay"
+    )
+    ap.add_argument(
+        "--synthetic", type=int, default=200000, help="synthetic lines if no log is given"
+    )
+    ap.add_argument("--repeat", type=int, default=3)
+    opts = ap.parse_args()
+    if opts.bench:
+        with open(opts.bench, "r", encoding="utf-8", errors="replace") as f:
+            replay = [line.rstrip("\n") for line in f]
+    else:
+        replay = synthetic_log(opts.synthetic)
+    _bench(replay, opts.repeat)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""pjsua_supervisor.py
+
+Process supervision for pjsua_client.py: runs the pjsua CLI, feeds both of
+its output streams through one PjsuaLogParser, and restarts it with
+exponential backoff whenever it exits, until stop() is called. Commands go
+to pjsua's stdin through send(), which never writes to a process that is
+being replaced.
+
+The supervisor keeps no call state. Parsed log events go to on_event(event)
+and changes to its own bookkeeping to on_status(event, **fields), where
+`fields` are the keys of pjsua_client's state["pjsua"] (running, pid,
+restarts, last_exit, time_to_registered) and `event` is a line for
+last_event or None; both are called from the supervisor's threads.
+"""
+
+import subprocess
+import threading
+import time
+from typing import Optional
+
+from pjsua_log import PjsuaLogParser
+
+RESTART_MIN_DELAY = 0.5   # first restart delay after pjsua exits, doubled per quick failure
+RESTART_MAX_DELAY = 30.0
+STABLE_RUN = 60.0         # a run at least this long resets the backoff
+
+LOG_PREFIX = "[pjsua-client]"
+
+
+def build_pjsua_args(pjsua_bin: str, user: str, password: str, domain: str, server: str):
+    # Build a safe pjsua CLI invocation that registers and stays running
+    identity = f"sip:{user}@{domain}"
+    registrar = f"sip:{server}"
+
+    args = [
+        pjsua_bin,
+        "--id", identity,
+        "--registrar", registrar,
+        "--realm", "*",
+        "--username", user,
+        "--password", password,
+        # Less verbose log level by default; frontend can read /status
+        "--log-level", "3",
+        # Keep console output (we will read it)
+    ]
+
+    return args
+
+
+class PjsuaSupervisor:
+    def __init__(self, args, on_event, on_status):
+        self.args = list(args)
+        self._on_event = on_event
+        self._on_status = on_status
+        # The running pjsua, swapped under _lock so send() never writes to a process being replaced
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self.spawned_at: Optional[float] = None  # monotonic start time of the current pjsua
+        self.restarts = 0
+        self._stopping = threading.Event()
+
+    def send(self, cmd: str) -> bool:
+        """Send a single-character command to the pjsua process stdin (non-blocking)."""
+        with self._lock:
+            if not self._proc or self._proc.stdin is None:
+                print(f"{LOG_PREFIX} No pjsua process stdin available to send '{cmd}'")
+                return False
+            try:
+                self._proc.stdin.write((cmd + "\n").encode("utf-8"))
+                self._proc.stdin.flush()
+            except Exception as exc:
+                print(f"{LOG_PREFIX} Failed to send cmd to pjsua: {exc}")
+                return False
+        print(f"{LOG_PREFIX} Sent command to pjsua: {cmd}")
+        return True
+
+    def run(self):
+        """Run pjsua until stop(), restarting it with exponential backoff whenever it exits."""
+        failures = 0
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            proc = self._start()
+            if proc is not None:
+                self._monitor(proc)
+            if self._stopping.is_set():
+                break
+            failures = 1 if time.monotonic() - started >= STABLE_RUN else failures + 1
+            delay = min(RESTART_MAX_DELAY, RESTART_MIN_DELAY * 2 ** (failures - 1))
+            print(f"{LOG_PREFIX} Restarting pjsua in {delay:.1f}s")
+            if self._stopping.wait(delay):
+                break
+            self.restarts += 1
+            self._on_status(None, restarts=self.restarts)
+
+    def stop(self):
+        """Stop supervising and ask pjsua to exit (safe from a signal handler: no waiting)."""
+        self._stopping.set()
+        proc = self._proc  # no _lock: the interrupted thread may hold it
+        if proc is not None and proc.returncode is None:
+            try:
+                proc.terminate()
+            except OSError:
+                pass
+
+    def _start(self) -> Optional[subprocess.Popen]:
+        """Spawn pjsua and make it the target of send(); None if it cannot start."""
+        print(f"{LOG_PREFIX} Starting pjsua: {' '.join(self.args)}")
+
+        # Use pipes for stdout/stderr
+        try:
+            proc = subprocess.Popen(
+                self.args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE
+            )
+        except FileNotFoundError:
+            print(f"{LOG_PREFIX} pjsua binary not found: {self.args[0]}")
+            self._on_status("pjsua not found")
+            return None
+        except Exception as exc:
+            print(f"{LOG_PREFIX} Failed to start pjsua: {exc}")
+            self._on_status(f"start failed: {exc}")
+            return None
+
+        with self._lock:
+            self._proc = proc
+            self.spawned_at = time.monotonic()
+        self._on_status(
+            f"pjsua started (pid {proc.pid})", running=True, pid=proc.pid, time_to_registered=None
+        )
+        return proc
+
+    def _monitor(self, proc: subprocess.Popen):
+        """Read pjsua's stdout/stderr until it exits, passing parsed events on."""
+        parser = PjsuaLogParser()  # shared so call transitions are ordered across both streams
+
+        # pjsua prints to stderr sometimes, so read both fd via iter
+        def reader(stream, stream_name):
+            for raw in iter(stream.readline, b""):
+                try:
+                    line = raw.decode("utf-8", errors="replace").strip()
+                except Exception:
+                    line = str(raw)
+                if not line:
+                    continue
+                print(f"{LOG_PREFIX} ({stream_name}) {line}")
+                event = parser.feed(line)
+                if event is not None:
+                    self._on_event(event)
+
+        t_out = threading.Thread(target=reader, args=(proc.stdout, "STDOUT"), daemon=True)
+        t_err = threading.Thread(target=reader, args=(proc.stderr, "STDERR"), daemon=True)
+        t_out.start()
+        t_err.start()
+        # Wait for process to exit
+        proc.wait()
+        with self._lock:
+            if self._proc is proc:
+                self._proc = None
+        print(f"{LOG_PREFIX} pjsua process exited with {proc.returncode}")
+        self._on_status(
+            f"pjsua exited ({proc.returncode})", running=False, pid=None, last_exit=proc.returncode
+        )
@@ -0,0 +1,216 @@
+"""Durable record store: snapshot file plus write-ahead journal.
+
+Each mutation is serialized on the caller's thread and appended to a
+JSON-lines journal by a background writer, which groups everything queued
+since its last write into a single write + fsync. Once the journal grows
+past `compact_every` entries (or the record count, whichever is larger, so
+compaction stays amortized O(1) per write), the current records are written to a fresh
+snapshot (atomically, via rename) and the journal is truncated. Startup
+reads the snapshot and replays only the journal tail, so load time tracks
+data size rather than edit history. A torn final entry left by a crash is
+cut off before the journal is reopened, so new entries never land behind it.
+
+Record ids are kept as given (ints for contacts and devices) and records
+keep insertion order across restarts.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPACT_EVERY = 1000
+
+
+class JournalStore:
+    def __init__(self, directory, name: str, compact_every: int = DEFAULT_COMPACT_EVERY):
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._snapshot_path = self._dir / f"{name}.snapshot.json"
+        self._journal_path = self._dir / f"{name}.journal"
+        self._compact_every = compact_every
+
+        self._records = {}
+        self._meta = {}
+        self._journal_len = 0
+        self._loaded = False
+
+        # Pending writes: ("line", bytes) or ("snapshot", bytes)
+        self._pending = []
+        self._cond = threading.Condition()
+        self._queued = 0
+        self._written = 0
+        self._closed = False
+        self._journal = None
+        self._writer = None
+
+    # -- loading ---------------------------------------------------------
+
+    def load(self):
+        """Read snapshot + journal tail; returns (records, meta).
+
+        `records` is an ordered id -> record dict. Must be called once
+        before any writes.
+        """
+        if self._snapshot_path.exists():
+            with open(self._snapshot_path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+            self._meta = snap.get("meta", {})
+            for rec_id, record in snap.get("records", []):
+                self._records[rec_id] = record
+
+        if self._journal_path.exists():
+            good = 0  # offset just past the last intact entry
+            with open(self._journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("unterminated entry")
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn final write from a crash; everything before it is intact
+                        break
+                    self._apply(entry)
+                    self._journal_len += len(entry["ops"]) if entry.get("op") == "batch" else 1
+                    good += len(line)
+                size = f.seek(0, os.SEEK_END)
+            if size > good:
+                logger.warning(
+                    "Dropping %d torn bytes at the end of %s", size - good, self._journal_path
+                )
+                with open(self._journal_path, "r+b") as f:
+                    f.truncate(good)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+        self._loaded = True
+        self._journal = open(self._journal_path, "ab")
+        self._writer = threading.Thread(
+            target=self._write_loop, name=f"journal-{self._journal_path.stem}", daemon=True
+        )
+        self._writer.start()
+        if self._should_compact():
+            self.compact()
+        return self._records, self._meta
+
+    def is_empty(self) -> bool:
+        return not self._records and not self._meta
+
+    def _apply(self, entry: dict):
+        op = entry.get("op")
+        if op == "put":
+            self._records[entry["id"]] = entry["value"]
+        elif op == "del":
+            self._records.pop(entry["id"], None)
+        elif op == "meta":
+            self._meta.update(entry["value"])
+        elif op == "batch":
+            for sub in entry["ops"]:
+                self._apply(sub)
+
+    # -- writing ---------------------------------------------------------
+
+    def put(self, rec_id, record: dict):
+        self._append({"op": "put", "id": rec_id, "value": record})
+
+    def delete(self, rec_id):
+        self._append({"op": "del", "id": rec_id})
+
+    def set_meta(self, **values):
+        self._append({"op": "meta", "value": values})
+
+    def write_batch(self, puts=(), deletes=(), meta: dict = None):
+        """Journal several changes as a single entry, replayed all-or-nothing."""
+        ops = [{"op": "put", "id": rec_id, "value": record} for rec_id, record in puts]
+        ops += [{"op": "del", "id": rec_id} for rec_id in deletes]
+        if meta:
+            ops.append({"op": "meta", "value": meta})
+        if ops:
+            self._append({"op": "batch", "ops": ops}, weight=len(ops))
+
+    def _append(self, entry: dict, weight: int = 1):
+        if not self._loaded:
+            raise RuntimeError("JournalStore.load() must be called before writing")
+        self._apply(entry)
+        line = json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n"
+        self._enqueue(("line", line))
+        self._journal_len += weight
+        if self._should_compact():
+            self.compact()
+
+    def _should_compact(self) -> bool:
+        return self._journal_len >= max(self._compact_every, len(self._records))
+
+    def compact(self):
+        """Queue a snapshot of the current records and reset the journal."""
+        snap = {"meta": self._meta, "records": list(self._records.items())}
+        self._enqueue(("snapshot", json.dumps(snap, separators=(",", ":")).encode("utf-8")))
+        self._journal_len = 0
+
+    def _enqueue(self, item):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("JournalStore is closed")
+            self._pending.append(item)
+            self._queued += 1
+            self._cond.notify_all()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                batch, self._pending = self._pending, []
+
+            dirty = False
+            for kind, data in batch:
+                if kind == "line":
+                    self._journal.write(data)
+                    dirty = True
+                else:
+                    if dirty:
+                        self._sync_journal()
+                        dirty = False
+                    self._write_snapshot(data)
+            if dirty:
+                self._sync_journal()
+
+            with self._cond:
+                self._written += len(batch)
+                self._cond.notify_all()
+
+    def _sync_journal(self):
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _write_snapshot(self, data: bytes):
+        tmp = self._snapshot_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._snapshot_path)
+        self._journal.truncate(0)
+        self._journal.seek(0)
+        self._sync_journal()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far is on disk."""
+        with self._cond:
+            target = self._queued
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self):
+        if self._writer is None:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._writer = None
+        self._journal.close()
@@ -0,0 +1 @@
+"""Device telemetry module"""
@@ -0,0 +1,223 @@
+"""Fixed-size, NumPy-backed time series for device sensor readings.
+
+Each (device, sensor) series keeps three preallocated rings:
+
+- raw samples (timestamp, value)
+- 1-minute rollups (min / max / sum / count per bucket)
+- 1-hour rollups
+
+Rollups are updated incrementally on ingest, so a range query only reads
+the one level whose retention and resolution fit the requested window.
+All buffers are allocated up front, so memory per series is constant and
+the number of series is capped.
+"""
+
+import threading
+
+import numpy as np
+
+RAW_CAPACITY = 1800          # e.g. 30 min at 1 Hz
+MINUTE_CAPACITY = 24 * 60    # 24 h of 1-minute buckets
+HOUR_CAPACITY = 14 * 24      # 14 days of 1-hour buckets
+MAX_SERIES = 64
+DEFAULT_MAX_POINTS = 500
+
+
+class SeriesLimitError(RuntimeError):
+    """Raised when ingesting would create more than MAX_SERIES series."""
+
+
+class _Ring:
+    """Columns of equal-length preallocated arrays written round-robin."""
+
+    def __init__(self, capacity: int, dtypes: dict):
+        self.capacity = capacity
+        self.cols = {name: np.zeros(capacity, dtype=dt) for name, dt in dtypes.items()}
+        self.total = 0  # rows ever written; next slot is total % capacity
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, **values):
+        k = len(next(iter(values.values())))
+        if k == 0:
+            return
+        if k > self.capacity:
+            values = {name: v[-self.capacity:] for name, v in values.items()}
+            self.total += k - self.capacity
+            k = self.capacity
+        slots = (self.total + np.arange(k)) % self.capacity
+        for name, v in values.items():
+            self.cols[name][slots] = v
+        self.total += k
+
+    def covers(self, start: float) -> bool:
+        """True if no row at or after `start` has been overwritten yet."""
+        if self.total <= self.capacity:
+            return True
+        return self.cols["ts"][self.total % self.capacity] <= start
+
+    def last_slot(self):
+        return (self.total - 1) % self.capacity if self.total else None
+
+    def ordered(self, name: str) -> np.ndarray:
+        """Column in oldest-to-newest order."""
+        col = self.cols[name]
+        if self.total <= self.capacity:
+            return col[:self.total]
+        i = self.total % self.capacity
+        return np.concatenate((col[i:], col[:i]))
+
+    def find(self, ts: float):
+        """Slot holding a row with timestamp `ts`, if still retained."""
+        ts_col = self.ordered("ts")
+        j = int(np.searchsorted(ts_col, ts))
+        if j < len(ts_col) and ts_col[j] == ts:
+            return (self.total - len(ts_col) + j) % self.capacity
+        return None
+
+
+class _Rollup:
+    def __init__(self, resolution: int, capacity: int):
+        self.resolution = resolution
+        self.ring = _Ring(capacity, {
+            "ts": np.float64, "min": np.float32, "max": np.float32,
+            "sum": np.float64, "count": np.uint32,
+        })
+
+    def add(self, ts: np.ndarray, values: np.ndarray):
+        """Fold a time-sorted batch into per-bucket aggregates."""
+        buckets = np.floor(ts / self.resolution) * self.resolution
+        starts, idx = np.unique(buckets, return_index=True)
+        mins = np.minimum.reduceat(values, idx)
+        maxs = np.maximum.reduceat(values, idx)
+        sums = np.add.reduceat(values.astype(np.float64), idx)
+        counts = np.diff(np.append(idx, len(values)))
+
+        cols = self.ring.cols
+        new = np.ones(len(starts), dtype=bool)
+        last = self.ring.last_slot()
+        for j, start in enumerate(starts):
+            if last is not None and start <= cols["ts"][last]:
+                slot = last if start == cols["ts"][last] else self.ring.find(start)
+                if slot is not None:
+                    cols["min"][slot] = min(cols["min"][slot], mins[j])
+                    cols["max"][slot] = max(cols["max"][slot], maxs[j])
+                    cols["sum"][slot] += sums[j]
+                    cols["count"][slot] += counts[j]
+                # Late data for an expired bucket is dropped
+                new[j] = False
+        if new.any():
+            self.ring.append(ts=starts[new], min=mins[new], max=maxs[new],
+                             sum=sums[new], count=counts[new])
+
+    def query(self, start: float, end: float):
+        # Include the bucket that contains `start`
+        start = np.floor(start / self.resolution) * self.resolution
+        ts = self.ring.ordered("ts")
+        lo, hi = np.searchsorted(ts, [start, end])
+        if lo == hi:
+            return []
+        cols = {name: self.ring.ordered(name)[lo:hi] for name in ("min", "max", "sum", "count")}
+        means = cols["sum"] / np.maximum(cols["count"], 1)
+        return np.column_stack((ts[lo:hi], cols["min"], cols["max"], means)).tolist()
+
+
+class Series:
+    def __init__(self):
+        self.raw = _Ring(RAW_CAPACITY, {"ts": np.float64, "value": np.float32})
+        self.rollups = {"1m": _Rollup(60, MINUTE_CAPACITY), "1h": _Rollup(3600, HOUR_CAPACITY)}
+
+    def add(self, ts: np.ndarray, values: np.ndarray):
+        order = np.argsort(ts, kind="stable")
+        ts, values = ts[order], values[order]
+        for rollup in self.rollups.values():
+            rollup.add(ts, values)
+        # The raw ring stays time-ordered; samples older than its newest are
+        # only reflected in the rollups.
+        last = self.raw.last_slot()
+        if last is not None:
+            keep = ts >= self.raw.cols["ts"][last]
+            ts, values = ts[keep], values[keep]
+        self.raw.append(ts=ts, value=values)
+
+    def query(self, start: float, end: float, max_points: int):
+        """Pick the finest level that covers `start` within `max_points`."""
+        if self.raw.covers(start):
+            raw_ts = self.raw.ordered("ts")
+            lo, hi = np.searchsorted(raw_ts, [start, end])
+            if hi - lo <= max_points:
+                values = self.raw.ordered("value")[lo:hi]
+                return "raw", np.column_stack((raw_ts[lo:hi], values)).tolist()
+        for name, rollup in self.rollups.items():
+            bucket_start = (start // rollup.resolution) * rollup.resolution
+            if (
+                rollup.ring.covers(bucket_start)
+                and (end - bucket_start) / rollup.resolution <= max_points
+            ):
+                return name, rollup.query(start, end)
+        return "1h", self.rollups["1h"].query(start, end)
+
+    @staticmethod
+    def nbytes():
+        return (
+            RAW_CAPACITY * (8 + 4)
+            + (MINUTE_CAPACITY + HOUR_CAPACITY) * (8 + 4 + 4 + 8 + 4)
+        )
+
+
+class TelemetryStore:
+    def __init__(self, max_series: int = MAX_SERIES):
+        self._series = {}  # (device_id, sensor) -> Series
+        self._max_series = max_series
+        self._lock = threading.Lock()
+
+    def ingest(self, readings):
+        """Add readings ({"device_id", "sensor", "ts", "value"}) in one batch.
+
+        Readings are grouped per series and written with vectorized ops.
+        Returns the number of readings accepted.
+        """
+        grouped = {}
+        for r in readings:
+            if not isinstance(r, dict):
+                raise TypeError(f"Reading must be an object: {r!r}")
+            key = (int(r["device_id"]), str(r["sensor"]))
+            ts_list, val_list = grouped.setdefault(key, ([], []))
+            ts_list.append(float(r["ts"]))
+            val_list.append(float(r["value"]))
+
+        with self._lock:
+            new_keys = [k for k in grouped if k not in self._series]
+            if len(self._series) + len(new_keys) > self._max_series:
+                raise SeriesLimitError(f"Telemetry is limited to {self._max_series} series")
+            for key in new_keys:
+                self._series[key] = Series()
+            for key, (ts_list, val_list) in grouped.items():
+                self._series[key].add(
+                    np.asarray(ts_list, dtype=np.float64),
+                    np.asarray(val_list, dtype=np.float32),
+                )
+        return sum(len(ts_list) for ts_list, _ in grouped.values())
+
+    def query(self, device_id: int, sensor: str, start: float, end: float,
+              max_points: int = DEFAULT_MAX_POINTS):
+        with self._lock:
+            series = self._series.get((device_id, sensor))
+            if series is None:
+                return None
+            resolution, points = series.query(start, end, max_points)
+        return {"resolution": resolution, "points": points}
+
+    def sensors(self, device_id: int):
+        with self._lock:
+            return sorted(sensor for dev, sensor in self._series if dev == device_id)
+
+    def drop_device(self, device_id: int):
+        with self._lock:
+            for key in [k for k in self._series if k[0] == device_id]:
+                del self._series[key]
+
+    def memory_bytes(self) -> int:
+        """Upper bound of buffer memory: fixed per series, capped series count."""
+        return self._max_series * Series.nbytes()
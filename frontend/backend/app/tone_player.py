@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""tone_player.py
+
+Low-latency keypad tone playback for keypad_dtmf.py.
+
+One `aplay` process is started once and fed raw PCM through a pipe, so a
+key press costs a buffer hand-off instead of fork + exec + ALSA open + WAV
+parsing. A mixer thread cuts the active tones into FRAME_MS frames, sums
+overlapping ones (rapid presses mix instead of stacking up processes) and
+writes each frame no more than LEAD_FRAMES ahead of real time, which keeps
+the pipe and ALSA buffer short. When nothing is playing nothing is written,
+so aplay is told to start playing after one period (--start-delay) rather
+than waiting for its whole buffer to fill at the start of every burst.
+
+Sinks only need write(bytes) and close(); NullSink discards audio. The
+benchmark times press to first PCM out of the playing process for the
+persistent pipe and for one process per press, with `cat` standing in for
+aplay in both, so no sound card is needed:
+  python3 tone_player.py --bench
+"""
+
+import array
+import collections
+import os
+import subprocess
+import threading
+import time
+
+from dtmf_tones import SAMPLE_RATE, SAMPLE_WIDTH, tone_pcm
+
+try:
+    import numpy as np
+except ImportError:  # mixing falls back to the array module
+    np = None
+
+FRAME_MS = 10
+LEAD_FRAMES = 2
+MAX_VOICES = 4
+ALSA_DEVICE = os.environ.get("ALSA_DEVICE")  # aplay -D, default device if unset
+ALSA_BUFFER_US = 60000
+ALSA_START_DELAY_US = FRAME_MS * 1000  # start playing once one period is buffered
+
+
+class AplaySink:
+    """A long-lived `aplay` reading 16-bit mono PCM from stdin; restarted if it dies."""
+
+    def __init__(self, rate: int = SAMPLE_RATE, device: str = ALSA_DEVICE):
+        self.args = ["aplay", "-q", "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(rate),
+                     f"--buffer-time={ALSA_BUFFER_US}", f"--period-time={FRAME_MS * 1000}",
+                     f"--start-delay={ALSA_START_DELAY_US}"]
+        if device:
+            self.args += ["-D", device]
+        self.args.append("-")
+        self._proc = None
+
+    def _start(self):
+        self._proc = subprocess.Popen(self.args, stdin=subprocess.PIPE,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def write(self, data: bytes):
+        for attempt in (1, 2):
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+            try:
+                self._proc.stdin.write(data)
+                self._proc.stdin.flush()
+                return
+            except (BrokenPipeError, OSError):
+                self._proc = None
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+            self._proc.terminate()
+            self._proc = None
+
+
+class NullSink:
+    """Discards audio, remembering when each frame was written."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.last_write = None
+
+    def write(self, data: bytes):
+        self.frames += 1
+        self.bytes += len(data)
+        self.last_write = time.monotonic()
+
+    def close(self):
+        pass
+
+
+class _Voice:
+    __slots__ = ("pcm", "offset", "submitted")
+
+    def __init__(self, pcm: bytes):
+        self.pcm = memoryview(pcm)
+        self.offset = 0
+        self.submitted = time.monotonic()
+
+
+def _mix(chunks, frame_bytes: int) -> bytes:
+    if len(chunks) == 1:
+        chunk = chunks[0]
+        return bytes(chunk) + bytes(frame_bytes - len(chunk))
+    if np is not None:
+        total = np.zeros(frame_bytes // SAMPLE_WIDTH, dtype=np.int32)
+        for chunk in chunks:
+            samples = np.frombuffer(chunk, dtype="<i2")
+            total[:len(samples)] += samples
+        return np.clip(total, -32768, 32767).astype("<i2").tobytes()
+    total = [0] * (frame_bytes // SAMPLE_WIDTH)
+    for chunk in chunks:
+        for i, value in enumerate(array.array("h", bytes(chunk))):
+            total[i] += value
+    return array.array("h", (max(-32768, min(32767, v)) for v in total)).tobytes()
+
+
+class TonePlayer:
+    def __init__(self, sink, rate: int = SAMPLE_RATE, frame_ms: int = FRAME_MS,
+                 lead_frames: int = LEAD_FRAMES, max_voices: int = MAX_VOICES):
+        self._sink = sink
+        self._frame_seconds = frame_ms / 1000
+        self._frame_bytes = int(rate * self._frame_seconds) * SAMPLE_WIDTH
+        self._lead = lead_frames * self._frame_seconds
+        self._voices = collections.deque(maxlen=max_voices)  # oldest tone is dropped past this
+        self._cond = threading.Condition()
+        self._running = True
+        self.latencies = collections.deque(maxlen=1000)  # press -> first frame written, seconds
+        self._thread = threading.Thread(target=self._run, name="tone-player", daemon=True)
+        self._thread.start()
+
+    def play(self, pcm: bytes):
+        """Start a tone; returns at once."""
+        with self._cond:
+            self._voices.append(_Voice(pcm))
+            self._cond.notify()
+
+    def play_key(self, key: str):
+        self.play(tone_pcm(key))
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=1)
+        self._sink.close()
+
+    def _next_frame(self):
+        """Mix the next frame from the active voices, or None when there are none."""
+        with self._cond:
+            if not self._voices:
+                return None
+            chunks = []
+            now = time.monotonic()
+            for voice in self._voices:
+                if voice.offset == 0:
+                    self.latencies.append(now - voice.submitted)
+                chunks.append(voice.pcm[voice.offset:voice.offset + self._frame_bytes])
+                voice.offset += self._frame_bytes
+            for voice in [v for v in self._voices if v.offset >= len(v.pcm)]:
+                self._voices.remove(voice)
+        return _mix(chunks, self._frame_bytes)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._voices:
+                    self._cond.wait()
+                if not self._running:
+                    return
+            # A burst of audio starts: pace its frames against the wall clock
+            start = time.monotonic()
+            written = 0
+            while True:
+                frame = self._next_frame()
+                if frame is None:
+                    break
+                try:
+                    self._sink.write(frame)
+                except OSError:
+                    time.sleep(self._frame_seconds)  # sink unavailable; drop this frame
+                written += 1
+                ahead = start + written * self._frame_seconds - time.monotonic()
+                if ahead > self._lead:
+                    time.sleep(ahead - self._lead)
+
+
+def _bench(presses: int, gap: float):
+    import queue
+    import statistics
+
+    def summary(label, values):
+        ms = sorted(v * 1000 for v in values)
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        p50 = statistics.median(ms)
+        print(f"{label:<34} p50={p50:7.3f}ms p95={p95:7.3f}ms max={ms[-1]:7.3f}ms")
+
+    # Both paths are timed from the press to the first PCM coming back out of the
+    # process that would play it; `cat` stands in for aplay (no ALSA open in either)
+    pcm = tone_pcm("5")
+    tone_seconds = len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)
+    cat = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    arrivals = queue.Queue()
+
+    def drain():
+        while cat.stdout.read1(65536):
+            arrivals.put(time.monotonic())
+
+    class PipeSink:
+        def write(self, data: bytes):
+            cat.stdin.write(data)
+            cat.stdin.flush()
+
+        def close(self):
+            cat.stdin.close()
+
+    threading.Thread(target=drain, daemon=True).start()
+    player = TonePlayer(PipeSink())
+    persistent = []
+    for _ in range(presses):
+        start = time.monotonic()
+        player.play(pcm)
+        persistent.append(arrivals.get(timeout=2) - start)
+        time.sleep(tone_seconds + gap)
+        while not arrivals.empty():  # the rest of this tone
+            arrivals.get_nowait()
+    player.close()
+    cat.wait()
+    summary("persistent pipe (press->1st PCM)", persistent)
+
+    # Old path: one process per press
+    spawn = []
+    for _ in range(presses):
+        start = time.monotonic()
+        proc = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        proc.stdin.write(pcm)
+        proc.stdin.close()
+        proc.stdout.read(1)
+        spawn.append(time.monotonic() - start)
+        proc.stdout.read()
+        proc.wait()
+    summary("process per press (press->1st PCM)", spawn)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Tone latency: persistent pipe vs a process per press")
+    ap.add_argument("--bench", action="store_true")
+    ap.add_argument("--presses", type=int, default=50)
+    ap.add_argument("--gap", type=float, default=0.05, help="seconds of silence after each tone")
+    opts = ap.parse_args()
+    if opts.bench:
+        _bench(opts.presses, opts.gap)
+    else:
+        ap.print_help()
@@ -12,11 +12,10 @@ export default function PhoneDetails() {
 
   const fetchPhone = async () => {
     try {
-      const res = await fetch('/api/devices')
+      const res = await fetch(`/api/devices/${id}`)
       if (res.ok) {
         const data = await res.json()
-        const found = data.devices?.find(p => p.id === parseInt(id))
-        setPhone(found)
+        if (!data.error) setPhone(data)
       }
     } catch (err) {
       console.error('Failed to fetch device:', err)